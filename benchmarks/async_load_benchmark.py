@@ -0,0 +1,141 @@
+"""
+Concurrency ceiling of /generate_first_week: the previous sync handler (blocking chain.invoke in a
+threadpool worker) vs. the async handler (ainvoke), with the LLM replaced by a fixed-latency stub.
+
+Usage:
+    python -m benchmarks.async_load_benchmark [--requests 200] [--latency 1.0]
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+import argparse
+from pathlib import Path
+
+import httpx
+from fastapi import Request
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+from src.api.endpoints import FirstWeekRequest, TrainWeekResponse, create_train_assistant
+
+
+ROOT = Path(__file__).resolve().parents[1]
+STUB_PLAN = json.dumps({"day 1": {"day_type": "REST_DAY"}})
+
+ENVIRONMENT = {
+    "API_KEY": "benchmark",
+    "TRAIN_ASSISTANT_CONFIG_PATH": ROOT / "configs" / "train_assistant_config.yaml",
+    "DATA_PROCESSING_CONFIG_PATH": ROOT / "configs" / "data_processing_config.yaml",
+    "AGE_BASED_ADJUSTMENTS_CONFIG_PATH": ROOT / "configs" / "age_based_adjustments_config.yaml",
+    "EXERCISES_CONFIG_PATH": ROOT / "configs" / "exercises_config.yaml",
+    "FEEDBACK_CONFIG_PATH": ROOT / "configs" / "feedback_config.yaml",
+    "TRAIN_WEEKS_TEMPLATES_PATH": ROOT / "configs" / "week_templates.json",
+    "TRAINING_PROGRAM_EXAMPLES_DIR": ROOT / "configs" / "training_program_examples",
+    "ERIC_RECOMMENDATIONS_PATH": ROOT / "data" / "eric_recommendations" / "merged_recs.txt",
+    "EXERCISES_RAW_DF_PATH": ROOT / "data" / "exercises" / "sculpd_exercise_processed.csv",
+    "EXERCISES_SNAPSHOT_PATH": "",
+}
+
+
+class StubLLMClients:
+    """Stands in for LLMClientRegistry: every model answers after a fixed latency."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def get(self, model_name: str, temperature: float | None = None) -> RunnableLambda:
+        def call(_):
+            time.sleep(self.latency)
+            return AIMessage(content=STUB_PLAN)
+
+        async def acall(_):
+            await asyncio.sleep(self.latency)
+            return AIMessage(content=STUB_PLAN)
+
+        return RunnableLambda(call, afunc=acall)
+
+    async def aclose(self) -> None:
+        pass
+
+
+def legacy_generate_first_week(request_data: FirstWeekRequest, request: Request):
+    assistant = create_train_assistant(request.app.state, request_data.user_info, request_data.scanner_info)
+    plan = assistant.generate_first_week()
+    return TrainWeekResponse(plan=assistant.convert_result_to_json(plan))
+
+
+async def run_load(client: httpx.AsyncClient, path: str, payload: dict, requests_num: int) -> dict:
+    async def generate():
+        started = time.perf_counter()
+        response = await client.post(path, json=payload)
+        response.raise_for_status()
+        return time.perf_counter() - started
+
+    async def ping():
+        # let the generation requests occupy the server first
+        await asyncio.sleep(0.05)
+        started = time.perf_counter()
+        response = await client.get("/ping")
+        response.raise_for_status()
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    *latencies, ping_latency = await asyncio.gather(*[generate() for _ in range(requests_num)], ping())
+    latencies.sort()
+    return {
+        "wall": time.perf_counter() - started,
+        "p50": latencies[len(latencies) // 2],
+        "p99": latencies[int(len(latencies) * 0.99) - 1],
+        "ping": ping_latency,
+    }
+
+
+async def main(requests_num: int, latency: float):
+    for name, value in ENVIRONMENT.items():
+        os.environ[name] = str(value)
+    logging.disable(logging.WARNING)
+
+    from src.api.run import app, lifespan
+
+    app.add_api_route("/legacy/generate_first_week", legacy_generate_first_week, methods=["POST"])
+    payload = {
+        "user_info": json.load(open(ROOT / "data" / "user_data" / "user_data_30-34.json", encoding="utf-8")),
+        "scanner_info": json.load(open(ROOT / "data" / "scanner_info" / "scanner_output_30-34.json", encoding="utf-8")),
+    }
+
+    async with lifespan(app):
+        await app.state.llm_clients.aclose()
+        # identical benchmark requests would be served by the plan cache and coalesced
+        app.state.plan_cache = None
+        single_flight = app.state.single_flight
+        app.state.single_flight = None
+        app.state.llm_clients = StubLLMClients(latency)
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            print(f"{requests_num} concurrent requests, stub LLM latency {latency:.2f} s")
+            for name, path in [("sync def + invoke", "/legacy/generate_first_week"),
+                               ("async def + ainvoke", "/generate_first_week")]:
+                stats = await run_load(client, path, payload, requests_num)
+                print(
+                    f"{name:>20}: wall {stats['wall']:.2f} s, p50 {stats['p50']:.2f} s, "
+                    f"p99 {stats['p99']:.2f} s, /ping under load {stats['ping'] * 1e3:.0f} ms, "
+                    f"throughput {requests_num / stats['wall']:.1f} req/s"
+                )
+
+            app.state.single_flight = single_flight
+            stats = await run_load(client, "/generate_first_week", payload, requests_num)
+            print(
+                f"{'async + single flight':>20}: wall {stats['wall']:.2f} s, p99 {stats['p99']:.2f} s, "
+                f"LLM calls {single_flight.executed}, coalesced {single_flight.coalesced}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200, help="Concurrent generation requests")
+    parser.add_argument("--latency", type=float, default=1.0, help="Stub LLM latency, seconds")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.latency))
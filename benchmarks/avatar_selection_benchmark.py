@@ -0,0 +1,73 @@
+"""
+Avatar examples selection: input tokens of the avatar examples sent with every data/user_data profile,
+all examples vs. the k nearest to the profile, and the latency of the nearest-neighbour lookup.
+
+Usage:
+    python -m benchmarks.avatar_selection_benchmark
+"""
+import json
+import timeit
+import logging
+
+from omegaconf import OmegaConf
+
+from benchmarks.prompt_render_benchmark import CONFIGS, ROOT, load_assistant
+from src.training_plan.avatar_index import AvatarIndex
+from src.training_plan.prompt_assets import PromptAssets
+from src.training_plan.prompt_templates import PromptTemplates
+from src.training_plan.token_counter import TokenCounter
+
+
+def main():
+    logging.disable(logging.WARNING)
+    train_assistant_config = OmegaConf.load(CONFIGS / "train_assistant_config.yaml")
+    user_data_processing_config = OmegaConf.load(CONFIGS / "data_processing_config.yaml")["user_data_processing"]
+    token_counter_config = train_assistant_config["token_counter"]
+    token_counter = TokenCounter(token_counter_config["encoding"], token_counter_config["chars_per_token"])
+    avatar_index = AvatarIndex.from_dir(
+        str(ROOT / "data" / "user_data" / "avatars_user_data"),
+        user_data_processing_config,
+        train_assistant_config["avatar_selection"]
+    )
+    prompt_assets = PromptAssets(
+        str(CONFIGS / "training_program_examples"),
+        str(ROOT / "data" / "eric_recommendations" / "merged_recs.txt")
+    )
+    snapshot = prompt_assets.snapshot()
+    avatar_examples = dict(zip(snapshot.avatar_example_names, snapshot.avatar_example_texts))
+    all_tokens = token_counter.count(snapshot.avatar_examples)
+
+    print(f"k = {avatar_index.k}, {'exact' if token_counter.exact else 'estimated'} token counts")
+    profiles = sorted((ROOT / "data" / "user_data").glob("*.json"))
+    selected_total = 0
+    for path in profiles:
+        raw_user_data = json.load(open(path, encoding="utf-8"))
+        selected = avatar_index.select(raw_user_data)
+        selected_tokens = token_counter.count("\n\n".join(avatar_examples[name] for name in selected))
+        selected_total += selected_tokens
+        print(
+            f"{path.stem:>24}: {all_tokens} -> {selected_tokens} tokens "
+            f"({1 - selected_tokens / all_tokens:.0%} less), {', '.join(selected)}"
+        )
+    saved = all_tokens - selected_total / len(profiles)
+    print(f"{'mean':>24}: {saved:.0f} avatar example tokens less per call")
+
+    train_weeks_templates = json.load(open(CONFIGS / "week_templates.json", encoding="utf-8"))
+    prompt_templates = PromptTemplates(train_assistant_config, train_weeks_templates)
+    assistant = load_assistant(prompt_assets, prompt_templates)
+    prompt = prompt_templates.get("first_week", assistant.train_week.train_days_num, snapshot)
+    prompt_tokens = token_counter.count(prompt.invoke({
+        "user_data": assistant.user_data_formatter.data_format(),
+        "scanner_recommendations": assistant.scanner_formatter.data_format(),
+        "age_recommendations": assistant.age_formatter.data_format(),
+        "available_exercises": assistant.get_available_exercises_formatted(),
+    }).to_string())
+    print(f"first_week prompt with all examples: {prompt_tokens} tokens, {saved / prompt_tokens:.0%} of them saved on average")
+
+    raw_user_data = json.load(open(profiles[0], encoding="utf-8"))
+    seconds = min(timeit.repeat(lambda: avatar_index.select(raw_user_data), number=1000, repeat=5)) / 1000
+    print(f"nearest-neighbour lookup: {seconds * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Catalog cold start: parsing the CSV on boot vs. loading the compiled snapshot.
+
+Measures the in-process catalog load and the wall time of a fresh interpreter that loads
+the catalog the way the service lifespan does (what a new autoscaled replica pays).
+
+Usage:
+    python -m benchmarks.catalog_startup_benchmark
+"""
+import os
+import sys
+import time
+import tempfile
+import subprocess
+import statistics
+from pathlib import Path
+
+import pandas as pd
+from omegaconf import OmegaConf
+
+from benchmarks.exercises_filter_benchmark import build_catalog
+from src.exercises.exercises_snapshot import build_snapshot, load_exercises_processor
+
+
+ROOT = Path(__file__).resolve().parents[1]
+SIZES = [185, 10_000, 100_000]
+COLD_START_RUNS = 5
+
+COLD_START_SCRIPT = """
+import sys, time
+started = time.perf_counter()
+from omegaconf import OmegaConf
+from src.exercises.exercises_snapshot import load_exercises_processor
+config = OmegaConf.load(sys.argv[1])["exercises_processor"]
+load_exercises_processor(sys.argv[2], sys.argv[3] or None, config)
+print(time.perf_counter() - started)
+"""
+
+
+def timed(fn, repeat: int = 5) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def cold_start(config_path: str, source_path: str, snapshot_path: str) -> tuple:
+    process_timings, load_timings = [], []
+    for _ in range(COLD_START_RUNS):
+        started = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-c", COLD_START_SCRIPT, config_path, source_path, snapshot_path],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout
+        process_timings.append(time.perf_counter() - started)
+        load_timings.append(float(output.strip().splitlines()[-1]))
+    return statistics.median(process_timings), statistics.median(load_timings)
+
+
+def main():
+    config_path = str(ROOT / "configs" / "exercises_config.yaml")
+    processor_config = OmegaConf.load(config_path)["exercises_processor"]
+    raw_df = pd.read_csv(ROOT / "data" / "exercises" / "sculpd_exercise_processed.csv", keep_default_na=False)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        print("In-process catalog load")
+        print(f"{'exercises':>10} | {'parse, ms':>10} | {'snapshot, ms':>12} | {'speedup':>8}")
+        for size in SIZES:
+            source_path = os.path.join(tmp_dir, f"catalog_{size}.csv")
+            snapshot_path = os.path.join(tmp_dir, f"catalog_{size}.npz")
+            build_catalog(raw_df, size).to_csv(source_path, index=False)
+            build_snapshot(source_path, snapshot_path, processor_config)
+
+            parse_time = timed(lambda: load_exercises_processor(source_path, None, processor_config))
+            snapshot_time = timed(lambda: load_exercises_processor(source_path, snapshot_path, processor_config))
+            print(
+                f"{size:>10} | {parse_time * 1e3:>10.1f} | {snapshot_time * 1e3:>12.1f} | "
+                f"{parse_time / snapshot_time:>7.1f}x"
+            )
+
+        print(f"\nFresh interpreter (median of {COLD_START_RUNS}), process wall time / imports + catalog load")
+        print(f"{'exercises':>10} | {'parse, s':>16} | {'snapshot, s':>16}")
+        for size in SIZES:
+            source_path = os.path.join(tmp_dir, f"catalog_{size}.csv")
+            snapshot_path = os.path.join(tmp_dir, f"catalog_{size}.npz")
+            parse_process, parse_load = cold_start(config_path, source_path, "")
+            snapshot_process, snapshot_load = cold_start(config_path, source_path, snapshot_path)
+            print(
+                f"{size:>10} | {parse_process:>7.2f} / {parse_load:>6.2f} | "
+                f"{snapshot_process:>7.2f} / {snapshot_load:>6.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
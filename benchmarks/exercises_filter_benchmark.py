@@ -0,0 +1,69 @@
+"""
+Exercises filter latency: pandas filter chain vs. bitmask index.
+
+Usage:
+    python -m benchmarks.exercises_filter_benchmark
+"""
+import timeit
+from pathlib import Path
+
+import pandas as pd
+from omegaconf import OmegaConf
+
+from src.exercises.exercises_filter import ExercisesFilter
+from src.exercises.exercises_processor import ExercisesProcessor
+
+
+ROOT = Path(__file__).resolve().parents[1]
+SIZES = [100, 1_000, 10_000, 100_000]
+
+AVAILABLE_EQUIPMENT = ["cable_machine", "barbell", "platform", "ez_bar", "dumbbells", "bench", "none"]
+SKILL_LEVEL = "intermediate"
+DAY_TYPES = ["PUSH", "PULL", "LEGS"]
+
+
+def build_catalog(raw_df: pd.DataFrame, size: int) -> pd.DataFrame:
+    repeats = -(-size // len(raw_df))
+    catalog = pd.concat([raw_df] * repeats, ignore_index=True).iloc[:size].copy()
+    catalog["Exercise Name"] = catalog["Exercise Name"] + " #" + catalog.index.astype(str)
+    return catalog.reset_index(drop=True)
+
+
+def pandas_chain(exercises_filter: ExercisesFilter, processed_df: pd.DataFrame) -> dict:
+    available = exercises_filter.get_available_exercises_by_equipment(processed_df, AVAILABLE_EQUIPMENT)
+    available = exercises_filter.get_available_exercises_by_skill_level(available, SKILL_LEVEL)
+    return exercises_filter.get_available_exercises_by_day_type(available, DAY_TYPES)
+
+
+def best_of(fn, number: int, repeat: int = 5) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number
+
+
+def main():
+    exercises_config = OmegaConf.load(ROOT / "configs" / "exercises_config.yaml")
+    raw_df = pd.read_csv(ROOT / "data" / "exercises" / "sculpd_exercise_processed.csv", keep_default_na=False)
+
+    print(f"{'exercises':>10} | {'pandas, ms':>10} | {'index, ms':>10} | {'index+df, ms':>12} | {'speedup':>8}")
+    for size in SIZES:
+        processor = ExercisesProcessor(build_catalog(raw_df, size), exercises_config["exercises_processor"])
+        exercises_filter = ExercisesFilter(processor, exercises_config["exercises_planner"])
+        number = max(1, 20_000 // size)
+
+        pandas_time = best_of(lambda: pandas_chain(exercises_filter, processor.processed_df), number)
+        index_time = best_of(
+            lambda: exercises_filter.get_available_exercises_positions(AVAILABLE_EQUIPMENT, SKILL_LEVEL, DAY_TYPES),
+            number
+        )
+        index_df_time = best_of(
+            lambda: exercises_filter.get_available_exercises(AVAILABLE_EQUIPMENT, SKILL_LEVEL, DAY_TYPES),
+            number
+        )
+
+        print(
+            f"{size:>10} | {pandas_time * 1e3:>10.3f} | {index_time * 1e3:>10.3f} | "
+            f"{index_df_time * 1e3:>12.3f} | {pandas_time / index_time:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Plan generation wall-clock and output tokens: one completion for the whole week vs. per-day completions
+vs. per-day-type completions fanned out to the days, with a stub LLM whose latency grows with its output.
+
+Usage:
+    python -m benchmarks.per_day_generation_benchmark [--first-token 1.0] [--token-latency 0.01]
+"""
+import ast
+import json
+import time
+import asyncio
+import logging
+import argparse
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+from benchmarks.prompt_render_benchmark import CONFIGS, ROOT, load_assistant
+from src.training_plan.prompt_assets import PromptAssets
+from src.training_plan.prompt_templates import PromptTemplates
+from src.training_plan.train_week import TrainWeek
+
+
+EXAMPLE_PLAN = json.load(open(ROOT / "data" / "examples" / "output_example.json", encoding="utf-8"))
+EXAMPLE_DAYS = [day for day in EXAMPLE_PLAN.values() if day["day_type"] != "REST_DAY"]
+TOKEN_CHARS = 4
+
+
+class LatencyStubLLMClients:
+    """
+    Stands in for LLMClientRegistry: fills in the Plan Skeleton of the prompt with example days and answers
+    after first_token + token_latency * output tokens.
+    """
+
+    def __init__(self, first_token: float, token_latency: float):
+        self.first_token = first_token
+        self.token_latency = token_latency
+        self.output_tokens = 0
+
+    def answer(self, prompt_value) -> tuple:
+        prompt = prompt_value.to_string()
+        skeleton_text = prompt.split("Plan Skeleton:", 1)[1].split("External information:", 1)[0]
+        skeleton = ast.literal_eval(skeleton_text.strip())
+
+        plan = {}
+        for position, (day_key, day) in enumerate(skeleton.items()):
+            if day["day_type"] == "REST_DAY":
+                plan[day_key] = day
+            else:
+                plan[day_key] = {**EXAMPLE_DAYS[position % len(EXAMPLE_DAYS)], "day_type": day["day_type"]}
+
+        content = json.dumps(plan, indent=2)
+        self.output_tokens += len(content) // TOKEN_CHARS
+        return content, self.first_token + len(content) / TOKEN_CHARS * self.token_latency
+
+    def get(self, model_name: str, temperature: float | None = None) -> RunnableLambda:
+        def call(prompt_value):
+            content, latency = self.answer(prompt_value)
+            time.sleep(latency)
+            return AIMessage(content=content)
+
+        async def acall(prompt_value):
+            content, latency = self.answer(prompt_value)
+            await asyncio.sleep(latency)
+            return AIMessage(content=content)
+
+        return RunnableLambda(call, afunc=acall)
+
+
+async def measure(assistant, generation_mode: str, max_concurrency: int = 1, variants: int = 1) -> str:
+    assistant.generation_mode = generation_mode
+    assistant.max_concurrency = max_concurrency
+    assistant.train_assistant_config["generation"]["day_types"]["variants"] = variants
+    assistant.llm_clients.output_tokens = 0
+
+    started = time.perf_counter()
+    plan = assistant.convert_result_to_json(await assistant.agenerate_first_week())
+    seconds = time.perf_counter() - started
+    assert list(plan) == list(assistant.train_week.week)
+    return f"{seconds:.2f} s / {assistant.llm_clients.output_tokens} tok"
+
+
+async def main(first_token: float, token_latency: float):
+    logging.disable(logging.WARNING)
+
+    train_weeks_templates = json.load(open(CONFIGS / "week_templates.json", encoding="utf-8"))
+    prompt_assets = PromptAssets(
+        str(CONFIGS / "training_program_examples"),
+        str(ROOT / "data" / "eric_recommendations" / "merged_recs.txt")
+    )
+    assistant = load_assistant(prompt_assets, None)
+    assistant.llm_clients = LatencyStubLLMClients(first_token, token_latency)
+    assistant.prompt_templates = PromptTemplates(assistant.train_assistant_config, train_weeks_templates)
+
+    print(f"Stub LLM: first token {first_token:.2f} s, {token_latency * 1e3:.0f} ms/token")
+    for train_days_num in [2, 3, 4, 5, 6]:
+        assistant.train_week = TrainWeek(week_templates=train_weeks_templates, train_days_num=train_days_num)
+
+        results = {
+            "week": await measure(assistant, "week"),
+            "per_day x1": await measure(assistant, "per_day", 1),
+            "per_day x4": await measure(assistant, "per_day", 4),
+            "day_types x4": await measure(assistant, "day_types", 4),
+            "day_types A/B x4": await measure(assistant, "day_types", 4, variants=2),
+        }
+        print(f"{train_days_num} training days: " + ", ".join(f"{name} {result}" for name, result in results.items()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--first-token", type=float, default=1.0, help="Stub LLM time to first token, seconds")
+    parser.add_argument("--token-latency", type=float, default=0.01, help="Stub LLM latency per output token, seconds")
+    args = parser.parse_args()
+    asyncio.run(main(args.first_token, args.token_latency))
@@ -0,0 +1,49 @@
+"""
+Plan cache: request key computation and lookup latency of the cache backends.
+
+Usage:
+    python -m benchmarks.plan_cache_benchmark
+"""
+import json
+import timeit
+import logging
+import tempfile
+from pathlib import Path
+
+from benchmarks.prompt_render_benchmark import CONFIGS, ROOT, load_assistant
+from src.cache_backends import MemoryCacheBackend, SQLiteCacheBackend
+from src.training_plan.plan_cache import PlanCache
+from src.training_plan.prompt_assets import PromptAssets
+from src.training_plan.prompt_templates import PromptTemplates
+
+
+def main():
+    logging.disable(logging.WARNING)
+    prompt_assets = PromptAssets(
+        str(CONFIGS / "training_program_examples"),
+        str(ROOT / "data" / "eric_recommendations" / "merged_recs.txt")
+    )
+    assistant = load_assistant(prompt_assets, None)
+    plan = json.dumps(json.load(open(ROOT / "data" / "examples" / "output_example.json", encoding="utf-8")))
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        backends = {
+            "memory": MemoryCacheBackend(maxsize=1024, ttl=3600),
+            "sqlite": SQLiteCacheBackend(str(Path(cache_dir) / "plans.sqlite3"), maxsize=1024, ttl=3600),
+        }
+        for name, backend in backends.items():
+            assistant.plan_cache = PlanCache(backend, version="benchmark")
+            key = assistant.get_plan_cache_key("first_week")
+            assistant.plan_cache.put(key, plan, generation_seconds=30.0)
+
+            key_seconds = min(timeit.repeat(lambda: assistant.get_plan_cache_key("first_week"), number=200, repeat=5)) / 200
+            hit_seconds = min(timeit.repeat(lambda: assistant.plan_cache.get(key), number=200, repeat=5)) / 200
+            miss_seconds = min(timeit.repeat(lambda: assistant.plan_cache.get("missing"), number=200, repeat=5)) / 200
+            print(
+                f"{name:>8}: key {key_seconds * 1e3:.3f} ms, hit {hit_seconds * 1e3:.3f} ms, "
+                f"miss {miss_seconds * 1e3:.3f} ms, hit latency saved per request ~30 s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Prompt render time: compiling the prompt template on every request vs. precompiled partial templates.
+
+Usage:
+    python -m benchmarks.prompt_render_benchmark
+"""
+import json
+import timeit
+from pathlib import Path
+
+import pandas as pd
+from omegaconf import OmegaConf
+from langchain.prompts.chat import ChatPromptTemplate, HumanMessagePromptTemplate
+
+from src.exercises.exercises_processor import ExercisesProcessor
+from src.training_plan.prompt_assets import PromptAssets
+from src.training_plan.prompt_templates import PromptTemplates
+from src.training_plan.train_assistant import TrainAssistant
+
+
+ROOT = Path(__file__).resolve().parents[1]
+CONFIGS = ROOT / "configs"
+
+
+def load_assistant(prompt_assets: PromptAssets, prompt_templates: PromptTemplates) -> TrainAssistant:
+    exercises_config = OmegaConf.load(CONFIGS / "exercises_config.yaml")
+    raw_df = pd.read_csv(ROOT / "data" / "exercises" / "sculpd_exercise_processed.csv", keep_default_na=False)
+    return TrainAssistant(
+        API_KEY="benchmark",
+        train_assistant_config=OmegaConf.load(CONFIGS / "train_assistant_config.yaml"),
+        data_processing_config=OmegaConf.load(CONFIGS / "data_processing_config.yaml"),
+        age_based_adjustments_config=OmegaConf.load(CONFIGS / "age_based_adjustments_config.yaml"),
+        exercises_config=exercises_config,
+        feedback_config=OmegaConf.load(CONFIGS / "feedback_config.yaml"),
+        raw_user_data=json.load(open(ROOT / "data" / "user_data" / "user_data_30-34.json", encoding="utf-8")),
+        raw_scanner_data=json.load(open(ROOT / "data" / "scanner_info" / "scanner_output_30-34.json", encoding="utf-8")),
+        train_weeks_templates=json.load(open(CONFIGS / "week_templates.json", encoding="utf-8")),
+        exercises_processor=ExercisesProcessor(raw_df, exercises_config["exercises_processor"]),
+        prompt_assets=prompt_assets,
+        prompt_templates=prompt_templates
+    )
+
+
+def main():
+    train_assistant_config = OmegaConf.load(CONFIGS / "train_assistant_config.yaml")
+    train_weeks_templates = json.load(open(CONFIGS / "week_templates.json", encoding="utf-8"))
+    prompt_assets = PromptAssets(
+        str(CONFIGS / "training_program_examples"),
+        str(ROOT / "data" / "eric_recommendations" / "merged_recs.txt")
+    )
+    prompt_templates = PromptTemplates(train_assistant_config, train_weeks_templates)
+    prompt_templates.warm_up(prompt_assets.snapshot())
+    assistant = load_assistant(prompt_assets, prompt_templates)
+
+    snapshot = prompt_assets.snapshot()
+    user_fields = {
+        "user_data": assistant.user_data_formatter.data_format(),
+        "scanner_recommendations": assistant.scanner_formatter.data_format(),
+        "age_recommendations": assistant.age_formatter.data_format(),
+        "available_exercises": assistant.get_available_exercises_formatted(),
+    }
+    static_fields = {
+        "week_template": str(assistant.train_week.week),
+        "avatars_examples": snapshot.avatar_examples,
+        "merged_recs": snapshot.merged_recs,
+    }
+    prompt_text = train_assistant_config["train_assistant"]["first_week"]["prompt_template"]
+
+    def per_request_compile():
+        template = ChatPromptTemplate.from_messages([HumanMessagePromptTemplate.from_template(prompt_text)])
+        return template.invoke({**static_fields, **user_fields})
+
+    def precompiled():
+        template = prompt_templates.get("first_week", assistant.train_week.train_days_num, snapshot)
+        return template.invoke(user_fields)
+
+    assert per_request_compile().to_string() == precompiled().to_string()
+    print(f"Rendered prompt: {len(precompiled().to_string())} characters")
+
+    for name, fn in [("compile per request", per_request_compile), ("precompiled partial", precompiled)]:
+        seconds = min(timeit.repeat(fn, number=200, repeat=5)) / 200
+        print(f"{name:>20}: {seconds * 1e3:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Throughput of the rule-based plan engine (no LLM call) over the sample user profiles, per plan and including
+the per-request TrainAssistant construction, on one core.
+
+Usage:
+    python -m benchmarks.rule_based_engine_benchmark [--iterations 200]
+"""
+import json
+import time
+import logging
+import argparse
+
+import pandas as pd
+from omegaconf import OmegaConf
+
+from benchmarks.prompt_render_benchmark import CONFIGS, ROOT
+from src.exercises.exercises_processor import ExercisesProcessor
+from src.training_plan.prompt_assets import PromptAssets
+from src.training_plan.prompt_templates import PromptTemplates
+from src.training_plan.train_assistant import TrainAssistant
+
+
+def main(iterations: int):
+    logging.disable(logging.INFO)
+
+    configs = {
+        "train_assistant_config": OmegaConf.load(CONFIGS / "train_assistant_config.yaml"),
+        "data_processing_config": OmegaConf.load(CONFIGS / "data_processing_config.yaml"),
+        "age_based_adjustments_config": OmegaConf.load(CONFIGS / "age_based_adjustments_config.yaml"),
+        "exercises_config": OmegaConf.load(CONFIGS / "exercises_config.yaml"),
+        "feedback_config": OmegaConf.load(CONFIGS / "feedback_config.yaml"),
+    }
+    train_weeks_templates = json.load(open(CONFIGS / "week_templates.json", encoding="utf-8"))
+    raw_df = pd.read_csv(ROOT / "data" / "exercises" / "sculpd_exercise_processed.csv", keep_default_na=False)
+    exercises_processor = ExercisesProcessor(raw_df, configs["exercises_config"]["exercises_processor"])
+    prompt_assets = PromptAssets(
+        str(CONFIGS / "training_program_examples"),
+        str(ROOT / "data" / "eric_recommendations" / "merged_recs.txt")
+    )
+    prompt_templates = PromptTemplates(configs["train_assistant_config"], train_weeks_templates)
+    scanner_data = json.load(open(ROOT / "data" / "scanner_info" / "scanner_output_30-34.json", encoding="utf-8"))
+    profiles = [
+        json.load(open(path, encoding="utf-8")) for path in sorted((ROOT / "data" / "user_data").glob("user_data_*.json"))
+    ]
+
+    def create_assistant(user_data: dict) -> TrainAssistant:
+        return TrainAssistant(
+            API_KEY="benchmark",
+            **configs,
+            raw_user_data=json.loads(json.dumps(user_data)),
+            raw_scanner_data=scanner_data,
+            train_weeks_templates=train_weeks_templates,
+            exercises_processor=exercises_processor,
+            prompt_assets=prompt_assets,
+            prompt_templates=prompt_templates,
+            llm_clients=object()
+        )
+
+    assistants = [create_assistant(user_data) for user_data in profiles]
+    first_weeks = [assistant.generate_first_week_rule_based() for assistant in assistants]
+    print(f"{len(profiles)} user profiles, {iterations} iterations")
+
+    runs = [
+        ("first week", lambda i: assistants[i].generate_first_week_rule_based()),
+        ("next week", lambda i: assistants[i].generate_next_week_rule_based("easy", json.loads(first_weeks[i]))),
+        ("first week + assistant", lambda i: create_assistant(profiles[i]).generate_first_week_rule_based()),
+    ]
+    for name, run in runs:
+        started = time.perf_counter()
+        for iteration in range(iterations):
+            run(iteration % len(profiles))
+        elapsed = time.perf_counter() - started
+        print(f"{name:>24}: {elapsed / iterations * 1e3:.2f} ms/plan, {iterations / elapsed:.0f} plans/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200, help="Plans per measurement")
+    args = parser.parse_args()
+    main(args.iterations)
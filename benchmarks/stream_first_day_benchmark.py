@@ -0,0 +1,109 @@
+"""
+Time to the first generated day: /generate_first_week (whole plan at once) vs. its SSE streaming
+variant, with the LLM replaced by a stub streaming data/examples/output_example.json token by token.
+
+Usage:
+    python -m benchmarks.stream_first_day_benchmark [--token-latency 0.005]
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+import argparse
+
+import httpx
+import uvicorn
+from langchain_core.messages import AIMessageChunk
+from langchain_core.runnables import RunnableGenerator
+
+from benchmarks.async_load_benchmark import ENVIRONMENT, ROOT
+
+
+PLAN_TEXT = json.dumps(json.load(open(ROOT / "data" / "examples" / "output_example.json", encoding="utf-8")), indent=2)
+TOKEN_CHARS = 4
+
+
+class StreamingStubLLMClients:
+    """Stands in for LLMClientRegistry: every model streams the example plan at a fixed token rate."""
+
+    def __init__(self, token_latency: float):
+        self.token_latency = token_latency
+
+    def get(self, model_name: str, temperature: float | None = None) -> RunnableGenerator:
+        def transform(inputs):
+            for _ in inputs:
+                pass
+            for start in range(0, len(PLAN_TEXT), TOKEN_CHARS):
+                time.sleep(self.token_latency)
+                yield AIMessageChunk(content=PLAN_TEXT[start:start + TOKEN_CHARS])
+
+        async def atransform(inputs):
+            async for _ in inputs:
+                pass
+            for start in range(0, len(PLAN_TEXT), TOKEN_CHARS):
+                await asyncio.sleep(self.token_latency)
+                yield AIMessageChunk(content=PLAN_TEXT[start:start + TOKEN_CHARS])
+
+        return RunnableGenerator(transform, atransform)
+
+    async def aclose(self) -> None:
+        pass
+
+
+async def main(token_latency: float, port: int):
+    for name, value in ENVIRONMENT.items():
+        os.environ[name] = str(value)
+    logging.disable(logging.WARNING)
+
+    from src.api.run import app, lifespan
+
+    payload = {
+        "user_info": json.load(open(ROOT / "data" / "user_data" / "user_data_30-34.json", encoding="utf-8")),
+        "scanner_info": json.load(open(ROOT / "data" / "scanner_info" / "scanner_output_30-34.json", encoding="utf-8")),
+    }
+
+    async with lifespan(app):
+        await app.state.llm_clients.aclose()
+        # identical benchmark requests would be served by the plan cache
+        app.state.plan_cache = None
+        app.state.single_flight = None
+        app.state.llm_clients = StreamingStubLLMClients(token_latency)
+
+        # a real server: httpx.ASGITransport buffers the whole response body
+        server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, lifespan="off", log_level="warning"))
+        serving = asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.01)
+
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=None) as client:
+            started = time.perf_counter()
+            response = await client.post("/generate_first_week", json=payload)
+            response.raise_for_status()
+            blocking = time.perf_counter() - started
+
+            first_day = None
+            events = []
+            started = time.perf_counter()
+            async with client.stream("POST", "/generate_first_week/stream", json=payload) as response:
+                async for line in response.aiter_lines():
+                    if line.startswith("event: "):
+                        events.append(line[len("event: "):])
+                        if first_day is None and events[-1] == "day":
+                            first_day = time.perf_counter() - started
+            streaming = time.perf_counter() - started
+
+        server.should_exit = True
+        await serving
+
+    print(f"Plan: {len(PLAN_TEXT)} characters, {len(PLAN_TEXT) // TOKEN_CHARS} tokens, {token_latency * 1e3:.0f} ms/token")
+    print(f"{'blocking response':>20}: first day {blocking:.2f} s, full plan {blocking:.2f} s")
+    print(f"{'SSE stream':>20}: first day {first_day:.2f} s, full plan {streaming:.2f} s, events {events.count('day')} day + {events[-1]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--token-latency", type=float, default=0.005, help="Stub LLM latency per token, seconds")
+    parser.add_argument("--port", type=int, default=8765, help="Local port of the benchmark server")
+    args = parser.parse_args()
+    asyncio.run(main(args.token_latency, args.port))
@@ -0,0 +1,122 @@
+import os
+import json
+import time
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Iterable
+
+
+def get_item_id(item_id, position: int) -> str:
+    """
+    Id of a batch item as a string (ids may be numbers), its 0-based position in the batch if it has none.
+    """
+    return str(item_id) if item_id is not None else str(position)
+
+
+async def run_batch(
+        items: Iterable,
+        execute: Callable[[object], Awaitable[dict]],
+        concurrency: int
+) -> AsyncIterator[dict]:
+    """
+    Executes the items with at most concurrency in flight, results are yielded as they complete
+    (not in the input order). Items are taken from the iterable lazily, a large input is never
+    materialized as tasks.
+
+    Args:
+        items: Batch items
+        execute: Coroutine function of an item returning its result dict, it should not raise
+        concurrency: Maximum number of items executed at once
+
+    Returns:
+        Results of execute with timings.queued (seconds the item waited for a free slot)
+    """
+    items = iter(items)
+    results = asyncio.Queue()
+    started = time.perf_counter()
+
+    async def worker() -> None:
+        for item in items:
+            queued = time.perf_counter() - started
+            result = await execute(item)
+            result.setdefault("timings", {})["queued"] = round(queued, 4)
+            await results.put(result)
+
+    async def run_workers() -> None:
+        try:
+            await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+        finally:
+            await results.put(None)
+
+    runner = asyncio.create_task(run_workers())
+    try:
+        while (result := await results.get()) is not None:
+            yield result
+        # re-raises a failure of execute
+        await runner
+    finally:
+        runner.cancel()
+
+
+def read_completed_ids(output_path: str) -> set:
+    """
+    Ids of the items with an "ok" result in the output JSONL. A partial last line
+    (a crash in the middle of a write) is truncated so that appended results start on a new line.
+    """
+    if not os.path.exists(output_path):
+        return set()
+
+    with open(output_path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+            data = data[:data.rfind(b"\n") + 1]
+
+    completed = set()
+    for line in data.decode("utf-8").splitlines():
+        if not line.strip():
+            continue
+        result = json.loads(line)
+        if result.get("status") == "ok":
+            completed.add(result["id"])
+    return completed
+
+
+def read_items(input_path: str, completed: set) -> Iterable[dict]:
+    """
+    Items of the input JSONL that are not completed yet, with get_item_id ids (blank lines are not items).
+    """
+    with open(input_path, encoding="utf-8") as f:
+        position = 0
+        for line in f:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            item["id"] = get_item_id(item.get("id"), position)
+            position += 1
+            if item["id"] not in completed:
+                yield item
+
+
+async def run_batch_file(
+        input_path: str,
+        output_path: str,
+        execute: Callable[[dict], Awaitable[dict]],
+        concurrency: int
+) -> dict:
+    """
+    Runs the input JSONL into the output JSONL, one result per line, flushed as it completes.
+    Resumable: items with an "ok" result in the output are skipped, failed ones are executed again
+    (their new result is appended, the last result of an id wins).
+
+    Returns:
+        Counts of the run: skipped, ok, error
+    """
+    completed = read_completed_ids(output_path)
+    counts = {"skipped": len(completed), "ok": 0, "error": 0}
+
+    with open(output_path, "a", encoding="utf-8") as output:
+        async for result in run_batch(read_items(input_path, completed), execute, concurrency):
+            output.write(json.dumps(result, ensure_ascii=False) + "\n")
+            output.flush()
+            counts["ok" if result["status"] == "ok" else "error"] += 1
+    return counts
@@ -0,0 +1,50 @@
+"""
+Offline batch runner: generates the requests of an input JSONL (one /generate_batch item per line)
+into an output JSONL with bounded concurrency, on one shared state (catalog, prompt assets, LLM client pool).
+Rerunning with the same output resumes after a crash: completed items are skipped.
+
+Usage:
+    python -m src.api.batch_cli --input requests.jsonl --output results.jsonl [--concurrency 8]
+"""
+import time
+import asyncio
+import argparse
+from types import SimpleNamespace
+
+from src.api.batch import run_batch_file
+from src.api.endpoints import BatchItem, generate_batch_item
+from src.api.state import load_state, close_state
+from src.logger import get_logger
+
+
+logger = get_logger(__name__)
+
+
+async def main(input_path: str, output_path: str, concurrency: int | None) -> dict:
+    state = SimpleNamespace()
+    load_state(state)
+    concurrency = concurrency or state.train_assistant_config["batch"]["concurrency"]
+
+    async def execute(item: dict) -> dict:
+        try:
+            batch_item = BatchItem.model_validate(item)
+        except Exception as e:
+            return {"id": item["id"], "status": "error", "error": str(e), "timings": {}}
+        return await generate_batch_item(state, batch_item)
+
+    started = time.perf_counter()
+    try:
+        counts = await run_batch_file(input_path, output_path, execute, concurrency)
+    finally:
+        await close_state(state)
+    logger.info(f"Batch finished in {time.perf_counter() - started:.1f} s: {counts}")
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--input", required=True, help="JSONL of batch items")
+    parser.add_argument("--output", required=True, help="JSONL of results, appended to when resuming")
+    parser.add_argument("--concurrency", type=int, default=None, help="Items generated at once, batch.concurrency if not set")
+    args = parser.parse_args()
+    asyncio.run(main(args.input, args.output, args.concurrency))
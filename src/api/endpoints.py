@@ -1,8 +1,21 @@
-from fastapi import APIRouter, HTTPException, Request
-from pydantic import BaseModel, Field
+import json
+import time
+import asyncio
+from typing import Literal
 
+from fastapi import APIRouter, Header, HTTPException, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field, field_validator
+
+from src.api.batch import get_item_id, run_batch
+from src.api.idempotency import IdempotencyConflict
+from src.api.jobs import JobQueueClosed
 from src.logger import get_logger
+from src.metrics import NO_TIMER, format_prometheus
+from src.training_plan.admission import AdmissionRejected
 from src.training_plan.train_assistant import TrainAssistant
+from src.training_plan.week_stream_parser import WeekStreamParser
 
 
 router = APIRouter()
@@ -12,76 +25,391 @@ logger = get_logger(__name__)
 class FirstWeekRequest(BaseModel):
     user_info: dict = Field(default_factory=dict, description="User data JSON")
     scanner_info: dict = Field(default_factory=dict, description="Scanner data JSON")
+    engine: Literal["llm", "rules"] | None = Field(default=None, description="Plan engine, the configured default if not set")
 
 
 class NextWeekRequest(BaseModel):
     user_info: dict = Field(default_factory=dict, description="User data JSON.")
     prev_week: dict = Field(default_factory=dict, description="Previous week training plan JSON.")
     feedback_key: str = Field(description="Feedback key ('easy', 'normal', 'hard').")
+    engine: Literal["llm", "rules"] | None = Field(default=None, description="Plan engine, the configured default if not set.")
 
 
-class TrainWeekResponse(BaseModel):
-    plan: dict = Field(..., description="Generated week training plan")
+class BatchItem(BaseModel):
+    id: str | None = Field(default=None, description="Item id returned with its result, the item position if not set.")
+    mode: Literal["first_week", "next_week"] = Field(description="Generated week.")
+    user_info: dict = Field(default_factory=dict, description="User data JSON.")
+    scanner_info: dict = Field(default_factory=dict, description="Scanner data JSON (first_week).")
+    prev_week: dict = Field(default_factory=dict, description="Previous week training plan JSON (next_week).")
+    feedback_key: str | None = Field(default=None, description="Feedback key ('easy', 'normal', 'hard') (next_week).")
+    engine: Literal["llm", "rules"] | None = Field(default=None, description="Plan engine, the configured default if not set.")
 
+    @field_validator("id", mode="before")
+    @classmethod
+    def coerce_id(cls, value):
+        # numeric ids are accepted and returned as strings
+        return str(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else value
 
-@router.get("/ping")
-def ping():
-    return {"message": "Successful ping"}
 
-@router.post("/generate_first_week", response_model=TrainWeekResponse)
-def generate_first_week(request_data: FirstWeekRequest, request: Request):
-    user_info = request_data.user_info
-    scanner_info = request_data.scanner_info
+class BatchRequest(BaseModel):
+    items: list[BatchItem] = Field(description="Generation requests.")
+    concurrency: int | None = Field(default=None, ge=1, description="Items generated at once, batch.concurrency if not set.")
 
-    try:
-        state = request.app.state
-        assistant = TrainAssistant(
+
+class FirstWeekJobRequest(FirstWeekRequest):
+    callback_url: str | None = Field(default=None, description="URL the finished job is POSTed to")
+
+
+class NextWeekJobRequest(NextWeekRequest):
+    callback_url: str | None = Field(default=None, description="URL the finished job is POSTed to.")
+
+
+class JobResponse(BaseModel):
+    job_id: str = Field(..., description="Id to poll at /jobs/{job_id}")
+    status: str = Field(..., description="Job status: queued, running, succeeded or failed")
+
+
+class TrainWeekResponse(BaseModel):
+    plan: dict = Field(..., description="Generated week training plan")
+
+
+def create_train_assistant(
+        state,
+        raw_user_data: dict,
+        raw_scanner_data: dict | None,
+        endpoint: str | None = None,
+        admission_lane: str | None = None
+):
+    stage_timers = state.stage_timers
+    with stage_timers.time("assistant_init", endpoint) if stage_timers is not None else NO_TIMER:
+        return TrainAssistant(
             API_KEY=state.api_key,
             train_assistant_config=state.train_assistant_config,
             data_processing_config=state.data_processing_config,
             age_based_adjustments_config=state.age_based_adjustments_config,
             exercises_config=state.exercises_config,
             feedback_config=state.feedback_config,
-            raw_user_data=user_info,
-            raw_scanner_data=scanner_info,
+            raw_user_data=raw_user_data,
+            raw_scanner_data=raw_scanner_data,
             train_weeks_templates=state.train_weeks_templates,
             exercises_processor=state.exercises_processor,
-            training_program_examples_dir=state.training_program_examples_dir,
-            eric_recommendations_path=state.eric_recommendations_path
+            prompt_assets=state.prompt_assets,
+            prompt_templates=state.prompt_templates,
+            llm_clients=state.llm_clients,
+            plan_cache=state.plan_cache,
+            single_flight=state.single_flight,
+            llm_resilience=state.llm_resilience,
+            plan_parser=state.plan_parser,
+            admission=state.admission,
+            admission_lane=admission_lane,
+            stage_timers=stage_timers,
+            endpoint=endpoint,
+            usage_meter=state.usage_meter,
+            prompt_budgeter=state.prompt_budgeter,
+            avatar_index=state.avatar_index
+        )
+
+
+def format_sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def stream_plan_events(assistant, chunks):
+    """
+    Emits a "day" event for every day object as soon as it is closed in the LLM output (a day that cannot be
+    parsed, even tolerantly, is skipped), then a "plan" event with the full plan parsed tolerantly
+    (or an "error" event).
+    """
+    parser = WeekStreamParser()
+    output = []
+    try:
+        async for chunk in chunks:
+            output.append(chunk)
+            for day_key, day_plan in parser.feed(chunk):
+                yield format_sse("day", {"day": day_key, "plan": day_plan})
+
+        json_plan = assistant.convert_result_to_json("".join(output).strip())
+        yield format_sse("plan", TrainWeekResponse(plan=json_plan).model_dump())
+    except AdmissionRejected as e:
+        yield format_sse("error", {"detail": str(e), "retry_after": e.retry_after})
+    except Exception as e:
+        logger.exception("Error streaming week plan")
+        yield format_sse("error", {"detail": str(e)})
+
+
+async def rule_based_chunks(generate_rule_based):
+    yield await run_in_threadpool(generate_rule_based)
+
+
+def sse_response(events) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/ping")
+async def ping():
+    return {"message": "Successful ping"}
+
+
+@router.get("/metrics")
+async def metrics(request: Request, format: Literal["json", "prometheus"] | None = None):
+    """
+    JSON snapshot of the service metrics, Prometheus text exposition with format=prometheus
+    or for scrapers (Accept: text/plain or application/openmetrics-text).
+    """
+    if format is None:
+        accept = request.headers.get("accept", "")
+        format = "prometheus" if "text/plain" in accept or "openmetrics" in accept else "json"
+    snapshot = await run_in_threadpool(request.app.state.metrics.collect)
+    if format == "json":
+        return snapshot
+    return PlainTextResponse(
+        format_prometheus(snapshot, request.app.state.stage_timers),
+        media_type="text/plain; version=0.0.4"
+    )
+
+
+async def run_idempotent(
+        request: Request,
+        response: Response,
+        idempotency_key: str | None,
+        request_data: BaseModel,
+        generate
+) -> dict:
+    """
+    Executes generate once per Idempotency-Key, retries with the key get the stored response.
+    """
+    store = request.app.state.idempotency
+    if not idempotency_key or store is None:
+        return await generate()
+
+    path = request.url.path
+    fingerprint = store.fingerprint(path, request_data.model_dump())
+    result, replayed = await store.run(f"{path}:{idempotency_key}", fingerprint, generate)
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+
+async def generate_with_engine(state, engine: str | None, agenerate, generate_rule_based) -> tuple:
+    """
+    Runs the requested (or default) plan engine. With engine.fallback a failed or over-budget
+    LLM generation is answered with the rule-based plan.
+
+    Returns:
+        (plan, engine of the plan: "llm", "rules" or "rules-fallback")
+    """
+    engine_config = state.train_assistant_config["engine"]
+    engine = engine or engine_config["default"]
+    if engine == "rules":
+        return await run_in_threadpool(generate_rule_based), "rules"
+
+    if not engine_config["fallback"]:
+        return await agenerate(), "llm"
+    try:
+        return await asyncio.wait_for(agenerate(), timeout=engine_config["llm_budget"]), "llm"
+    except AdmissionRejected:
+        # shed load: the client retries after Retry-After
+        raise
+    except Exception:
+        logger.exception("LLM generation failed, answering with the rule-based plan")
+        return await run_in_threadpool(generate_rule_based), "rules-fallback"
+
+
+async def generate_batch_item(state, item: BatchItem) -> dict:
+    """
+    Generates one batch item, a failure is reported in its result instead of failing the batch.
+
+    Returns:
+        {"id", "status": "ok" | "error", "engine", "plan" | "error", "timings": seconds by stage}
+    """
+    started = time.perf_counter()
+    timings = {}
+    result = {"id": item.id}
+    try:
+        scanner_info = item.scanner_info if item.mode == "first_week" else None
+        assistant = await run_in_threadpool(create_train_assistant, state, item.user_info, scanner_info, "batch", "batch")
+        timings["assistant"] = round(time.perf_counter() - started, 4)
+
+        if item.mode == "first_week":
+            plan, engine = await generate_with_engine(
+                state, item.engine, assistant.agenerate_first_week, assistant.generate_first_week_rule_based
+            )
+        else:
+            if item.feedback_key is None:
+                raise ValueError("feedback_key is required for next_week items")
+            plan, engine = await generate_with_engine(
+                state, item.engine,
+                lambda: assistant.agenerate_next_week(feedback_key=item.feedback_key, previous_week=item.prev_week),
+                lambda: assistant.generate_next_week_rule_based(item.feedback_key, item.prev_week)
+            )
+        result.update(status="ok", engine=engine, plan=assistant.convert_result_to_json(plan))
+        result["usage"] = assistant.token_usage.as_dict()
+    except AdmissionRejected as e:
+        result.update(status="error", error=str(e), retry_after=e.retry_after)
+    except Exception as e:
+        logger.exception(f"Error generating batch item {item.id}")
+        result.update(status="error", error=str(e))
+    timings["total"] = round(time.perf_counter() - started, 4)
+    if "assistant" in timings:
+        timings["generation"] = round(timings["total"] - timings["assistant"], 4)
+    result["timings"] = timings
+    return result
+
+
+@router.post("/generate_batch")
+async def generate_batch(request_data: BatchRequest, request: Request):
+    """
+    Generates the items with bounded concurrency on the shared app state,
+    results are streamed as NDJSON lines in the order they complete.
+    """
+    state = request.app.state
+    batch_config = state.train_assistant_config["batch"]
+    if len(request_data.items) > batch_config["max_items"]:
+        raise HTTPException(status_code=413, detail=f"At most {batch_config['max_items']} items per batch")
+
+    items = [
+        item.model_copy(update={"id": get_item_id(item.id, position)})
+        for position, item in enumerate(request_data.items)
+    ]
+    concurrency = request_data.concurrency or batch_config["concurrency"]
+
+    async def lines():
+        async for result in run_batch(items, lambda item: generate_batch_item(state, item), concurrency):
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.post("/generate_first_week", response_model=TrainWeekResponse)
+async def generate_first_week(
+        request_data: FirstWeekRequest,
+        request: Request,
+        response: Response,
+        idempotency_key: str | None = Header(default=None)
+):
+    user_info = request_data.user_info
+    scanner_info = request_data.scanner_info
+
+    async def generate() -> dict:
+        assistant = await run_in_threadpool(create_train_assistant, request.app.state, user_info, scanner_info, request.url.path)
+        plan, engine = await generate_with_engine(
+            request.app.state, request_data.engine,
+            assistant.agenerate_first_week, assistant.generate_first_week_rule_based
         )
-        plan = assistant.generate_first_week()
+        response.headers["X-Plan-Engine"] = engine
+        response.headers.update(assistant.token_usage.headers())
         json_plan = assistant.convert_result_to_json(plan)
-        return TrainWeekResponse(plan=json_plan)
+        return TrainWeekResponse(plan=json_plan).model_dump()
+
+    try:
+        return await run_idempotent(request, response, idempotency_key, request_data, generate)
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         logger.exception("Error generating first week")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/generate_next_week", response_model=TrainWeekResponse)
-def generate_next_week(request_data: NextWeekRequest, request: Request):
+async def generate_next_week(
+        request_data: NextWeekRequest,
+        request: Request,
+        response: Response,
+        idempotency_key: str | None = Header(default=None)
+):
     user_info = request_data.user_info
     prev_week = request_data.prev_week
     feedback_key = request_data.feedback_key
 
-    try:
-        state = request.app.state
-        assistant = TrainAssistant(
-            API_KEY=state.api_key,
-            train_assistant_config=state.train_assistant_config,
-            data_processing_config=state.data_processing_config,
-            age_based_adjustments_config=state.age_based_adjustments_config,
-            exercises_config=state.exercises_config,
-            feedback_config=state.feedback_config,
-            raw_user_data=user_info,
-            raw_scanner_data=None,
-            train_weeks_templates=state.train_weeks_templates,
-            exercises_processor=state.exercises_processor,
-            training_program_examples_dir=state.training_program_examples_dir,
-            eric_recommendations_path=state.eric_recommendations_path
+    async def generate() -> dict:
+        assistant = await run_in_threadpool(create_train_assistant, request.app.state, user_info, None, request.url.path)
+        plan, engine = await generate_with_engine(
+            request.app.state, request_data.engine,
+            lambda: assistant.agenerate_next_week(feedback_key=feedback_key, previous_week=prev_week),
+            lambda: assistant.generate_next_week_rule_based(feedback_key, prev_week)
         )
-        plan = assistant.generate_next_week(feedback_key=feedback_key, previous_week=prev_week)
+        response.headers["X-Plan-Engine"] = engine
+        response.headers.update(assistant.token_usage.headers())
         json_plan = assistant.convert_result_to_json(plan)
-        return TrainWeekResponse(plan=json_plan)
+        return TrainWeekResponse(plan=json_plan).model_dump()
+
+    try:
+        return await run_idempotent(request, response, idempotency_key, request_data, generate)
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         logger.exception("Error generating next week")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/generate_first_week/stream")
+async def stream_first_week(request_data: FirstWeekRequest, request: Request):
+    try:
+        assistant = await run_in_threadpool(
+            create_train_assistant, request.app.state, request_data.user_info, request_data.scanner_info, request.url.path
+        )
+    except Exception as e:
+        logger.exception("Error generating first week")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if (request_data.engine or request.app.state.train_assistant_config["engine"]["default"]) == "rules":
+        chunks = rule_based_chunks(assistant.generate_first_week_rule_based)
+    else:
+        chunks = assistant.astream_first_week()
+    return sse_response(stream_plan_events(assistant, chunks))
+
+
+@router.post("/generate_next_week/stream")
+async def stream_next_week(request_data: NextWeekRequest, request: Request):
+    try:
+        assistant = await run_in_threadpool(create_train_assistant, request.app.state, request_data.user_info, None, request.url.path)
+    except Exception as e:
+        logger.exception("Error generating next week")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if (request_data.engine or request.app.state.train_assistant_config["engine"]["default"]) == "rules":
+        chunks = rule_based_chunks(lambda: assistant.generate_next_week_rule_based(request_data.feedback_key, request_data.prev_week))
+    else:
+        chunks = assistant.astream_next_week(feedback_key=request_data.feedback_key, previous_week=request_data.prev_week)
+    return sse_response(stream_plan_events(assistant, chunks))
+
+
+async def submit_job(request: Request, mode: str, request_data: FirstWeekJobRequest | NextWeekJobRequest) -> dict:
+    jobs = request.app.state.jobs
+    if jobs is None:
+        raise HTTPException(status_code=404, detail="Jobs are disabled")
+
+    item = BatchItem(mode=mode, **request_data.model_dump(exclude={"callback_url"}))
+    try:
+        return await jobs.submit(item.model_dump(exclude={"id"}), request_data.callback_url)
+    except JobQueueClosed as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@router.post("/jobs/generate_first_week", status_code=202, response_model=JobResponse)
+async def submit_first_week_job(request_data: FirstWeekJobRequest, request: Request):
+    return await submit_job(request, "first_week", request_data)
+
+
+@router.post("/jobs/generate_next_week", status_code=202, response_model=JobResponse)
+async def submit_next_week_job(request_data: NextWeekJobRequest, request: Request):
+    return await submit_job(request, "next_week", request_data)
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, request: Request):
+    jobs = request.app.state.jobs
+    job = await jobs.get(job_id) if jobs is not None else None
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
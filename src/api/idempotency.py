@@ -0,0 +1,137 @@
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+import threading
+from typing import Awaitable, Callable
+
+from src.single_flight import SingleFlight
+
+
+class IdempotencyConflict(Exception):
+    """The Idempotency-Key was already used with a different request payload."""
+
+
+class IdempotencyStore:
+    """
+    Responses of generation requests stored by their Idempotency-Key for the backend ttl.
+
+    The first request with a key stores a pending record and executes, retries with the same key wait
+    for it (coalesced in-process, by polling the shared backend across workers) and get the stored response.
+    A pending record older than pending_timeout is considered abandoned and the retry executes again:
+    it is reclaimed with a compare-and-set on the record, so one worker wins. Every claim carries a new token,
+    and an execution only finishes (or releases) the record of its own claim.
+    Failed executions are not stored.
+    """
+
+    def __init__(self, backend, pending_timeout: float, poll_interval: float):
+        self.backend = backend
+        self.pending_timeout = pending_timeout
+        self.poll_interval = poll_interval
+        self.single_flight = SingleFlight()
+
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.replayed = 0
+        self.conflicts = 0
+
+    @staticmethod
+    def fingerprint(path: str, payload: dict) -> str:
+        body = json.dumps({"path": path, "payload": payload}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+    def __read(self, key: str) -> tuple:
+        """
+        Returns:
+            (record or None, its raw value)
+        """
+        value = self.backend.get(key)
+        return (json.loads(value) if value is not None else None), value
+
+    def __claim(self, key: str, value: str | None, fingerprint: str) -> str | None:
+        """
+        Returns:
+            Pending record of the claim, None if another worker claimed the key first
+        """
+        pending = json.dumps({
+            "status": "pending", "fingerprint": fingerprint, "started_at": time.time(), "claim": uuid.uuid4().hex,
+        })
+        if value is None:
+            claimed = self.backend.add(key, pending)
+        else:
+            # abandoned pending record of a crashed or stuck worker, reclaimed only if it is still the same
+            claimed = self.backend.replace(key, value, pending)
+        return pending if claimed else None
+
+    async def __execute(self, key: str, fingerprint: str, execute: Callable[[], Awaitable[dict]]) -> tuple:
+        """
+        Returns:
+            (response, fingerprint of the request that produced it, replayed)
+        """
+        while True:
+            record, value = await asyncio.to_thread(self.__read, key)
+
+            if record is not None and record["status"] == "done":
+                return record["response"], record["fingerprint"], True
+
+            if record is not None and record["fingerprint"] != fingerprint:
+                return None, record["fingerprint"], True
+
+            abandoned = record is not None and time.time() - record["started_at"] > self.pending_timeout
+            if record is None or abandoned:
+                pending = await asyncio.to_thread(self.__claim, key, value, fingerprint)
+                if pending is None:
+                    continue
+
+                try:
+                    response = await execute()
+                except BaseException:
+                    await asyncio.to_thread(self.backend.delete, key, pending)
+                    raise
+
+                done = json.dumps({"status": "done", "fingerprint": fingerprint, "response": response})
+                # a record reclaimed meanwhile belongs to the other execution
+                await asyncio.to_thread(self.backend.replace, key, pending, done)
+                with self._lock:
+                    self.executed += 1
+                return response, fingerprint, False
+
+            await asyncio.sleep(self.poll_interval)
+
+    async def run(self, key: str, fingerprint: str, execute: Callable[[], Awaitable[dict]]) -> tuple:
+        """
+        Args:
+            key: Idempotency-Key namespaced by the endpoint
+            fingerprint: Fingerprint of the request payload
+            execute: Coroutine function producing the JSON-serializable response
+
+        Returns:
+            (response, replayed)
+        """
+        executed_here = []
+
+        async def execute_once() -> tuple:
+            executed_here.append(True)
+            return await self.__execute(key, fingerprint, execute)
+
+        response, response_fingerprint, replayed = await self.single_flight.ado(key, execute_once)
+
+        with self._lock:
+            if response_fingerprint != fingerprint:
+                self.conflicts += 1
+                raise IdempotencyConflict(f"Idempotency-Key {key} was used with a different payload")
+            replayed = replayed or not executed_here
+            if replayed:
+                self.replayed += 1
+        return response, replayed
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self.backend.stats(),
+                "executed": self.executed,
+                "replayed": self.replayed,
+                "conflicts": self.conflicts,
+                "in_flight": self.single_flight.stats()["in_flight"],
+            }
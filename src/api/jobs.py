@@ -0,0 +1,386 @@
+import os
+import hmac
+import json
+import time
+import uuid
+import socket
+import random
+import asyncio
+import sqlite3
+import hashlib
+import ipaddress
+import threading
+from typing import Awaitable, Callable
+from urllib.parse import urlparse
+
+import httpx
+from omegaconf import DictConfig
+
+from src.logger import get_logger
+
+
+logger = get_logger(__name__)
+
+class JobQueueClosed(Exception):
+    """The job queue is draining for shutdown and does not accept jobs."""
+
+
+class JobStore:
+    """
+    Job state persisted in a local SQLite database: jobs survive a restart of the worker,
+    finished jobs are deleted after ttl seconds.
+    """
+
+    def __init__(self, path: str, ttl: float | None):
+        self.path = path
+        self.ttl = ttl
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, payload TEXT NOT NULL, callback_url TEXT, status TEXT NOT NULL, result TEXT, "
+            "webhook_status TEXT, created_at REAL NOT NULL, started_at REAL, finished_at REAL, heartbeat_at REAL)"
+        )
+        columns = [row[1] for row in self._connection.execute("PRAGMA table_info(jobs)").fetchall()]
+        if "heartbeat_at" not in columns:
+            self._connection.execute("ALTER TABLE jobs ADD COLUMN heartbeat_at REAL")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+
+    def __execute(self, query: str, parameters: tuple = ()) -> list:
+        with self._lock:
+            return self._connection.execute(query, parameters).fetchall()
+
+    def __update(self, query: str, parameters: tuple = ()) -> int:
+        with self._lock:
+            return self._connection.execute(query, parameters).rowcount
+
+    def create(self, payload: dict, callback_url: str | None) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self.__execute(
+            "INSERT INTO jobs (id, payload, callback_url, status, created_at) VALUES (?, ?, ?, 'queued', ?)",
+            (job_id, json.dumps(payload, ensure_ascii=False), callback_url, now)
+        )
+        if self.ttl is not None:
+            self.__execute(
+                "DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND finished_at <= ?", (now - self.ttl,)
+            )
+        return job_id
+
+    def get(self, job_id: str) -> dict | None:
+        rows = self.__execute(
+            "SELECT id, payload, callback_url, status, result, webhook_status, created_at, started_at, finished_at "
+            "FROM jobs WHERE id = ?", (job_id,)
+        )
+        if not rows:
+            return None
+        job_id, payload, callback_url, status, result, webhook_status, created_at, started_at, finished_at = rows[0]
+        return {
+            "job_id": job_id,
+            "payload": json.loads(payload),
+            "callback_url": callback_url,
+            "status": status,
+            "result": json.loads(result) if result is not None else None,
+            "webhook_status": webhook_status,
+            "created_at": created_at,
+            "started_at": started_at,
+            "finished_at": finished_at,
+        }
+
+    def claim(self, job_id: str) -> bool:
+        """Marks a queued job running, False if another worker (or process sharing the store) claimed it."""
+        now = time.time()
+        return self.__update(
+            "UPDATE jobs SET status = 'running', started_at = ?, heartbeat_at = ? WHERE id = ? AND status = 'queued'",
+            (now, now, job_id)
+        ) == 1
+
+    def heartbeat(self, job_id: str) -> None:
+        self.__execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND status = 'running'", (time.time(), job_id))
+
+    def finish(self, job_id: str, status: str, result: dict) -> None:
+        self.__execute(
+            "UPDATE jobs SET status = ?, result = ?, finished_at = ? WHERE id = ?",
+            (status, json.dumps(result, ensure_ascii=False), time.time(), job_id)
+        )
+
+    def set_webhook_status(self, job_id: str, webhook_status: str) -> None:
+        self.__execute("UPDATE jobs SET webhook_status = ? WHERE id = ?", (webhook_status, job_id))
+
+    def requeue(self, job_id: str) -> None:
+        # a job interrupted while delivering its webhook is finished already
+        self.__execute(
+            "UPDATE jobs SET status = 'queued', started_at = NULL, heartbeat_at = NULL WHERE id = ? AND status = 'running'",
+            (job_id,)
+        )
+
+    def get_queued_ids(self, stale_timeout: float) -> list:
+        """
+        Queued jobs, oldest first. Running jobs without a heartbeat for stale_timeout seconds were left by
+        a worker that stopped without draining them and are queued again.
+        """
+        self.__update(
+            "UPDATE jobs SET status = 'queued', started_at = NULL, heartbeat_at = NULL "
+            "WHERE status = 'running' AND COALESCE(heartbeat_at, started_at) <= ?",
+            (time.time() - stale_timeout,)
+        )
+        return [row[0] for row in self.__execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at")]
+
+    def count_by_status(self) -> dict:
+        return dict(self.__execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"))
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+def is_public_address(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+class JobQueue:
+    """
+    Generation jobs executed in the background by a pool of async workers of the API event loop.
+    Results are polled from the store or POSTed to the callback URL of the job, signed with
+    the HMAC-SHA256 of the timestamp and the body. A running job refreshes its heartbeat in the store,
+    so that only the jobs of a stopped worker are taken over as stale.
+
+    At shutdown the queue drains: it stops accepting jobs, in-flight jobs get drain_timeout seconds to finish,
+    the interrupted ones are requeued. Queued jobs are resumed at the next start.
+    """
+
+    SIGNATURE_HEADER = "X-Webhook-Signature"
+    TIMESTAMP_HEADER = "X-Webhook-Timestamp"
+
+    def __init__(
+            self,
+            store: JobStore,
+            config: DictConfig,
+            http_client: httpx.AsyncClient | None = None,
+            webhook_secret: str | None = None
+    ):
+        """
+        Args:
+            webhook_secret: Key of the webhook signatures, callback URLs are rejected without it
+        """
+        self.store = store
+        self.workers = config["workers"]
+        self.drain_timeout = config["drain_timeout"]
+        self.heartbeat_interval = config["heartbeat_interval"]
+        self.stale_timeout = config["stale_timeout"]
+        if self.stale_timeout <= 2 * self.heartbeat_interval:
+            raise ValueError("jobs.stale_timeout must be longer than two heartbeat intervals")
+        self.webhook_config = config["webhook"]
+        self.webhook_secret = webhook_secret
+        self.http_client = http_client
+
+        self.execute = None
+        self.queue = None
+        self.slots = None
+        self.dispatcher = None
+        self.in_flight = {}
+        self.closed = False
+
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.requeued = 0
+        self.webhooks_delivered = 0
+        self.webhooks_failed = 0
+
+    def start(self, execute: Callable[[str, dict], Awaitable[dict]]) -> None:
+        """
+        Starts the workers in the running event loop and resumes the unfinished jobs of the store.
+
+        Args:
+            execute: Coroutine function of the job id and payload returning the result dict with a "status" ("ok" | "error")
+        """
+        self.execute = execute
+        self.queue = asyncio.Queue()
+        self.slots = asyncio.Semaphore(self.workers)
+        if self.http_client is None:
+            self.http_client = httpx.AsyncClient(timeout=self.webhook_config["timeout"])
+
+        queued = self.store.get_queued_ids(self.stale_timeout)
+        for job_id in queued:
+            self.queue.put_nowait(job_id)
+        if queued:
+            logger.info(f"Resuming {len(queued)} queued jobs")
+        self.dispatcher = asyncio.create_task(self.__dispatch())
+
+    def validate_callback_url(self, callback_url: str) -> None:
+        """
+        Hosts of allowed_hosts are trusted. With an empty allowed_hosts any host is accepted whose addresses
+        are all public: private, loopback, link-local and reserved addresses are rejected after DNS resolution.
+        Blocks on DNS.
+        """
+        if not self.webhook_secret:
+            raise ValueError("Callback URLs are disabled: the webhook secret is not set")
+        url = urlparse(callback_url)
+        if url.scheme not in ("http", "https") or not url.hostname:
+            raise ValueError(f"Invalid callback URL: {callback_url}")
+        allowed_hosts = self.webhook_config["allowed_hosts"]
+        if allowed_hosts:
+            if url.hostname not in allowed_hosts:
+                raise ValueError(f"Callback host {url.hostname} is not allowed")
+            return
+        try:
+            addresses = {info[4][0] for info in socket.getaddrinfo(url.hostname, url.port, type=socket.SOCK_STREAM)}
+        except (socket.gaierror, UnicodeError):
+            raise ValueError(f"Callback host {url.hostname} cannot be resolved")
+        if not all(is_public_address(address) for address in addresses):
+            raise ValueError(f"Callback host {url.hostname} is not a public address")
+
+    def sign(self, timestamp: str, content: bytes) -> str:
+        digest = hmac.new(self.webhook_secret.encode("utf-8"), timestamp.encode("ascii") + b"." + content, hashlib.sha256)
+        return f"sha256={digest.hexdigest()}"
+
+    async def submit(self, payload: dict, callback_url: str | None = None) -> dict:
+        if self.closed or self.dispatcher is None:
+            raise JobQueueClosed("Job queue is not accepting jobs")
+        if callback_url is not None:
+            await asyncio.to_thread(self.validate_callback_url, callback_url)
+
+        job_id = await asyncio.to_thread(self.store.create, payload, callback_url)
+        self.queue.put_nowait(job_id)
+        with self._lock:
+            self.submitted += 1
+        return {"job_id": job_id, "status": "queued"}
+
+    async def get(self, job_id: str) -> dict | None:
+        job = await asyncio.to_thread(self.store.get, job_id)
+        if job is not None:
+            del job["payload"]
+        return job
+
+    async def __dispatch(self) -> None:
+        while True:
+            job_id = await self.queue.get()
+            await self.slots.acquire()
+            task = asyncio.create_task(self.__run(job_id))
+            self.in_flight[job_id] = task
+            task.add_done_callback(lambda _, job_id=job_id: self.__release(job_id))
+
+    def __release(self, job_id: str) -> None:
+        self.in_flight.pop(job_id, None)
+        self.slots.release()
+
+    async def __run(self, job_id: str) -> None:
+        if not await asyncio.to_thread(self.store.claim, job_id):
+            return
+        job = await asyncio.to_thread(self.store.get, job_id)
+        heartbeat = asyncio.create_task(self.__heartbeat(job_id))
+        try:
+            result = await self.execute(job_id, job["payload"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception(f"Job {job_id} failed")
+            result = {"status": "error", "error": str(e)}
+        finally:
+            heartbeat.cancel()
+
+        status = "succeeded" if result.get("status") == "ok" else "failed"
+        await asyncio.to_thread(self.store.finish, job_id, status, result)
+        with self._lock:
+            if status == "succeeded":
+                self.succeeded += 1
+            else:
+                self.failed += 1
+
+        if job["callback_url"]:
+            await self.__deliver(job_id, job["callback_url"], {"job_id": job_id, "status": status, "result": result})
+
+    async def __heartbeat(self, job_id: str) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            await asyncio.to_thread(self.store.heartbeat, job_id)
+
+    async def __deliver(self, job_id: str, callback_url: str, body: dict) -> None:
+        """
+        POSTs the finished job to its callback URL, retried with jittered exponential backoff on errors and 5xx.
+        The URL is validated again: its host may resolve to other addresses than at submission.
+        """
+        try:
+            await asyncio.to_thread(self.validate_callback_url, callback_url)
+        except ValueError as e:
+            logger.warning(f"Webhook of job {job_id} not sent: {e}")
+            await asyncio.to_thread(self.store.set_webhook_status, job_id, "rejected (callback URL)")
+            with self._lock:
+                self.webhooks_failed += 1
+            return
+
+        content = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        max_attempts = self.webhook_config["max_attempts"]
+        webhook_status = "failed"
+        for attempt in range(max_attempts):
+            timestamp = str(int(time.time()))
+            headers = {
+                "Content-Type": "application/json",
+                self.TIMESTAMP_HEADER: timestamp,
+                self.SIGNATURE_HEADER: self.sign(timestamp, content),
+            }
+            try:
+                response = await self.http_client.post(callback_url, content=content, headers=headers)
+                if response.status_code < 500:
+                    webhook_status = "delivered" if response.is_success else f"rejected ({response.status_code})"
+                    break
+            except httpx.HTTPError as e:
+                logger.warning(f"Webhook of job {job_id} failed: {e}")
+            if attempt + 1 < max_attempts:
+                await asyncio.sleep(random.uniform(0, self.webhook_config["backoff"] * 2 ** attempt))
+
+        await asyncio.to_thread(self.store.set_webhook_status, job_id, webhook_status)
+        with self._lock:
+            if webhook_status == "delivered":
+                self.webhooks_delivered += 1
+            else:
+                self.webhooks_failed += 1
+
+    async def drain(self) -> None:
+        """
+        Stops accepting jobs and waits up to drain_timeout seconds for the in-flight jobs,
+        the interrupted ones are requeued for the next start.
+        """
+        self.closed = True
+        if self.dispatcher is None:
+            return
+        self.dispatcher.cancel()
+
+        in_flight = dict(self.in_flight)
+        if in_flight:
+            logger.info(f"Draining {len(in_flight)} in-flight jobs")
+            _, pending = await asyncio.wait(in_flight.values(), timeout=self.drain_timeout)
+            for job_id, task in in_flight.items():
+                if task in pending:
+                    task.cancel()
+                    await asyncio.to_thread(self.store.requeue, job_id)
+                    with self._lock:
+                        self.requeued += 1
+            if pending:
+                await asyncio.wait(pending)
+        await self.http_client.aclose()
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = {
+                "submitted": self.submitted,
+                "succeeded": self.succeeded,
+                "failed": self.failed,
+                "requeued": self.requeued,
+                "webhooks_delivered": self.webhooks_delivered,
+                "webhooks_failed": self.webhooks_failed,
+            }
+        return {
+            **counters,
+            "queued": self.queue.qsize() if self.queue is not None else 0,
+            "in_flight": len(self.in_flight),
+            "store": self.store.count_by_status(),
+        }
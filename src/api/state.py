@@ -0,0 +1,173 @@
+import os
+import json
+import dotenv
+from omegaconf import OmegaConf
+
+from src.api.idempotency import IdempotencyStore
+from src.api.jobs import JobQueue, JobStore
+from src.cache_backends import create_cache_backend
+from src.logger import get_logger
+from src.exercises.exercises_snapshot import load_exercises_processor
+from src.metrics import MetricsRegistry, StageTimers
+from src.single_flight import SingleFlight
+from src.training_plan.admission import AdmissionController
+from src.training_plan.avatar_index import AvatarIndex
+from src.training_plan.llm_clients import LLMClientRegistry
+from src.training_plan.llm_resilience import LLMResilience
+from src.training_plan.plan_cache import PlanCache
+from src.training_plan.plan_parser import PlanParser
+from src.training_plan.prompt_assets import PromptAssets
+from src.training_plan.prompt_templates import PromptTemplates
+from src.training_plan.prompt_budget import PromptBudgeter
+from src.training_plan.token_counter import TokenCounter
+from src.training_plan.token_usage import UsageMeter
+from src.training_plan.train_assistant import TrainAssistant
+
+
+logger = get_logger(__name__)
+
+
+def load_state(state) -> None:
+    """
+    Loads the configs and builds the shared, precomputed objects (catalog, prompt assets and templates,
+    LLM client pool, caches) from the environment onto state: app.state of the API or any namespace
+    of an offline runner.
+    """
+    dotenv.load_dotenv()
+
+    api_key = os.getenv("API_KEY")
+    if not api_key:
+        raise RuntimeError("API_KEY is not set in environment variables")
+    state.api_key = api_key
+
+    state.train_assistant_config = OmegaConf.load(os.getenv("TRAIN_ASSISTANT_CONFIG_PATH"))
+    state.data_processing_config = OmegaConf.load(os.getenv("DATA_PROCESSING_CONFIG_PATH"))
+    state.age_based_adjustments_config = OmegaConf.load(os.getenv("AGE_BASED_ADJUSTMENTS_CONFIG_PATH"))
+    state.exercises_config = OmegaConf.load(os.getenv("EXERCISES_CONFIG_PATH"))
+    state.feedback_config = OmegaConf.load(os.getenv("FEEDBACK_CONFIG_PATH"))
+    state.train_weeks_templates = json.load(
+        open(os.getenv("TRAIN_WEEKS_TEMPLATES_PATH"), encoding="utf-8")
+    )
+    state.prompt_assets = PromptAssets(
+        training_program_examples_dir=os.getenv("TRAINING_PROGRAM_EXAMPLES_DIR"),
+        eric_recommendations_path=os.getenv("ERIC_RECOMMENDATIONS_PATH"),
+        check_interval=state.train_assistant_config["prompt_assets"]["check_interval"],
+        artifacts_dir=os.getenv("PROMPT_ASSETS_ARTIFACTS_DIR"),
+        variant=state.train_assistant_config["prompt_distillation"]["variant"]
+    )
+    state.prompt_templates = PromptTemplates(state.train_assistant_config, state.train_weeks_templates)
+    # a misconfigured generation mode fails the startup, not every request
+    TrainAssistant.get_generation_mode(state.train_assistant_config)
+
+    avatar_selection_config = state.train_assistant_config["avatar_selection"]
+    state.avatar_index = None
+    if avatar_selection_config["enabled"]:
+        state.avatar_index = AvatarIndex.from_dir(
+            os.getenv("AVATARS_USER_DATA_DIR"),
+            state.data_processing_config["user_data_processing"],
+            avatar_selection_config
+        )
+        unprofiled = set(state.prompt_assets.snapshot().avatar_example_names) - set(state.avatar_index.names)
+        if unprofiled:
+            logger.warning(f"Avatar examples without a profile are kept in every prompt: {sorted(unprofiled)}")
+
+    state.prompt_templates.warm_up(state.prompt_assets.snapshot())
+
+    ex_cfg = state.exercises_config["exercises_processor"]
+    state.exercises_processor = load_exercises_processor(
+        os.getenv("EXERCISES_RAW_DF_PATH"), os.getenv("EXERCISES_SNAPSHOT_PATH"), ex_cfg
+    )
+
+    state.llm_clients = LLMClientRegistry(
+        api_key,
+        state.train_assistant_config["llm_clients"],
+        resilience=state.train_assistant_config["llm_resilience"]["enabled"]
+    )
+
+    token_counter_config = state.train_assistant_config["token_counter"]
+    state.token_counter = TokenCounter(token_counter_config["encoding"], token_counter_config["chars_per_token"])
+    token_usage_config = state.train_assistant_config["token_usage"]
+    state.usage_meter = UsageMeter(token_usage_config, state.token_counter) if token_usage_config["enabled"] else None
+    admission_config = state.train_assistant_config["admission"]
+    state.admission = AdmissionController(admission_config, state.token_counter) if admission_config["enabled"] else None
+    prompt_budget_config = state.train_assistant_config["prompt_budget"]
+    state.prompt_budgeter = PromptBudgeter(prompt_budget_config, state.token_counter) if prompt_budget_config["enabled"] else None
+
+    llm_resilience_config = state.train_assistant_config["llm_resilience"]
+    state.llm_resilience = None
+    if llm_resilience_config["enabled"]:
+        # the abandoned request of a timed out sync attempt holds its executor thread until the client timeout
+        if state.train_assistant_config["llm_clients"]["timeout"] > llm_resilience_config["attempt_timeout"]:
+            raise ValueError("llm_clients.timeout must not exceed llm_resilience.attempt_timeout")
+        state.llm_resilience = LLMResilience(llm_resilience_config)
+
+    plan_cache_config = state.train_assistant_config["plan_cache"]
+    state.plan_cache = None
+    if plan_cache_config["enabled"]:
+        plan_cache_version = PlanCache.compute_version(
+            state.train_assistant_config,
+            state.data_processing_config,
+            state.age_based_adjustments_config,
+            state.exercises_config,
+            state.feedback_config,
+            state.train_weeks_templates,
+            # the prompt budget trims by the counts of the method in effect, not the configured encoding
+            {"token_counter": state.token_counter.method}
+        )
+        state.plan_cache = PlanCache(create_cache_backend(plan_cache_config, prefix="plan_cache"), plan_cache_version)
+
+    state.single_flight = SingleFlight()
+    state.plan_parser = PlanParser()
+
+    idempotency_config = state.train_assistant_config["idempotency"]
+    state.idempotency = None
+    if idempotency_config["enabled"]:
+        state.idempotency = IdempotencyStore(
+            create_cache_backend(idempotency_config, prefix="idempotency"),
+            pending_timeout=idempotency_config["pending_timeout"],
+            poll_interval=idempotency_config["poll_interval"]
+        )
+
+    jobs_config = state.train_assistant_config["jobs"]
+    state.jobs = None
+    if jobs_config["enabled"]:
+        state.jobs = JobQueue(
+            JobStore(jobs_config["sqlite_path"], ttl=jobs_config["ttl"]),
+            jobs_config,
+            webhook_secret=os.getenv("JOBS_WEBHOOK_SECRET")
+        )
+
+    metrics_config = state.train_assistant_config["metrics"]
+    state.stage_timers = StageTimers(metrics_config["stage_buckets"]) if metrics_config["stage_timers"] else None
+
+    state.metrics = MetricsRegistry()
+    state.metrics.register("llm_pool", state.llm_clients.pool_metrics)
+    if state.llm_resilience is not None:
+        state.metrics.register("llm_resilience", state.llm_resilience.stats)
+    if state.admission is not None:
+        state.metrics.register("admission", state.admission.stats)
+    if state.usage_meter is not None:
+        state.metrics.register("token_usage", state.usage_meter.stats)
+    if state.prompt_budgeter is not None:
+        state.metrics.register("prompt_budget", state.prompt_budgeter.stats)
+    state.metrics.register("exercises_cache", state.exercises_processor.available_exercises_cache.stats)
+    if state.plan_cache is not None:
+        state.metrics.register("plan_cache", state.plan_cache.stats)
+    state.metrics.register("single_flight", state.single_flight.stats)
+    state.metrics.register("plan_parser", state.plan_parser.stats)
+    if state.idempotency is not None:
+        state.metrics.register("idempotency", state.idempotency.stats)
+    if state.jobs is not None:
+        state.metrics.register("jobs", state.jobs.stats)
+    if state.stage_timers is not None:
+        state.metrics.register("stages", state.stage_timers.stats)
+
+
+async def close_state(state) -> None:
+    # in-flight jobs still use the LLM clients
+    if state.jobs is not None:
+        await state.jobs.drain()
+        state.jobs.store.close()
+    await state.llm_clients.aclose()
+    if state.llm_resilience is not None:
+        state.llm_resilience.close()
@@ -0,0 +1,262 @@
+import os
+import time
+import sqlite3
+import threading
+
+from omegaconf import DictConfig
+
+from src.lru_cache import LRUCache
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+class MemoryCacheBackend:
+    """In-process string store: bounded LRU with ttl, private to one worker."""
+
+    def __init__(self, maxsize: int, ttl: float | None):
+        self.cache = LRUCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> str | None:
+        return self.cache.get(key)
+
+    def set(self, key: str, value: str) -> None:
+        self.cache.put(key, value)
+
+    def add(self, key: str, value: str) -> bool:
+        """Sets the value only if the key is absent, returns True if it was set."""
+        with self._lock:
+            if self.cache.get(key) is not None:
+                return False
+            self.cache.put(key, value)
+            return True
+
+    def replace(self, key: str, expected: str, value: str) -> bool:
+        """Sets the value only if the current one is expected (compare-and-set), returns True if it was set."""
+        with self._lock:
+            if self.cache.get(key) != expected:
+                return False
+            self.cache.put(key, value)
+            return True
+
+    def delete(self, key: str, expected: str | None = None) -> None:
+        """Deletes the key, only if its value is expected when given."""
+        with self._lock:
+            if expected is None or self.cache.get(key) == expected:
+                self.cache.pop(key)
+
+    def clear(self) -> None:
+        self.cache.clear()
+
+    def stats(self) -> dict:
+        return {"backend": "memory", "size": len(self.cache), "maxsize": self.cache.maxsize}
+
+
+class SQLiteCacheBackend:
+    """
+    On-disk string store shared by all workers of a host. Entries expire after ttl seconds,
+    the least recently read entries are evicted above maxsize.
+    """
+
+    def __init__(self, path: str, maxsize: int, ttl: float | None, table: str = "cache"):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid SQLite cache table name: {table}")
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.table = table
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL, accessed_at REAL NOT NULL)"
+        )
+        self._connection.execute(f"CREATE INDEX IF NOT EXISTS {table}_accessed_at ON {table} (accessed_at)")
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                f"SELECT value FROM {self.table} WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)", (key, now)
+            ).fetchone()
+            if row is None:
+                return None
+            self._connection.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                self._connection.execute(
+                    f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, value, expires_at, now)
+                )
+                self._connection.execute(f"DELETE FROM {self.table} WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+                self._connection.execute(
+                    f"DELETE FROM {self.table} WHERE key IN ("
+                    f"SELECT key FROM {self.table} ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.maxsize,)
+                )
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+
+    def add(self, key: str, value: str) -> bool:
+        """Sets the value only if the key is absent (or expired), returns True if it was set."""
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                self._connection.execute(
+                    f"DELETE FROM {self.table} WHERE key = ? AND expires_at IS NOT NULL AND expires_at <= ?", (key, now)
+                )
+                cursor = self._connection.execute(
+                    f"INSERT OR IGNORE INTO {self.table} (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, value, expires_at, now)
+                )
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+        return cursor.rowcount == 1
+
+    def replace(self, key: str, expected: str, value: str) -> bool:
+        """Sets the value only if the current (unexpired) one is expected, returns True if it was set."""
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl is not None else None
+        with self._lock:
+            cursor = self._connection.execute(
+                f"UPDATE {self.table} SET value = ?, expires_at = ?, accessed_at = ? "
+                "WHERE key = ? AND value = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (value, expires_at, now, key, expected, now)
+            )
+        return cursor.rowcount == 1
+
+    def delete(self, key: str, expected: str | None = None) -> None:
+        with self._lock:
+            if expected is None:
+                self._connection.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            else:
+                self._connection.execute(f"DELETE FROM {self.table} WHERE key = ? AND value = ?", (key, expected))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connection.execute(f"DELETE FROM {self.table}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = self._connection.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        return {"backend": "sqlite", "size": size, "maxsize": self.maxsize}
+
+
+class RedisCacheBackend:
+    """
+    String store on a Redis-protocol server shared by all hosts. Expiry uses the server ttl,
+    recency is kept in a sorted set and the least recently read entries are evicted above maxsize.
+    Requires the optional redis package.
+    """
+    # compare-and-set and compare-and-delete run atomically on the server
+    REPLACE_SCRIPT = (
+        "if redis.call('GET', KEYS[1]) ~= ARGV[1] then return 0 end "
+        "if ARGV[3] == '' then redis.call('SET', KEYS[1], ARGV[2]) "
+        "else redis.call('SET', KEYS[1], ARGV[2], 'PX', ARGV[3]) end "
+        "return 1"
+    )
+    DELETE_SCRIPT = "if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1]) end return 0"
+
+    def __init__(self, url: str, maxsize: int, ttl: float | None, prefix: str = "cache"):
+        if redis is None:
+            raise RuntimeError("Redis cache backend requires the redis package: pip install redis")
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.prefix = prefix
+        self.index_key = f"{prefix}:index"
+
+    def __entry_key(self, key: str) -> str:
+        return f"{self.prefix}:entry:{key}"
+
+    def get(self, key: str) -> str | None:
+        value = self.client.get(self.__entry_key(key))
+        if value is None:
+            self.client.zrem(self.index_key, key)
+            return None
+        self.client.zadd(self.index_key, {key: time.time()})
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        pipeline = self.client.pipeline()
+        if self.ttl is not None:
+            pipeline.set(self.__entry_key(key), value, px=int(self.ttl * 1000))
+        else:
+            pipeline.set(self.__entry_key(key), value)
+        pipeline.zadd(self.index_key, {key: time.time()})
+        pipeline.zcard(self.index_key)
+        size = pipeline.execute()[-1]
+
+        if size > self.maxsize:
+            evicted = self.client.zpopmin(self.index_key, size - self.maxsize)
+            if evicted:
+                self.client.delete(*(self.__entry_key(evicted_key) for evicted_key, _ in evicted))
+
+    def add(self, key: str, value: str) -> bool:
+        """Sets the value only if the key is absent, returns True if it was set."""
+        px = int(self.ttl * 1000) if self.ttl is not None else None
+        if not self.client.set(self.__entry_key(key), value, px=px, nx=True):
+            return False
+        self.client.zadd(self.index_key, {key: time.time()})
+        return True
+
+    def replace(self, key: str, expected: str, value: str) -> bool:
+        """Sets the value only if the current one is expected (compare-and-set), returns True if it was set."""
+        px = str(int(self.ttl * 1000)) if self.ttl is not None else ""
+        if not self.client.eval(self.REPLACE_SCRIPT, 1, self.__entry_key(key), expected, value, px):
+            return False
+        self.client.zadd(self.index_key, {key: time.time()})
+        return True
+
+    def delete(self, key: str, expected: str | None = None) -> None:
+        if expected is None:
+            self.client.delete(self.__entry_key(key))
+        elif not self.client.eval(self.DELETE_SCRIPT, 1, self.__entry_key(key), expected):
+            return
+        self.client.zrem(self.index_key, key)
+
+    def clear(self) -> None:
+        keys = self.client.zrange(self.index_key, 0, -1)
+        if keys:
+            self.client.delete(*(self.__entry_key(key) for key in keys))
+        self.client.delete(self.index_key)
+
+    def stats(self) -> dict:
+        return {"backend": "redis", "size": self.client.zcard(self.index_key), "maxsize": self.maxsize}
+
+
+def create_cache_backend(cache_config: DictConfig, prefix: str):
+    """
+    Args:
+        cache_config: backend ("memory", "sqlite" or "redis"), maxsize, ttl, sqlite_path, redis_url
+        prefix: Namespace of the entries in shared backends
+    """
+    backend = cache_config["backend"]
+    maxsize = cache_config["maxsize"]
+    ttl = cache_config["ttl"]
+
+    if backend == "memory":
+        return MemoryCacheBackend(maxsize, ttl)
+    if backend == "sqlite":
+        return SQLiteCacheBackend(cache_config["sqlite_path"], maxsize, ttl, table=prefix)
+    if backend == "redis":
+        return RedisCacheBackend(cache_config["redis_url"], maxsize, ttl, prefix=prefix)
+    raise ValueError(f"Unknown cache backend: {backend}")
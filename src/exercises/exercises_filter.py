@@ -1,5 +1,6 @@
 import os
 import dotenv
+import numpy as np
 import pandas as pd
 from omegaconf import OmegaConf, DictConfig
 
@@ -7,18 +8,31 @@ from src.exercises.exercises_processor import ExercisesProcessor
 
 
 class ExercisesFilter:
+    DAY_TYPE_TO_BODY_PARTS = {
+        "FULL_BODY": ["Back", "Chest", "Triceps", "Biceps", "Shoulders", "Legs", "Forearms", "Core"],
+        "LOWER_BODY": ["Legs", "Core"],
+        "UPPER_BODY": ["Back", "Chest", "Triceps", "Biceps", "Shoulders", "Legs", "Forearms", "Core"],
+        "PUSH": ["Chest", "Triceps", "Shoulders", "Forearms", "Core"],
+        "PULL": ["Back", "Biceps", "Shoulders", "Forearms", "Core"],
+        "LEGS": ["Legs", "Core"]
+    }
+
     def __init__(self, exercises_processor: ExercisesProcessor, exercises_planner_config: DictConfig):
         self.exercises_processor = exercises_processor
         self.exercises_planner_config = exercises_planner_config
 
-    def get_available_exercises_by_skill_level(self, df: pd.DataFrame, skill_level: str) -> pd.DataFrame:
-        skills_columns = self.exercises_processor.get_skills_columns()
+    def get_matching_skill_levels(self, skill_level: str) -> list:
         current_skill_grade = self.exercises_planner_config['skills'][skill_level]
 
         matching_cols = []
         for skill, skill_grade in self.exercises_planner_config['skills'].items():
             if skill_grade <= current_skill_grade:
                 matching_cols.append(skill)
+        return matching_cols
+
+    def get_available_exercises_by_skill_level(self, df: pd.DataFrame, skill_level: str) -> pd.DataFrame:
+        skills_columns = self.exercises_processor.get_skills_columns()
+        matching_cols = self.get_matching_skill_levels(skill_level)
 
         matching_skills_columns = [skill.lower() for skill in skills_columns and matching_cols]
         filtered_df = df[df[matching_skills_columns].any(axis=1)]
@@ -42,17 +56,8 @@ class ExercisesFilter:
     def get_available_exercises_by_day_type(self, df: pd.DataFrame, day_types: list) -> dict:
         exercises_by_day_type = {}
 
-        day_type_to_body_parts = {
-            "FULL_BODY": ["Back", "Chest", "Triceps", "Biceps", "Shoulders", "Legs", "Forearms", "Core"],
-            "LOWER_BODY": ["Legs", "Core"],
-            "UPPER_BODY": ["Back", "Chest", "Triceps", "Biceps", "Shoulders", "Legs", "Forearms", "Core"],
-            "PUSH": ["Chest", "Triceps", "Shoulders", "Forearms", "Core"],
-            "PULL": ["Back", "Biceps", "Shoulders", "Forearms", "Core"],
-            "LEGS": ["Legs", "Core"]
-        }
-
         for day_type in day_types:
-            parts = day_type_to_body_parts[day_type]
+            parts = self.DAY_TYPE_TO_BODY_PARTS[day_type]
 
             mask = df['Body Part'].isin(parts)
             filtered = df.loc[mask].reset_index(drop=True)
@@ -61,6 +66,70 @@ class ExercisesFilter:
 
         return exercises_by_day_type
 
+    def get_available_exercises_positions(self, available_equipment: list, skill_level: str, day_types: list) -> dict:
+        """
+        Equipment -> skill level -> day type filter chain over the catalog bitmask index.
+
+        Returns:
+            Dict of day type to row positions in processed_df
+        """
+        exercises_index = self.exercises_processor.exercises_index
+        matching_skills = [skill.lower() for skill in self.get_matching_skill_levels(skill_level)]
+
+        available_mask = exercises_index.equipment_mask(available_equipment)
+        available_mask &= exercises_index.skill_mask(matching_skills)
+
+        positions_by_day_type = {}
+        for day_type in day_types:
+            day_type_mask = available_mask & exercises_index.body_part_mask(self.DAY_TYPE_TO_BODY_PARTS[day_type])
+            positions_by_day_type[day_type] = np.flatnonzero(day_type_mask)
+
+        return positions_by_day_type
+
+    def limit_positions(self, positions_by_day_type: dict, max_per_day_type: int) -> dict:
+        """
+        Caps the exercises of every day type, deterministically: round robin over the body parts of the day type
+        (catalog order within a body part) keeps all of them covered.
+
+        Returns:
+            Dict of day type to at most max_per_day_type row positions, in catalog order
+        """
+        body_parts = self.exercises_processor.processed_df["Body Part"].to_numpy()
+        limited = {}
+        for day_type, positions in positions_by_day_type.items():
+            if len(positions) <= max_per_day_type:
+                limited[day_type] = positions
+                continue
+            pools = {}
+            for position in positions:
+                pools.setdefault(body_parts[position], []).append(position)
+            kept = []
+            for rank in range(max(len(pool) for pool in pools.values())):
+                for pool in pools.values():
+                    if rank < len(pool) and len(kept) < max_per_day_type:
+                        kept.append(pool[rank])
+            limited[day_type] = np.array(sorted(kept), dtype=positions.dtype)
+        return limited
+
+    def get_cache_key(self, available_equipment: list, skill_level: str, day_types: list) -> tuple:
+        """
+        Normalized filter chain inputs: equipment unknown to the catalog does not change the result
+        and is dropped, the rest is sorted and deduplicated.
+        """
+        equipment_bits = self.exercises_processor.exercises_index.equipment_bits
+        equipment = tuple(sorted({eq for eq in available_equipment if eq in equipment_bits}))
+        return equipment, skill_level, tuple(day_types)
+
+    def get_available_exercises(self, available_equipment: list, skill_level: str, day_types: list) -> dict:
+        positions_by_day_type = self.get_available_exercises_positions(available_equipment, skill_level, day_types)
+        processed_df = self.exercises_processor.processed_df
+
+        exercises_by_day_type = {}
+        for day_type, positions in positions_by_day_type.items():
+            exercises_by_day_type[day_type] = processed_df.iloc[positions].reset_index(drop=True)
+
+        return exercises_by_day_type
+
 
 if __name__ == "__main__":
     dotenv.load_dotenv()
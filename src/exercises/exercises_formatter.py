@@ -1,5 +1,6 @@
 import os
 import dotenv
+import numpy as np
 import pandas as pd
 from omegaconf import OmegaConf, DictConfig
 
@@ -10,31 +11,46 @@ from src.exercises.exercises_processor import ExercisesProcessor
 class ExercisesFormatter:
     def __init__(self, exercises_config: DictConfig):
         self.exercises_config = exercises_config
+        self.columns = self.get_columns()
+
+    def get_columns(self) -> list:
+        columns = []
+
+        if self.exercises_config["exercises_formatter"]["print_exercises_names"]:
+            columns.append(self.exercises_config["exercises_processor"]["keys"]["exercise_names_key"])
+        if self.exercises_config["exercises_formatter"]["print_exercises_group"]:
+            columns.append(self.exercises_config["exercises_processor"]["keys"]["exercise_groups_key"])
+        if self.exercises_config["exercises_formatter"]["print_body_part"]:
+            columns.append(self.exercises_config["exercises_processor"]["keys"]["body_parts_key"])
+        if self.exercises_config["exercises_formatter"]["print_muscle_groups_targeted"]:
+            columns.append(self.exercises_config["exercises_processor"]["keys"]["muscles_key"])
+
+        return columns
+
+    def __format_day_type(self, day_type: str, exercise_lines) -> list:
+        header = f"Exercises for DAY_TYPE='{day_type}':\n" + " | ".join(self.columns)
+        return [header, *exercise_lines, "\n"]
 
     def data_format(self, exercises_by_day_type: dict) -> str:
         lines = []
         for day_type, exercises_df in exercises_by_day_type.items():
-            columns = []
-
-            if self.exercises_config["exercises_formatter"]["print_exercises_names"]:
-                columns.append(self.exercises_config["exercises_processor"]["keys"]["exercise_names_key"])
-            if self.exercises_config["exercises_formatter"]["print_exercises_group"]:
-                columns.append(self.exercises_config["exercises_processor"]["keys"]["exercise_groups_key"])
-            if self.exercises_config["exercises_formatter"]["print_body_part"]:
-                columns.append(self.exercises_config["exercises_processor"]["keys"]["body_parts_key"])
-            if self.exercises_config["exercises_formatter"]["print_muscle_groups_targeted"]:
-                columns.append(self.exercises_config["exercises_processor"]["keys"]["muscles_key"])
+            exercise_lines = ExercisesProcessor.build_exercise_lines(exercises_df, self.columns)
+            lines.extend(self.__format_day_type(day_type, exercise_lines))
 
-            preprint_exercises_df = exercises_df[columns]
-
-            header = f"Exercises for DAY_TYPE='{day_type}':\n" + " | ".join(columns)
+        text = "\n".join(lines)
+        return text
 
-            lines.append(header)
-            for _, row in preprint_exercises_df.iterrows():
-                line = " | ".join(str(row[col]) for col in columns)
-                lines.append(line)
+    def data_format_positions(self, positions_by_day_type: dict, exercise_lines: np.ndarray) -> str:
+        """
+        Same output as data_format, rendered from the catalog's precomputed exercise lines.
 
-            lines.append("\n")
+        Args:
+            positions_by_day_type: dict of day type to row positions in processed_df
+            exercise_lines: ExercisesProcessor.get_exercise_lines(self.columns)
+        """
+        lines = []
+        for day_type, positions in positions_by_day_type.items():
+            lines.extend(self.__format_day_type(day_type, exercise_lines[positions]))
 
         text = "\n".join(lines)
         return text
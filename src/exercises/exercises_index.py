@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+
+
+class ExercisesIndex:
+    """
+    Packed bitmask index over the processed exercises catalog.
+
+    Every exercise is stored as three rows of uint64 words (equipment, skill level, body part),
+    so a catalog filter becomes a handful of vectorized AND/compare operations instead of
+    DataFrame slicing.
+    """
+    WORD_BITS = 64
+
+    def __init__(self, equipment_df: pd.DataFrame, skills_df: pd.DataFrame, body_parts: pd.Series):
+        self.size = len(body_parts)
+
+        self.equipment_bits = self.__assign_bits(equipment_df.columns)
+        self.skill_bits = self.__assign_bits(skills_df.columns)
+        self.body_part_bits = self.__assign_bits(pd.unique(body_parts.astype(str)))
+
+        self.equipment_masks = self.__pack_one_hot(equipment_df, self.equipment_bits)
+        self.skill_masks = self.__pack_one_hot(skills_df, self.skill_bits)
+        self.body_part_masks = self.__pack_labels(body_parts.astype(str), self.body_part_bits)
+
+    @staticmethod
+    def __assign_bits(names) -> dict:
+        bits = {}
+        for name in names:
+            if name not in bits:
+                bits[name] = len(bits)
+        return bits
+
+    @classmethod
+    def __words_number(cls, bits: dict) -> int:
+        return max(1, -(-len(bits) // cls.WORD_BITS))
+
+    @classmethod
+    def __pack_one_hot(cls, one_hot_df: pd.DataFrame, bits: dict) -> np.ndarray:
+        masks = np.zeros((len(one_hot_df), cls.__words_number(bits)), dtype=np.uint64)
+        # columns are walked by position, duplicated names are OR-ed into the same bit
+        for position, name in enumerate(one_hot_df.columns):
+            bit = bits[name]
+            column = one_hot_df.iloc[:, position].to_numpy() != 0
+            masks[:, bit // cls.WORD_BITS] |= column.astype(np.uint64) << np.uint64(bit % cls.WORD_BITS)
+        return masks
+
+    @classmethod
+    def __pack_labels(cls, labels: pd.Series, bits: dict) -> np.ndarray:
+        masks = np.zeros((len(labels), cls.__words_number(bits)), dtype=np.uint64)
+        codes = labels.map(bits).to_numpy(dtype=np.int64)
+        words = codes // cls.WORD_BITS
+        shifts = (codes % cls.WORD_BITS).astype(np.uint64)
+        masks[np.arange(len(labels)), words] = np.uint64(1) << shifts
+        return masks
+
+    @classmethod
+    def __encode(cls, names, bits: dict) -> np.ndarray:
+        mask = np.zeros(cls.__words_number(bits), dtype=np.uint64)
+        for name in names:
+            bit = bits.get(name)
+            if bit is not None:
+                mask[bit // cls.WORD_BITS] |= np.uint64(1) << np.uint64(bit % cls.WORD_BITS)
+        return mask
+
+    def equipment_mask(self, available_equipment: list) -> np.ndarray:
+        """
+        Args:
+            available_equipment: equipment keys the user has, unknown keys are ignored
+
+        Returns:
+            Boolean array, True for exercises that need only available equipment
+        """
+        available = self.__encode(available_equipment, self.equipment_bits)
+        return ~((self.equipment_masks & ~available) != 0).any(axis=1)
+
+    def skill_mask(self, skill_levels: list) -> np.ndarray:
+        """
+        Args:
+            skill_levels: accepted skill level keys
+
+        Returns:
+            Boolean array, True for exercises that match any of the skill levels
+        """
+        accepted = self.__encode(skill_levels, self.skill_bits)
+        return ((self.skill_masks & accepted) != 0).any(axis=1)
+
+    def body_part_mask(self, body_parts: list) -> np.ndarray:
+        """
+        Args:
+            body_parts: accepted 'Body Part' values
+
+        Returns:
+            Boolean array, True for exercises that target any of the body parts
+        """
+        accepted = self.__encode(body_parts, self.body_part_bits)
+        return ((self.body_part_masks & accepted) != 0).any(axis=1)
@@ -1,23 +1,59 @@
 import os
 import re
 import dotenv
+import numpy as np
 import pandas as pd
 from omegaconf import OmegaConf, DictConfig
 
+from src.exercises.exercises_index import ExercisesIndex
+from src.lru_cache import LRUCache
+
+
 class ExercisesProcessor:
-    def __init__(self, raw_exercises_df: pd.DataFrame, exercises_processor_config: DictConfig):
-        self.raw_exercises_df = raw_exercises_df
+    def __init__(
+            self,
+            raw_exercises_df: pd.DataFrame,
+            exercises_processor_config: DictConfig,
+            encoded_dfs: dict | None = None
+    ):
         self.exercises_processor_config = exercises_processor_config
+        self.available_exercises_cache = LRUCache(maxsize=exercises_processor_config.get("cache_maxsize", 256))
+        self.catalog_checksum = None
 
-        keys = exercises_processor_config['keys']
+        self.load(raw_exercises_df, encoded_dfs)
 
-        self.muscles_df = self.process_muscle_groups(keys['muscles_key'])
-        self.equipment_df = self.process_equipment(keys['equipments_key'])
-        self.skills_df = self.process_skill_level(keys['skill_levels_key'])
+    def load(self, raw_exercises_df: pd.DataFrame, encoded_dfs: dict | None = None) -> None:
+        """
+        (Re)builds the processed catalog and its index, cached filter results are invalidated.
+
+        Args:
+            raw_exercises_df: raw exercises DataFrame
+            encoded_dfs: already encoded 'muscles', 'equipment' and 'skills' DataFrames (e.g. from a catalog
+                snapshot), parsing is skipped when given
+        """
+        self.raw_exercises_df = raw_exercises_df
+
+        keys = self.exercises_processor_config['keys']
+
+        if encoded_dfs is None:
+            self.muscles_df = self.process_muscle_groups(keys['muscles_key'])
+            self.equipment_df = self.process_equipment(keys['equipments_key'])
+            self.skills_df = self.process_skill_level(keys['skill_levels_key'])
+        else:
+            self.muscles_df = encoded_dfs["muscles"]
+            self.equipment_df = encoded_dfs["equipment"]
+            self.skills_df = encoded_dfs["skills"]
 
         self.processed_df = self.merge_df(
             keys['exercise_names_key'], keys['exercise_groups_key'], keys['body_parts_key'], keys['muscles_key']
         )
+        self.exercises_index = ExercisesIndex(
+            self.equipment_df, self.skills_df, self.raw_exercises_df[keys['body_parts_key']]
+        )
+
+        self.exercise_lines = {}
+        self.catalog_arrays = {}
+        self.available_exercises_cache.clear()
 
     @staticmethod
     def __parse_muscle(s):
@@ -38,6 +74,43 @@ class ExercisesProcessor:
     def get_skills_columns(self) -> list:
         return self.skills_df.columns.tolist()
 
+    @staticmethod
+    def build_exercise_lines(exercises_df: pd.DataFrame, columns: list) -> np.ndarray:
+        """
+        Args:
+            exercises_df: exercises DataFrame
+            columns: columns to print
+
+        Returns:
+            Array with one ' | '-joined line per exercise
+        """
+        if not columns:
+            return np.full(len(exercises_df), "", dtype=object)
+
+        lines = exercises_df[columns[0]].astype(str)
+        for column in columns[1:]:
+            lines = lines + " | " + exercises_df[column].astype(str)
+        return lines.to_numpy(dtype=object)
+
+    def get_exercise_lines(self, columns: list) -> np.ndarray:
+        """
+        Per-exercise ' | '-joined prompt lines, built once per columns set for the loaded catalog.
+        """
+        key = tuple(columns)
+        if key not in self.exercise_lines:
+            lines = self.build_exercise_lines(self.processed_df, columns)
+            lines.flags.writeable = False
+            self.exercise_lines[key] = lines
+        return self.exercise_lines[key]
+
+    def get_catalog_arrays(self, key: tuple, build) -> dict:
+        """
+        Per-exercise arrays derived from the loaded catalog by build(self), built once per key.
+        """
+        if key not in self.catalog_arrays:
+            self.catalog_arrays[key] = build(self)
+        return self.catalog_arrays[key]
+
     def process_muscle_groups(self, muscles_key: str) -> pd.DataFrame:
         """
         Args:
@@ -0,0 +1,171 @@
+import os
+import json
+import hashlib
+import argparse
+import tempfile
+
+import dotenv
+import numpy as np
+import pandas as pd
+from omegaconf import OmegaConf, DictConfig
+
+from src.exercises.exercises_processor import ExercisesProcessor
+from src.logger import get_logger
+
+
+SNAPSHOT_VERSION = 1
+ENCODED_DFS = ("muscles", "equipment", "skills")
+
+logger = get_logger(__name__)
+
+
+def read_raw_exercises(source_path: str) -> pd.DataFrame:
+    if source_path.endswith((".xlsx", ".xls")):
+        return pd.read_excel(source_path, keep_default_na=False)
+    return pd.read_csv(source_path, keep_default_na=False)
+
+
+def compute_checksum(source_path: str, exercises_processor_config: DictConfig) -> str:
+    """
+    sha256 of the catalog source file, the processor keys and the snapshot layout version.
+    """
+    digest = hashlib.sha256()
+    with open(source_path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+
+    keys = exercises_processor_config["keys"]
+    if isinstance(keys, DictConfig):
+        keys = OmegaConf.to_container(keys)
+    digest.update(json.dumps(keys, sort_keys=True).encode("utf-8"))
+    digest.update(str(SNAPSHOT_VERSION).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _to_str_array(values) -> np.ndarray:
+    return np.array([str(value) for value in values], dtype=np.str_)
+
+
+def save_snapshot(exercises_processor: ExercisesProcessor, snapshot_path: str, checksum: str) -> None:
+    """
+    Writes the raw text table and the one-hot matrices as an uncompressed, pickle-free .npz.
+    """
+    raw_df = exercises_processor.raw_exercises_df
+    arrays = {
+        "version": np.array(SNAPSHOT_VERSION),
+        "checksum": np.array(checksum),
+        "raw_columns": _to_str_array(raw_df.columns),
+    }
+    for position, column in enumerate(raw_df.columns):
+        arrays[f"raw_{position}"] = _to_str_array(raw_df[column])
+
+    encoded_dfs = {
+        "muscles": exercises_processor.muscles_df,
+        "equipment": exercises_processor.equipment_df,
+        "skills": exercises_processor.skills_df,
+    }
+    for name, encoded_df in encoded_dfs.items():
+        arrays[f"{name}_columns"] = _to_str_array(encoded_df.columns)
+        arrays[f"{name}_matrix"] = encoded_df.to_numpy()
+
+    snapshot_dir = os.path.dirname(os.path.abspath(snapshot_path))
+    os.makedirs(snapshot_dir, exist_ok=True)
+    file_descriptor, tmp_path = tempfile.mkstemp(dir=snapshot_dir, suffix=".npz")
+    try:
+        with os.fdopen(file_descriptor, "wb") as file:
+            np.savez(file, **arrays)
+        os.replace(tmp_path, snapshot_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def read_snapshot_checksum(snapshot_path: str) -> str | None:
+    try:
+        with np.load(snapshot_path, allow_pickle=False) as snapshot:
+            if int(snapshot["version"]) != SNAPSHOT_VERSION:
+                return None
+            return str(snapshot["checksum"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def load_snapshot(snapshot_path: str, exercises_processor_config: DictConfig) -> ExercisesProcessor:
+    with np.load(snapshot_path, allow_pickle=False) as snapshot:
+        if int(snapshot["version"]) != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported catalog snapshot version: {int(snapshot['version'])}")
+
+        raw_columns = snapshot["raw_columns"].tolist()
+        raw_df = pd.DataFrame(
+            {column: snapshot[f"raw_{position}"] for position, column in enumerate(raw_columns)}
+        )
+
+        encoded_dfs = {}
+        for name in ENCODED_DFS:
+            encoded_df = pd.DataFrame(snapshot[f"{name}_matrix"])
+            encoded_df.columns = snapshot[f"{name}_columns"].tolist()
+            encoded_dfs[name] = encoded_df
+
+        checksum = str(snapshot["checksum"])
+
+    exercises_processor = ExercisesProcessor(raw_df, exercises_processor_config, encoded_dfs=encoded_dfs)
+    exercises_processor.catalog_checksum = checksum
+    return exercises_processor
+
+
+def build_snapshot(source_path: str, snapshot_path: str, exercises_processor_config: DictConfig) -> ExercisesProcessor:
+    checksum = compute_checksum(source_path, exercises_processor_config)
+    exercises_processor = ExercisesProcessor(read_raw_exercises(source_path), exercises_processor_config)
+    exercises_processor.catalog_checksum = checksum
+    save_snapshot(exercises_processor, snapshot_path, checksum)
+    return exercises_processor
+
+
+def load_exercises_processor(
+        source_path: str,
+        snapshot_path: str | None,
+        exercises_processor_config: DictConfig
+) -> ExercisesProcessor:
+    """
+    Loads the catalog from its compiled snapshot, the snapshot is (re)built only when it is missing
+    or the source checksum changed. Without snapshot_path the source is parsed as before.
+    """
+    checksum = compute_checksum(source_path, exercises_processor_config)
+
+    if not snapshot_path:
+        exercises_processor = ExercisesProcessor(read_raw_exercises(source_path), exercises_processor_config)
+        exercises_processor.catalog_checksum = checksum
+        return exercises_processor
+
+    if read_snapshot_checksum(snapshot_path) == checksum:
+        return load_snapshot(snapshot_path, exercises_processor_config)
+
+    logger.info(f"Catalog snapshot {snapshot_path} is missing or stale, rebuilding")
+    exercises_processor = ExercisesProcessor(read_raw_exercises(source_path), exercises_processor_config)
+    exercises_processor.catalog_checksum = checksum
+    try:
+        save_snapshot(exercises_processor, snapshot_path, checksum)
+    except OSError:
+        logger.warning(f"Failed to write catalog snapshot {snapshot_path}, serving the parsed catalog")
+    return exercises_processor
+
+
+if __name__ == "__main__":
+    dotenv.load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Compile the exercises catalog into a binary snapshot")
+    parser.add_argument("--source", default=os.getenv("EXERCISES_RAW_DF_PATH"), help="Catalog CSV/XLSX")
+    parser.add_argument("--output", default=os.getenv("EXERCISES_SNAPSHOT_PATH"), help="Snapshot .npz path")
+    parser.add_argument("--config", default=os.getenv("EXERCISES_CONFIG_PATH"), help="Exercises config")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the checksum matches")
+    args = parser.parse_args()
+
+    exercises_config = OmegaConf.load(args.config)
+    exercises_processor_config = exercises_config["exercises_processor"]
+
+    checksum = compute_checksum(args.source, exercises_processor_config)
+    if not args.force and read_snapshot_checksum(args.output) == checksum:
+        print(f"Snapshot {args.output} is up to date ({checksum[:12]})")
+    else:
+        processor = build_snapshot(args.source, args.output, exercises_processor_config)
+        print(f"Snapshot {args.output} built: {len(processor.processed_df)} exercises ({checksum[:12]})")
@@ -0,0 +1,191 @@
+import re
+import time
+import bisect
+import threading
+from contextlib import nullcontext
+from typing import Callable
+
+
+# shared no-op timer of disabled stage timers
+NO_TIMER = nullcontext()
+
+
+class MetricsRegistry:
+    """Named collectors of service metrics, each returns a dict snapshot."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._collectors = {}
+
+    def register(self, name: str, collector: Callable[[], dict]) -> None:
+        with self._lock:
+            self._collectors[name] = collector
+
+    def collect(self) -> dict:
+        with self._lock:
+            collectors = dict(self._collectors)
+        return {name: collector() for name, collector in collectors.items()}
+
+
+class Histogram:
+    """Thread-safe cumulative histogram of observed values (Prometheus style "le" buckets)."""
+
+    def __init__(self, buckets: list):
+        self.buckets = sorted(float(bucket) for bucket in buckets)
+        self._lock = threading.Lock()
+        self._counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            if position < len(self._counts):
+                self._counts[position] += 1
+            self.count += 1
+            self.sum += value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts = list(self._counts)
+            count, total = self.count, self.sum
+        cumulative = {}
+        running = 0
+        for bucket, bucket_count in zip(self.buckets, counts):
+            running += bucket_count
+            cumulative[str(bucket)] = running
+        cumulative["+Inf"] = count
+        return {"buckets": cumulative, "count": count, "sum": round(total, 6)}
+
+
+class StageTimer:
+    def __init__(self, stage_timers: "StageTimers", labels: tuple):
+        self.stage_timers = stage_timers
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        outcome = "ok" if exc_type is None else "error"
+        self.stage_timers.observe(*self.labels, outcome, time.perf_counter() - self.started)
+        return False
+
+
+class StageTimers:
+    """
+    Latency histograms of the request stages, labelled by stage, endpoint, model and outcome ("ok" | "error").
+    """
+
+    def __init__(self, buckets: list):
+        self.buckets = list(buckets)
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+    def time(self, stage: str, endpoint: str | None = None, model: str | None = None) -> StageTimer:
+        return StageTimer(self, (stage, endpoint or "none", model or "none"))
+
+    def observe(self, stage: str, endpoint: str, model: str, outcome: str, seconds: float) -> None:
+        labels = (stage, endpoint, model, outcome)
+        histogram = self._histograms.get(labels)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(labels, Histogram(self.buckets))
+        histogram.observe(seconds)
+
+    def collect(self) -> list:
+        """
+        Returns:
+            [({"stage", "endpoint", "model", "outcome"}, histogram snapshot)]
+        """
+        with self._lock:
+            histograms = dict(self._histograms)
+        return [
+            (dict(zip(("stage", "endpoint", "model", "outcome"), labels)), histogram.snapshot())
+            for labels, histogram in sorted(histograms.items())
+        ]
+
+    def stats(self) -> dict:
+        return {
+            ":".join(labels.values()): {"count": snapshot["count"], "sum": snapshot["sum"]}
+            for labels, snapshot in self.collect()
+        }
+
+
+def format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    escaped = {name: str(value).replace("\\", "\\\\").replace('"', '\\"') for name, value in labels.items()}
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped.items()) + "}"
+
+
+def format_histogram(name: str, labels: dict, snapshot: dict) -> list:
+    lines = [
+        f"{name}_bucket{format_labels({**labels, 'le': bucket})} {count}"
+        for bucket, count in snapshot["buckets"].items()
+    ]
+    lines.append(f"{name}_sum{format_labels(labels)} {snapshot['sum']}")
+    lines.append(f"{name}_count{format_labels(labels)} {snapshot['count']}")
+    return lines
+
+
+def format_prometheus(
+        metrics: dict,
+        stage_timers: StageTimers | None = None,
+        prefix: str = "sculpd",
+        stages_section: str = "stages"
+) -> str:
+    """
+    Prometheus text exposition of the registry snapshot: numeric values become gauges named by their path,
+    histogram snapshots become histograms, the stage timers a labelled stage_duration_seconds histogram.
+    With the stage timers, their JSON section of the snapshot (stages_section) is skipped, not exposed twice.
+    """
+    lines = []
+    if stage_timers is not None:
+        metrics = {section: value for section, value in metrics.items() if section != stages_section}
+
+    def walk(path: list, value) -> None:
+        if isinstance(value, dict):
+            if {"buckets", "count", "sum"} <= value.keys():
+                name = "_".join(path)
+                lines.append(f"# TYPE {name} histogram")
+                lines.extend(format_histogram(name, {}, value))
+                return
+            for key, nested in value.items():
+                walk(path + [re.sub(r"\W", "_", str(key))], nested)
+        elif isinstance(value, (bool, int, float)):
+            lines.append(f"{'_'.join(path)} {float(value)}")
+
+    walk([prefix], metrics)
+
+    if stage_timers is not None:
+        name = f"{prefix}_stage_duration_seconds"
+        lines.append(f"# TYPE {name} histogram")
+        for labels, snapshot in stage_timers.collect():
+            lines.extend(format_histogram(name, labels, snapshot))
+    return "\n".join(lines) + "\n"
+
+
+class TimedChain:
+    """Chain wrapper timing invoke, ainvoke and astream (until the last chunk) as one stage."""
+
+    def __init__(self, chain, stage_timers: StageTimers, stage: str, endpoint: str | None, model: str | None):
+        self.chain = chain
+        self.stage_timers = stage_timers
+        self.stage = stage
+        self.endpoint = endpoint
+        self.model = model
+
+    def invoke(self, inputs: dict):
+        with self.stage_timers.time(self.stage, self.endpoint, self.model):
+            return self.chain.invoke(inputs)
+
+    async def ainvoke(self, inputs: dict):
+        with self.stage_timers.time(self.stage, self.endpoint, self.model):
+            return await self.chain.ainvoke(inputs)
+
+    async def astream(self, inputs: dict):
+        with self.stage_timers.time(self.stage, self.endpoint, self.model):
+            async for chunk in self.chain.astream(inputs):
+                yield chunk
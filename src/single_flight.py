@@ -0,0 +1,91 @@
+import asyncio
+import threading
+from concurrent.futures import Future, CancelledError
+from typing import Any, Callable, Hashable
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: while a call is in flight, later calls with its key
+    wait for its result instead of executing again. Sync (threadpool) and async callers share the
+    in-flight calls, the result is passed through a thread-safe concurrent.futures.Future.
+    If the executing call is cancelled, a waiting caller executes the call itself.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def __join(self, key: Hashable) -> tuple:
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = Future()
+            self._in_flight[key] = future
+            self.executed += 1
+            return future, True
+
+    def __leave(self, key: Hashable) -> None:
+        with self._lock:
+            self._in_flight.pop(key, None)
+
+    def do(self, key: Hashable, fn: Callable, *args) -> Any:
+        while True:
+            future, leader = self.__join(key)
+            if not leader:
+                try:
+                    return future.result()
+                except CancelledError:
+                    continue
+
+            try:
+                result = fn(*args)
+            except BaseException as e:
+                future.set_exception(e)
+                raise
+            finally:
+                self.__leave(key)
+            future.set_result(result)
+            return result
+
+    async def ado(self, key: Hashable, fn: Callable, *args) -> Any:
+        """
+        Async do: fn is a coroutine function, waiting callers do not hold a thread.
+        """
+        while True:
+            future, leader = self.__join(key)
+            if not leader:
+                try:
+                    # shield: a cancelled waiter must not cancel the shared call
+                    return await asyncio.shield(asyncio.wrap_future(future))
+                except asyncio.CancelledError:
+                    if not future.cancelled():
+                        raise
+                    continue
+
+            try:
+                result = await fn(*args)
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except BaseException as e:
+                future.set_exception(e)
+                raise
+            finally:
+                self.__leave(key)
+            future.set_result(result)
+            return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            calls = self.executed + self.coalesced
+            return {
+                "in_flight": len(self._in_flight),
+                "executed": self.executed,
+                "coalesced": self.coalesced,
+                "coalesced_ratio": self.coalesced / calls if calls else 0.0,
+            }
@@ -0,0 +1,274 @@
+import math
+import time
+import heapq
+import asyncio
+import itertools
+import threading
+
+from omegaconf import DictConfig
+
+from src.metrics import Histogram
+from src.training_plan.token_counter import TokenCounter
+
+
+class AdmissionRejected(Exception):
+    """The LLM call waited longer than the queue timeout of its lane, the request should be retried later."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Budget of rate_per_minute units refilled continuously, bursts of up to capacity units."""
+
+    def __init__(self, rate_per_minute: float, capacity: float | None = None):
+        self.rate = rate_per_minute / 60
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def time_until(self, amount: float) -> float:
+        """Seconds until amount is available (after refill)."""
+        return max(0.0, (min(amount, self.capacity) - self.tokens) / self.rate)
+
+    def take(self, amount: float) -> None:
+        # a call larger than the bucket drains it fully instead of waiting forever
+        self.tokens -= min(amount, self.capacity)
+
+
+class Waiter:
+    def __init__(self, lane: str, tokens: int, loop: asyncio.AbstractEventLoop | None):
+        self.lane = lane
+        self.tokens = tokens
+        self.granted = False
+        self.abandoned = False
+        self.loop = loop
+        self.event = asyncio.Event() if loop is not None else threading.Event()
+
+    def wake(self) -> None:
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.event.set)
+        else:
+            self.event.set()
+
+
+class AdmissionController:
+    """
+    App-scoped gate in front of the LLM calls: requests/min and tokens/min token buckets sized to the provider
+    rate limits. Calls over the budget wait in priority lanes (a lower priority number is served first,
+    first come first served within a lane). A call still waiting after the queue_timeout of its lane is
+    rejected with a Retry-After estimate instead of hitting the provider limit.
+    """
+
+    def __init__(self, config: DictConfig, token_counter: TokenCounter):
+        self.token_counter = token_counter
+        self.completion_tokens = config["completion_tokens"]
+        self.requests = TokenBucket(config["requests_per_minute"])
+        self.tokens = TokenBucket(config["tokens_per_minute"])
+        self.lanes = {
+            lane: {"priority": lane_config["priority"], "queue_timeout": lane_config["queue_timeout"]}
+            for lane, lane_config in config["lanes"].items()
+        }
+
+        self._lock = threading.Lock()
+        self._queue = []
+        self._sequence = itertools.count()
+        self.queued = {lane: 0 for lane in self.lanes}
+        self.admitted = {lane: 0 for lane in self.lanes}
+        self.rejected = {lane: 0 for lane in self.lanes}
+        self.wait_seconds = {lane: Histogram(config["wait_buckets"]) for lane in self.lanes}
+
+    def estimate_tokens(self, prompt_text: str) -> int:
+        """Tokens a call is charged: its prompt plus the completion_tokens allowance."""
+        # rendered prompts are unique per request, not cached
+        return self.token_counter.count(prompt_text, cache=False) + self.completion_tokens
+
+    def __grant_ready(self) -> float | None:
+        """
+        Grants the queue head while the budgets allow (under the lock).
+
+        Returns:
+            Seconds until the next head fits the budgets, None if the queue is empty
+        """
+        now = time.monotonic()
+        self.requests.refill(now)
+        self.tokens.refill(now)
+        while self._queue:
+            waiter = self._queue[0][2]
+            if waiter.abandoned:
+                heapq.heappop(self._queue)
+                continue
+            wait = max(self.requests.time_until(1), self.tokens.time_until(waiter.tokens))
+            if wait > 0:
+                return wait
+            heapq.heappop(self._queue)
+            self.requests.take(1)
+            self.tokens.take(waiter.tokens)
+            self.queued[waiter.lane] -= 1
+            waiter.granted = True
+            waiter.wake()
+        return None
+
+    def __get_deadline(self, lane: str, started: float) -> float:
+        if lane not in self.lanes:
+            raise ValueError(f"Unknown admission lane: {lane}")
+        return started + self.lanes[lane]["queue_timeout"]
+
+    def __enqueue(self, lane: str, tokens: int, loop) -> Waiter:
+        waiter = Waiter(lane, tokens, loop)
+        with self._lock:
+            heapq.heappush(self._queue, (self.lanes[lane]["priority"], next(self._sequence), waiter))
+            self.queued[lane] += 1
+            self.__grant_ready()
+        return waiter
+
+    def __poll(self, waiter: Waiter, deadline: float) -> float:
+        """
+        Returns:
+            Seconds to wait for a grant, 0 if the waiter is granted
+        """
+        with self._lock:
+            next_wait = self.__grant_ready()
+            if waiter.granted:
+                return 0.0
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                waiter.abandoned = True
+                self.queued[waiter.lane] -= 1
+                self.rejected[waiter.lane] += 1
+                raise AdmissionRejected(
+                    f"LLM admission queue timeout of the {waiter.lane} lane exceeded", self.__retry_after(waiter)
+                )
+            return min(remaining, next_wait if next_wait is not None else remaining)
+
+    def __retry_after(self, waiter: Waiter) -> int:
+        """Seconds until the budgets could serve the calls queued ahead of the rejected one and itself."""
+        priority = self.lanes[waiter.lane]["priority"]
+        ahead = [item[2] for item in self._queue if item[0] <= priority and not item[2].abandoned]
+        requests_wait = self.requests.time_until(1) + len(ahead) / self.requests.rate
+        tokens_wait = (sum(other.tokens for other in ahead) + waiter.tokens - self.tokens.tokens) / self.tokens.rate
+        return max(1, math.ceil(max(requests_wait, tokens_wait)))
+
+    def __record(self, waiter: Waiter, started: float) -> None:
+        with self._lock:
+            self.admitted[waiter.lane] += 1
+        self.wait_seconds[waiter.lane].observe(time.monotonic() - started)
+
+    def acquire(self, lane: str, tokens: int) -> None:
+        """Blocks the calling thread until the call is admitted, raises AdmissionRejected after the lane timeout."""
+        started = time.monotonic()
+        deadline = self.__get_deadline(lane, started)
+        waiter = self.__enqueue(lane, tokens, None)
+        while (wait := self.__poll(waiter, deadline)) > 0:
+            waiter.event.wait(wait)
+            waiter.event.clear()
+        self.__record(waiter, started)
+
+    def try_acquire(self, lane: str, tokens: int) -> bool:
+        """
+        Admits the call at once if the budgets allow it and no call of the same or a higher priority waits,
+        never queues it (speculative calls such as hedges).
+        """
+        self.__get_deadline(lane, 0.0)
+        priority = self.lanes[lane]["priority"]
+        with self._lock:
+            self.__grant_ready()
+            waiting = any(item[0] <= priority and not item[2].abandoned for item in self._queue)
+            if waiting or self.requests.time_until(1) > 0 or self.tokens.time_until(tokens) > 0:
+                return False
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            self.admitted[lane] += 1
+        self.wait_seconds[lane].observe(0.0)
+        return True
+
+    async def aacquire(self, lane: str, tokens: int) -> None:
+        started = time.monotonic()
+        deadline = self.__get_deadline(lane, started)
+        waiter = self.__enqueue(lane, tokens, asyncio.get_running_loop())
+        try:
+            while (wait := self.__poll(waiter, deadline)) > 0:
+                try:
+                    await asyncio.wait_for(waiter.event.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                waiter.event.clear()
+        except asyncio.CancelledError:
+            with self._lock:
+                if not waiter.granted:
+                    waiter.abandoned = True
+                    self.queued[lane] -= 1
+            raise
+        self.__record(waiter, started)
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            stats = {
+                "requests_available": round(self.requests.tokens, 2),
+                "tokens_available": round(self.tokens.tokens),
+                "queue_depth": dict(self.queued),
+                "admitted": dict(self.admitted),
+                "rejected": dict(self.rejected),
+            }
+        stats["wait_seconds"] = {lane: histogram.snapshot() for lane, histogram in self.wait_seconds.items()}
+        stats["tokenizer"] = self.token_counter.stats()
+        return stats
+
+
+class CallAdmission:
+    """
+    Admission of the calls of one prompt in a lane, charged with the tokens of the rendered prompt.
+    Shared by the attempts of a call: ResilientChain admits every retry and hedge.
+    """
+
+    def __init__(self, prompt, admission: AdmissionController, lane: str):
+        self.prompt = prompt
+        self.admission = admission
+        self.lane = lane
+
+    def estimate_tokens(self, inputs: dict) -> int:
+        return self.admission.estimate_tokens(self.prompt.invoke(inputs).to_string())
+
+    async def aestimate_tokens(self, inputs: dict) -> int:
+        return await asyncio.to_thread(self.estimate_tokens, inputs)
+
+    def acquire(self, tokens: int) -> None:
+        self.admission.acquire(self.lane, tokens)
+
+    async def aacquire(self, tokens: int) -> None:
+        await self.admission.aacquire(self.lane, tokens)
+
+    def try_acquire(self, tokens: int) -> bool:
+        return self.admission.try_acquire(self.lane, tokens)
+
+
+class AdmittedChain:
+    """
+    Chain wrapper admitting every call (invoke, ainvoke, astream) through the AdmissionController,
+    for the chains without the resilience policy.
+    """
+
+    def __init__(self, chain, call_admission: CallAdmission):
+        self.chain = chain
+        self.call_admission = call_admission
+
+    def invoke(self, inputs: dict):
+        self.call_admission.acquire(self.call_admission.estimate_tokens(inputs))
+        return self.chain.invoke(inputs)
+
+    async def ainvoke(self, inputs: dict):
+        await self.call_admission.aacquire(await self.call_admission.aestimate_tokens(inputs))
+        return await self.chain.ainvoke(inputs)
+
+    async def astream(self, inputs: dict):
+        await self.call_admission.aacquire(await self.call_admission.aestimate_tokens(inputs))
+        async for chunk in self.chain.astream(inputs):
+            yield chunk
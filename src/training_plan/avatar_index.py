@@ -0,0 +1,111 @@
+import os
+import re
+import copy
+import json
+
+import numpy as np
+from omegaconf import DictConfig
+
+from src.user_data.user_data_processor import UserDataProcessor
+
+
+class AvatarIndex:
+    """
+    Local nearest-neighbour index of the avatar training program examples. Every avatar is a feature vector
+    of its user data profile: age, fitness level, training days, workout time (scaled numbers), nutrition goal
+    (one-hot), equipment and target body parts (unit-length multi-hot, so the distance of two sets depends on
+    their overlap, not their size).
+    A request selects the k avatars at the smallest euclidean distance from its profile.
+    """
+    PROFILE_FILE_PATTERN = re.compile(r"user_data_avatar_(\d+)\.json")
+
+    def __init__(self, avatar_profiles: dict, user_data_processing_config: DictConfig, config: DictConfig):
+        """
+        Args:
+            avatar_profiles: {avatar example name ("avatar1" for avatar1.txt): raw user data of the avatar}
+            user_data_processing_config: Keys of the user data fields
+            config: avatar_selection config (k, fitness levels, scales and weights of the feature groups)
+        """
+        self.user_data_processing_config = user_data_processing_config
+        self.k = config["k"]
+        self.fitness_levels = list(config["fitness_levels"])
+        self.scales = dict(config["scales"])
+        self.weights = dict(config["weights"])
+        self.nutrition_goals = list(user_data_processing_config["keys"]["possible_nutrition_goals"])
+
+        self.names = list(avatar_profiles)
+        profiles = [self.__read_profile(raw_user_data) for raw_user_data in avatar_profiles.values()]
+        self.equipment = sorted({item for profile in profiles for item in profile["equipment"]})
+        self.body_parts = sorted({part for profile in profiles for part in profile["body_parts"]})
+        self.features = np.stack([self.__vectorize(profile) for profile in profiles]) if profiles else np.empty((0, 0))
+
+    @classmethod
+    def from_dir(cls, avatars_user_data_dir: str, user_data_processing_config: DictConfig, config: DictConfig) -> "AvatarIndex":
+        """
+        Index of the user_data_avatar_N.json profiles of the directory, matched to the avatarN.txt examples.
+        Raises ValueError if the directory is not set or has no profiles, the examples could not be ranked.
+        """
+        if not avatars_user_data_dir or not os.path.isdir(avatars_user_data_dir):
+            raise ValueError(f"Avatar profiles directory not found: {avatars_user_data_dir!r}")
+        avatar_profiles = {}
+        for file_name in sorted(os.listdir(avatars_user_data_dir)):
+            match = cls.PROFILE_FILE_PATTERN.fullmatch(file_name)
+            if match:
+                with open(os.path.join(avatars_user_data_dir, file_name), "r", encoding="utf-8") as file:
+                    avatar_profiles[f"avatar{match.group(1)}"] = json.load(file)
+        if not avatar_profiles:
+            raise ValueError(f"No user_data_avatar_N.json profiles in {avatars_user_data_dir}")
+        return cls(avatar_profiles, user_data_processing_config, config)
+
+    def __read_profile(self, raw_user_data: dict) -> dict:
+        # the processor appends defaults to the lists of the user data it reads
+        processor = UserDataProcessor(copy.deepcopy(raw_user_data), self.user_data_processing_config)
+        return {
+            "age": processor.get_age(),
+            "fitness_level": processor.get_fitness_level(),
+            "training_days": processor.get_training_days(),
+            "workout_time": processor.get_workout_time(),
+            "nutrition_goal": processor.get_nutrition_goal(),
+            "equipment": {item.lower() for item in processor.get_equipment_list()},
+            "body_parts": {part.lower() for part in processor.get_improve_body_parts()},
+        }
+
+    @staticmethod
+    def __multi_hot(values: set, vocabulary: list, weight: float) -> np.ndarray:
+        vector = np.array([value in values for value in vocabulary], dtype=np.float64)
+        norm = np.linalg.norm(vector)
+        # disjoint sets are weight apart
+        return vector * weight / np.sqrt(2) / norm if norm else vector
+
+    def __vectorize(self, profile: dict) -> np.ndarray:
+        level = profile["fitness_level"]
+        numeric = np.array([
+            profile["age"] / self.scales["age"] * self.weights["age"],
+            (self.fitness_levels.index(level) if level in self.fitness_levels else 0) * self.weights["fitness_level"],
+            profile["training_days"] / self.scales["training_days"] * self.weights["training_days"],
+            profile["workout_time"] / self.scales["workout_time"] * self.weights["workout_time"],
+        ])
+        return np.concatenate([
+            numeric,
+            self.__multi_hot({profile["nutrition_goal"]}, self.nutrition_goals, self.weights["nutrition_goal"]),
+            self.__multi_hot(profile["equipment"], self.equipment, self.weights["equipment"]),
+            self.__multi_hot(profile["body_parts"], self.body_parts, self.weights["improve_body_parts"]),
+        ])
+
+    def rank(self, raw_user_data: dict) -> list:
+        """
+        Returns:
+            Avatar example names, nearest to the user profile first (ties in index order)
+        """
+        if not self.names:
+            return []
+        vector = self.__vectorize(self.__read_profile(raw_user_data))
+        distances = np.linalg.norm(self.features - vector, axis=1)
+        return [self.names[position] for position in np.argsort(distances, kind="stable")]
+
+    def select(self, raw_user_data: dict, k: int | None = None) -> list:
+        """
+        Returns:
+            Names of the k (config k by default) nearest avatar examples, nearest first
+        """
+        return self.rank(raw_user_data)[:k if k is not None else self.k]
@@ -0,0 +1,93 @@
+import threading
+
+import httpx
+from omegaconf import DictConfig
+from langchain_openai import ChatOpenAI
+
+
+class LLMClientRegistry:
+    """
+    App-scoped ChatOpenAI clients keyed by (model, temperature).
+
+    All clients share one sync and one async keep-alive connection pool, so requests reuse warm
+    HTTPS connections instead of paying client construction and a TLS handshake per call.
+    Clients are never mutated after creation and are safe to share between requests.
+    """
+
+    def __init__(self, api_key: str, llm_clients_config: DictConfig, resilience: bool = False):
+        """
+        Args:
+            resilience: Calls go through the LLMResilience policy: the clients do not retry on their own,
+                so retries are not stacked under the policy retries
+        """
+        self.api_key = api_key
+        self.llm_clients_config = llm_clients_config
+        self.max_retries = 0 if resilience else llm_clients_config["max_retries"]
+        self.temperature_models = set(llm_clients_config["temperature_models"])
+
+        limits = httpx.Limits(
+            max_connections=llm_clients_config["max_connections"],
+            max_keepalive_connections=llm_clients_config["max_keepalive_connections"],
+            keepalive_expiry=llm_clients_config["keepalive_expiry"]
+        )
+        timeout = httpx.Timeout(llm_clients_config["timeout"], connect=llm_clients_config["connect_timeout"])
+
+        self.transport = httpx.HTTPTransport(limits=limits)
+        self.async_transport = httpx.AsyncHTTPTransport(limits=limits)
+        self.http_client = httpx.Client(transport=self.transport, timeout=timeout)
+        self.http_async_client = httpx.AsyncClient(transport=self.async_transport, timeout=timeout)
+
+        self._lock = threading.Lock()
+        self._clients = {}
+
+    def get_temperature(self, model_name: str, temperature: float | None) -> float | None:
+        # reasoning models reject custom temperature
+        return temperature if model_name in self.temperature_models else None
+
+    def get(self, model_name: str, temperature: float | None = None) -> ChatOpenAI:
+        key = (model_name, self.get_temperature(model_name, temperature))
+        with self._lock:
+            if key not in self._clients:
+                self._clients[key] = ChatOpenAI(
+                    api_key=self.api_key,
+                    model=key[0],
+                    temperature=key[1],
+                    # token usage on the last chunk of streams
+                    stream_usage=True,
+                    max_retries=self.max_retries,
+                    http_client=self.http_client,
+                    http_async_client=self.http_async_client
+                )
+            return self._clients[key]
+
+    @staticmethod
+    def __pool_state(transport) -> dict:
+        """
+        Connection pool state read from httpcore internals (no public API), empty if they changed.
+        """
+        try:
+            pool = transport._pool
+            connections = list(pool.connections)
+            idle = sum(1 for connection in connections if connection.is_idle())
+            waiters = sum(1 for pool_request in list(pool._requests) if pool_request.is_queued())
+        except AttributeError:
+            return {}
+        return {
+            "open_connections": len(connections),
+            "active_connections": len(connections) - idle,
+            "idle_connections": idle,
+            "waiters": waiters,
+        }
+
+    def pool_metrics(self) -> dict:
+        return {
+            "max_connections": self.llm_clients_config["max_connections"],
+            "max_keepalive_connections": self.llm_clients_config["max_keepalive_connections"],
+            "clients": len(self._clients),
+            "sync": self.__pool_state(self.transport),
+            "async": self.__pool_state(self.async_transport),
+        }
+
+    async def aclose(self) -> None:
+        self.http_client.close()
+        await self.http_async_client.aclose()
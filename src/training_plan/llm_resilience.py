@@ -0,0 +1,355 @@
+import math
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from omegaconf import DictConfig
+
+
+class CircuitOpenError(Exception):
+    """The LLM provider is considered degraded, calls fail fast until the recovery timeout."""
+
+
+class AttemptTimeoutError(TimeoutError):
+    """An LLM attempt (with its hedge) did not complete within the per-attempt timeout."""
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive failed calls, then rejects calls for recovery_timeout seconds.
+    After that one trial call is let through (half-open): its success closes the breaker, its failure opens it again.
+    A cancelled trial releases the half-open state, and a trial without an outcome after recovery_timeout is stale:
+    another call is let through.
+    """
+
+    def __init__(self, failure_threshold: int, recovery_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+
+        self._lock = threading.Lock()
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.trial_started_at = 0.0
+
+    def before_call(self) -> bool:
+        """
+        Returns:
+            True if the call is the half-open trial
+        """
+        with self._lock:
+            if self.state == "closed":
+                return False
+            now = time.monotonic()
+            if self.state == "open" and now - self.opened_at >= self.recovery_timeout:
+                self.state = "half_open"
+                self.trial_in_flight = False
+            stale = self.trial_in_flight and now - self.trial_started_at >= self.recovery_timeout
+            if self.state == "half_open" and (not self.trial_in_flight or stale):
+                self.trial_in_flight = True
+                self.trial_started_at = now
+                return True
+            raise CircuitOpenError("LLM circuit breaker is open")
+
+    def release_trial(self) -> None:
+        """The trial call was cancelled without an outcome, the next call is the trial."""
+        with self._lock:
+            if self.state == "half_open":
+                self.trial_in_flight = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self.trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self.trial_in_flight = False
+
+
+class LLMResilience:
+    """
+    App-scoped resilience policy of LLM calls: per-attempt timeout, retries with jittered exponential backoff,
+    optional hedging (a second attempt, possibly on a faster model, once the first one is slower than
+    a latency percentile of recent calls; the first valid result wins) and a circuit breaker.
+    """
+
+    def __init__(self, resilience_config: DictConfig):
+        self.attempt_timeout = resilience_config["attempt_timeout"]
+        self.max_retries = resilience_config["max_retries"]
+        self.backoff_base = resilience_config["backoff_base"]
+        self.backoff_max = resilience_config["backoff_max"]
+
+        hedging_config = resilience_config["hedging"]
+        self.hedging_enabled = hedging_config["enabled"]
+        self.hedge_model = hedging_config["model"]
+        self.hedge_percentile = hedging_config["percentile"]
+        self.hedge_min_samples = hedging_config["min_samples"]
+        self.hedge_initial_delay = hedging_config["initial_delay"]
+
+        breaker_config = resilience_config["circuit_breaker"]
+        self.breaker = CircuitBreaker(breaker_config["failure_threshold"], breaker_config["recovery_timeout"])
+
+        # sync attempts run here so that they can be timed out and hedged
+        self.executor = ThreadPoolExecutor(max_workers=resilience_config["sync_workers"], thread_name_prefix="llm-attempt")
+
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.counters = {
+            "calls": 0, "attempts": 0, "retries": 0, "timeouts": 0, "errors": 0,
+            "invalid_results": 0, "hedges": 0, "hedges_not_admitted": 0, "hedge_wins": 0, "short_circuited": 0,
+        }
+
+    def __count(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] += 1
+
+    def get_backoff(self, retry: int) -> float:
+        # "full jitter" exponential backoff
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** retry))
+
+    def get_hedge_delay(self, key: str) -> float:
+        with self._lock:
+            latencies = sorted(self.latencies.get(key, ()))
+        if len(latencies) < self.hedge_min_samples:
+            return self.hedge_initial_delay
+        position = min(len(latencies) - 1, math.ceil(self.hedge_percentile / 100 * len(latencies)) - 1)
+        return latencies[position]
+
+    def __record_latency(self, key: str, seconds: float) -> None:
+        with self._lock:
+            self.latencies.setdefault(key, deque(maxlen=200)).append(seconds)
+
+    def __check_result(self, result, validate) -> bool:
+        try:
+            validate(result)
+        except ValueError:
+            self.__count("invalid_results")
+            return False
+        return True
+
+    def __admit_hedge(self, try_admit) -> bool:
+        if try_admit is None or try_admit():
+            self.__count("hedges")
+            return True
+        self.__count("hedges_not_admitted")
+        return False
+
+    def __attempt(self, key: str, primary, hedge, inputs: dict, validate, try_admit):
+        started = time.perf_counter()
+        deadline = started + self.attempt_timeout
+        hedge_at = started + self.get_hedge_delay(key) if hedge is not None else None
+
+        futures = {self.executor.submit(primary, inputs): "primary"}
+        last_error = None
+        while futures or hedge_at is not None:
+            now = time.perf_counter()
+            if hedge_at is not None and (now >= hedge_at or not futures):
+                if self.__admit_hedge(try_admit):
+                    futures[self.executor.submit(hedge, inputs)] = "hedge"
+                hedge_at = None
+                continue
+
+            wait_until = min(deadline, hedge_at) if hedge_at is not None else deadline
+            done, _ = wait(futures, timeout=max(0.0, wait_until - now), return_when=FIRST_COMPLETED)
+            if not done:
+                if time.perf_counter() >= deadline:
+                    for future in futures:
+                        future.cancel()
+                    self.__count("timeouts")
+                    self.breaker.record_failure()
+                    raise AttemptTimeoutError(f"LLM attempt timed out after {self.attempt_timeout} s")
+                continue
+
+            for future in done:
+                name = futures.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    self.__count("errors")
+                    self.breaker.record_failure()
+                    last_error = e
+                    continue
+                self.breaker.record_success()
+                if not self.__check_result(result, validate):
+                    last_error = ValueError("LLM returned an invalid result")
+                    continue
+                self.__record_latency(key, time.perf_counter() - started)
+                if name == "hedge":
+                    self.__count("hedge_wins")
+                for pending in futures:
+                    pending.cancel()
+                return result
+        raise last_error
+
+    async def __aattempt(self, key: str, primary, hedge, inputs: dict, validate, try_admit):
+        started = time.perf_counter()
+        deadline = started + self.attempt_timeout
+        hedge_at = started + self.get_hedge_delay(key) if hedge is not None else None
+
+        tasks = {asyncio.ensure_future(primary(inputs)): "primary"}
+        last_error = None
+        try:
+            while tasks or hedge_at is not None:
+                now = time.perf_counter()
+                if hedge_at is not None and (now >= hedge_at or not tasks):
+                    if self.__admit_hedge(try_admit):
+                        tasks[asyncio.ensure_future(hedge(inputs))] = "hedge"
+                    hedge_at = None
+                    continue
+
+                wait_until = min(deadline, hedge_at) if hedge_at is not None else deadline
+                done, _ = await asyncio.wait(tasks, timeout=max(0.0, wait_until - now), return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if time.perf_counter() >= deadline:
+                        self.__count("timeouts")
+                        self.breaker.record_failure()
+                        raise AttemptTimeoutError(f"LLM attempt timed out after {self.attempt_timeout} s")
+                    continue
+
+                for task in done:
+                    name = tasks.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        self.__count("errors")
+                        self.breaker.record_failure()
+                        last_error = e
+                        continue
+                    self.breaker.record_success()
+                    if not self.__check_result(result, validate):
+                        last_error = ValueError("LLM returned an invalid result")
+                        continue
+                    self.__record_latency(key, time.perf_counter() - started)
+                    if name == "hedge":
+                        self.__count("hedge_wins")
+                    return result
+            raise last_error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def __before_call(self) -> bool:
+        try:
+            trial = self.breaker.before_call()
+        except CircuitOpenError:
+            self.__count("short_circuited")
+            raise
+        self.__count("attempts")
+        return trial
+
+    def call(self, key: str, primary, hedge, inputs: dict, validate, admit=None, try_admit=None):
+        """
+        Args:
+            key: Latency statistics key of the call (model name)
+            primary: Attempt function, called with inputs
+            hedge: Hedge attempt function or None
+            inputs: Chain inputs
+            validate: Raises ValueError for an invalid result
+            admit: Blocks until an attempt is admitted (raises if it is rejected), called before every attempt,
+                outside of its timeout
+            try_admit: Admits a hedge attempt at once or returns False, the hedge is then not started
+        """
+        self.__count("calls")
+        for retry in range(self.max_retries + 1):
+            if admit is not None:
+                admit()
+            trial = self.__before_call()
+            try:
+                return self.__attempt(key, primary, hedge, inputs, validate, try_admit)
+            except Exception:
+                if retry == self.max_retries:
+                    raise
+            except BaseException:
+                if trial:
+                    self.breaker.release_trial()
+                raise
+            self.__count("retries")
+            time.sleep(self.get_backoff(retry))
+
+    async def acall(self, key: str, primary, hedge, inputs: dict, validate, admit=None, try_admit=None):
+        """
+        Args:
+            admit: Coroutine function admitting an attempt
+        """
+        self.__count("calls")
+        for retry in range(self.max_retries + 1):
+            if admit is not None:
+                await admit()
+            trial = self.__before_call()
+            try:
+                return await self.__aattempt(key, primary, hedge, inputs, validate, try_admit)
+            except Exception:
+                if retry == self.max_retries:
+                    raise
+            except BaseException:
+                # cancelled (request deadline, job drain): the trial has no outcome
+                if trial:
+                    self.breaker.release_trial()
+                raise
+            self.__count("retries")
+            await asyncio.sleep(self.get_backoff(retry))
+
+    def stats(self) -> dict:
+        with self._lock:
+            hedge_delays = {key: None for key in self.latencies}
+            counters = dict(self.counters)
+        for key in hedge_delays:
+            hedge_delays[key] = round(self.get_hedge_delay(key), 3)
+        return {
+            **counters,
+            "circuit_breaker": self.breaker.state,
+            "hedge_delay_seconds": hedge_delays,
+        }
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ResilientChain:
+    """
+    Chain wrapper calling invoke/ainvoke through LLMResilience, with an optional hedge chain.
+    With a CallAdmission every attempt is admitted: retries wait for admission, hedges only start when admitted at once.
+    Streaming is passed through to the primary chain (admitted once).
+    """
+
+    def __init__(self, chain, hedge_chain, llm_resilience: LLMResilience, key: str, validate, call_admission=None):
+        self.chain = chain
+        self.hedge_chain = hedge_chain
+        self.llm_resilience = llm_resilience
+        self.key = key
+        self.validate = validate
+        self.call_admission = call_admission
+
+    def invoke(self, inputs: dict):
+        hedge = self.hedge_chain.invoke if self.hedge_chain is not None else None
+        admit = try_admit = None
+        if self.call_admission is not None:
+            tokens = self.call_admission.estimate_tokens(inputs)
+            admit = lambda: self.call_admission.acquire(tokens)
+            try_admit = lambda: self.call_admission.try_acquire(tokens)
+        return self.llm_resilience.call(self.key, self.chain.invoke, hedge, inputs, self.validate, admit, try_admit)
+
+    async def ainvoke(self, inputs: dict):
+        hedge = self.hedge_chain.ainvoke if self.hedge_chain is not None else None
+        admit = try_admit = None
+        if self.call_admission is not None:
+            tokens = await self.call_admission.aestimate_tokens(inputs)
+            admit = lambda: self.call_admission.aacquire(tokens)
+            try_admit = lambda: self.call_admission.try_acquire(tokens)
+        return await self.llm_resilience.acall(self.key, self.chain.ainvoke, hedge, inputs, self.validate, admit, try_admit)
+
+    async def astream(self, inputs: dict):
+        if self.call_admission is not None:
+            await self.call_admission.aacquire(await self.call_admission.aestimate_tokens(inputs))
+        async for chunk in self.chain.astream(inputs):
+            yield chunk
@@ -0,0 +1,69 @@
+import json
+import time
+import hashlib
+import threading
+
+from omegaconf import OmegaConf, DictConfig
+
+
+class PlanCache:
+    """
+    Content-addressed cache of generated plans.
+
+    Keys are sha256 of the normalized prompt inputs (formatted user data, scanner data, previous week,
+    feedback, available exercises), the catalog and prompt assets checksums and the configs version,
+    so any change of what reaches the prompt is a different entry. Entries are stored in a cache backend.
+    """
+
+    def __init__(self, backend, version: str):
+        self.backend = backend
+        self.version = version
+
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self.lookup_seconds = 0.0
+
+    @staticmethod
+    def compute_version(*configs) -> str:
+        digest = hashlib.sha256()
+        for config in configs:
+            if isinstance(config, DictConfig):
+                config = OmegaConf.to_container(config, resolve=True)
+            digest.update(json.dumps(config, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+        return digest.hexdigest()
+
+    def make_key(self, mode: str, inputs: dict) -> str:
+        payload = json.dumps({"version": self.version, "mode": mode, "inputs": inputs}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        started = time.perf_counter()
+        value = self.backend.get(key)
+        elapsed = time.perf_counter() - started
+
+        entry = json.loads(value) if value is not None else None
+        with self._lock:
+            self.lookup_seconds += elapsed
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.saved_seconds += entry["generation_seconds"]
+        return entry["plan"]
+
+    def put(self, key: str, plan: str, generation_seconds: float) -> None:
+        self.backend.set(key, json.dumps({"plan": plan, "generation_seconds": generation_seconds}))
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                **self.backend.stats(),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "latency_saved_seconds": round(self.saved_seconds, 3),
+                "avg_lookup_ms": round(self.lookup_seconds / lookups * 1e3, 3) if lookups else 0.0,
+            }
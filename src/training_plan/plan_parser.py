@@ -0,0 +1,195 @@
+import json
+import threading
+from typing import Callable
+
+
+PYTHON_LITERALS = {"None": "null", "True": "true", "False": "false"}
+# characters a JSON value can end with, outside of strings
+VALUE_END = set('"}]0123456789') | {"e", "l"}
+NUMBER_CHARS = set("0123456789+-.eE")
+
+
+def extract_json_object(text: str) -> str | None:
+    """
+    Finds the first top-level JSON object in the text (skipping code fences and surrounding prose).
+    An object that is not closed (truncated output) is returned up to the end of the text.
+    """
+    start = text.find("{")
+    if start == -1:
+        return None
+
+    depth = 0
+    in_string = False
+    escaped = False
+    for position in range(start, len(text)):
+        char = text[position]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            depth += 1
+        elif char in "}]":
+            depth -= 1
+            if depth == 0:
+                return text[start:position + 1]
+    return text[start:]
+
+
+def repair_json(text: str) -> str:
+    """
+    Local repair of common LLM JSON defects: trailing commas, missing commas between values,
+    single-quoted strings, Python literals and unclosed strings, objects and arrays of truncated output.
+    """
+    output = []
+    stack = []
+    quote = None
+    escaped = False
+    position = 0
+
+    def last_significant() -> str:
+        for chunk in reversed(output):
+            stripped = chunk.rstrip()
+            if stripped:
+                return stripped[-1]
+        return ""
+
+    def drop_trailing_comma() -> None:
+        while output and not output[-1].strip():
+            output.pop()
+        if output and output[-1].rstrip().endswith(","):
+            output[-1] = output[-1].rstrip()[:-1]
+
+    while position < len(text):
+        char = text[position]
+
+        if quote is not None:
+            if escaped:
+                escaped = False
+                # \' is not a valid JSON escape
+                output.append("'" if char == "'" else "\\" + char)
+            elif char == "\\":
+                escaped = True
+            elif char == quote:
+                output.append('"')
+                quote = None
+            elif char == '"':
+                output.append('\\"')
+            elif char == "\n":
+                output.append("\\n")
+            else:
+                output.append(char)
+            position += 1
+            continue
+
+        if char in "\"'":
+            if last_significant() in VALUE_END and stack:
+                output.append(",")
+            output.append('"')
+            quote = char
+        elif char in "{[":
+            if last_significant() in VALUE_END and stack:
+                output.append(",")
+            stack.append("}" if char == "{" else "]")
+            output.append(char)
+        elif char in "}]":
+            drop_trailing_comma()
+            if stack:
+                output.append(stack.pop())
+        elif char.isalnum() or char == "-":
+            end = position + 1
+            token_chars = NUMBER_CHARS if not char.isalpha() else None
+            while end < len(text) and (text[end] in token_chars if token_chars else text[end].isalnum()):
+                end += 1
+            word = text[position:end]
+            if last_significant() in VALUE_END and stack:
+                output.append(",")
+            output.append(PYTHON_LITERALS.get(word, word))
+            position = end
+            continue
+        else:
+            output.append(char)
+        position += 1
+
+    if quote is not None:
+        output.append('"')
+    drop_trailing_comma()
+    if last_significant() == ":":
+        output.append("null")
+    while stack:
+        output.append(stack.pop())
+    return "".join(output)
+
+
+def parse_plan(text: str) -> tuple:
+    """
+    Args:
+        text: LLM output expected to contain a JSON object
+
+    Returns:
+        (plan, how): how is "strict", "extracted" (found in surrounding text) or "repaired"
+    """
+    text = text.strip()
+    try:
+        return json.loads(text), "strict"
+    except json.JSONDecodeError:
+        pass
+
+    candidate = extract_json_object(text)
+    if candidate is not None:
+        for how, repair in (("extracted", False), ("repaired", True)):
+            try:
+                plan = json.loads(repair_json(candidate) if repair else candidate)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(plan, dict):
+                return plan, how
+    raise ValueError("Failed to decode JSON. Output received:\n" + text)
+
+
+class PlanParser:
+    """
+    Tolerant parser of generated plans, app-scoped to count the outputs it saved from a full regeneration:
+    extracted from surrounding text, repaired locally or repaired by the cheap repair model.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {"strict": 0, "extracted": 0, "repaired": 0, "model_repaired": 0, "failed": 0}
+
+    def __count(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] += 1
+
+    def parse(self, text: str, check: Callable[[dict], None] | None = None) -> dict:
+        """
+        Args:
+            text: LLM output
+            check: Raises ValueError for a plan that does not follow its skeleton, counted as failed
+        """
+        try:
+            plan, how = parse_plan(text)
+            if check is not None:
+                check(plan)
+        except ValueError:
+            self.__count("failed")
+            raise
+        self.__count(how)
+        return plan
+
+    def record_model_repair(self) -> None:
+        with self._lock:
+            # the failure of the local parse was already counted
+            self.counters["failed"] -= 1
+            self.counters["model_repaired"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+        counters["regenerations_avoided"] = counters["extracted"] + counters["repaired"] + counters["model_repaired"]
+        return counters
@@ -0,0 +1,136 @@
+import os
+import time
+import hashlib
+import threading
+from dataclasses import dataclass
+
+from src.logger import get_logger
+from src.training_plan.prompt_distillation import load_variant
+
+
+@dataclass(frozen=True)
+class PromptAssetsSnapshot:
+    avatar_examples: str
+    avatar_example_texts: tuple
+    merged_recs: str
+    version: int
+    checksum: str = ""
+    # file names of the avatar examples without the extension, in avatar_example_texts order
+    avatar_example_names: tuple = ()
+
+
+class PromptAssets:
+    """
+    Static prompt assets (avatar training program examples and Eric recommendations) loaded once
+    and shared between requests. File mtimes are checked at most every check_interval seconds,
+    edited assets are reloaded without a restart.
+
+    With an artifacts directory, the distilled variant of every asset replaces its source text.
+    An asset without an artifact of its current source (not distilled yet, or edited since) is used raw.
+    """
+
+    def __init__(
+            self,
+            training_program_examples_dir: str | None,
+            eric_recommendations_path: str | None,
+            check_interval: float = 5.0,
+            artifacts_dir: str | None = None,
+            variant: str = "raw"
+    ):
+        self.training_program_examples_dir = training_program_examples_dir
+        self.eric_recommendations_path = eric_recommendations_path
+        self.check_interval = check_interval
+        self.artifacts_dir = artifacts_dir
+        self.variant = variant
+
+        self.logger = get_logger(name=self.__class__.__name__)
+        self._lock = threading.Lock()
+        self._mtimes = {}
+        self._checked_at = 0.0
+        self._snapshot = PromptAssetsSnapshot("", (), "", 0)
+
+        self.reload()
+
+    def __avatar_example_paths(self) -> list:
+        examples_dir = self.training_program_examples_dir
+        if not examples_dir or not os.path.isdir(examples_dir):
+            return []
+        return [
+            os.path.join(examples_dir, file_name)
+            for file_name in sorted(os.listdir(examples_dir))
+            if file_name.endswith(".txt")
+        ]
+
+    def __current_mtimes(self) -> dict:
+        paths = self.__avatar_example_paths()
+        if self.eric_recommendations_path and os.path.isfile(self.eric_recommendations_path):
+            paths.append(self.eric_recommendations_path)
+
+        mtimes = {}
+        for path in paths:
+            try:
+                mtimes[path] = os.stat(path).st_mtime_ns
+            except FileNotFoundError:
+                continue
+        return mtimes
+
+    def __read(self, path: str) -> str:
+        with open(path, "r", encoding="utf-8") as file:
+            text = file.read().strip()
+        if self.variant == "raw" or not self.artifacts_dir:
+            return text
+        distilled = load_variant(self.artifacts_dir, text, self.variant)
+        if distilled is None:
+            self.logger.warning(f"No {self.variant} artifact of the current {path}, using the raw text")
+            return text
+        return distilled
+
+    def reload(self) -> None:
+        with self._lock:
+            mtimes = self.__current_mtimes()
+
+            avatar_example_texts = tuple(self.__read(path) for path in self.__avatar_example_paths())
+            merged_recs = ""
+            if self.eric_recommendations_path and os.path.isfile(self.eric_recommendations_path):
+                merged_recs = self.__read(self.eric_recommendations_path)
+
+            digest = hashlib.sha256()
+            for text in (*avatar_example_texts, merged_recs):
+                digest.update(text.encode("utf-8"))
+                digest.update(b"\0")
+
+            self._snapshot = PromptAssetsSnapshot(
+                avatar_examples="\n\n".join(avatar_example_texts),
+                avatar_example_texts=avatar_example_texts,
+                merged_recs=merged_recs,
+                version=self._snapshot.version + 1,
+                checksum=digest.hexdigest(),
+                avatar_example_names=tuple(
+                    os.path.splitext(os.path.basename(path))[0] for path in self.__avatar_example_paths()
+                )
+            )
+            self._mtimes = mtimes
+            self._checked_at = time.monotonic()
+
+    def refresh(self) -> bool:
+        """
+        Reloads the assets if any file was added, removed or modified.
+
+        Returns:
+            True if the assets were reloaded
+        """
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return False
+        self._checked_at = now
+
+        if self.__current_mtimes() == self._mtimes:
+            return False
+
+        self.logger.info("Prompt assets changed on disk, reloading")
+        self.reload()
+        return True
+
+    def snapshot(self) -> PromptAssetsSnapshot:
+        self.refresh()
+        return self._snapshot
@@ -0,0 +1,145 @@
+import threading
+from typing import Callable
+
+from omegaconf import DictConfig
+
+from src.logger import get_logger
+from src.training_plan.token_counter import TokenCounter
+
+
+AVATAR_EXAMPLES_SEPARATOR = "\n\n"
+
+
+class PromptBudgeter:
+    """
+    Fits the prompt of a call into the token budget of its mode by trimming the large sections
+    in the configured order, each down to its minimum: fewer avatar examples (the last ones are dropped),
+    merged recommendations truncated at a line boundary, fewer exercises per day type.
+    Sections are counted with the shared TokenCounter, so the result is deterministic for given inputs.
+    The section sizes of every prompt are logged: at debug level as is, at info level when trimmed.
+    """
+
+    def __init__(self, config: DictConfig, token_counter: TokenCounter):
+        self.token_counter = token_counter
+        self.budgets = dict(config["budgets"])
+        self.trim_order = list(config["trim_order"])
+        self.min_avatar_examples = config["min_avatar_examples"]
+        self.min_merged_recs_tokens = config["min_merged_recs_tokens"]
+        self.min_exercises_per_day_type = config["min_exercises_per_day_type"]
+
+        self.logger = get_logger(name=self.__class__.__name__)
+        self._lock = threading.Lock()
+        self.counters = {"fitted": 0, "trimmed": 0, "over_budget": 0}
+
+    @staticmethod
+    def get_template_text(prompt) -> str:
+        return "".join(getattr(getattr(message, "prompt", None), "template", "") for message in prompt.messages)
+
+    def __count_sections(self, sections: dict) -> dict:
+        return {name: self.token_counter.count(value) for name, value in sections.items() if isinstance(value, str)}
+
+    def __trim_avatar_examples(self, avatar_examples: tuple, overflow: int) -> tuple:
+        kept = list(avatar_examples)
+        while overflow > 0 and len(kept) > self.min_avatar_examples:
+            overflow -= self.token_counter.count(kept.pop()) + 1
+        return tuple(kept)
+
+    def __trim_merged_recs(self, merged_recs: str, tokens: int, overflow: int) -> str:
+        allowance = max(self.min_merged_recs_tokens, tokens - overflow)
+        kept = []
+        used = 0
+        for line in merged_recs.splitlines():
+            line_tokens = self.token_counter.count(line) + 1
+            if used + line_tokens > allowance:
+                break
+            kept.append(line)
+            used += line_tokens
+        return "\n".join(kept).rstrip()
+
+    def __trim_exercises(self, render_exercises: Callable[[int | None], str], tokens: int, overflow: int) -> str:
+        """
+        Largest cap of exercises per day type whose block fits tokens - overflow (binary search),
+        the min_exercises_per_day_type block if none does.
+        """
+        allowance = tokens - overflow
+        low, high = self.min_exercises_per_day_type, self.min_exercises_per_day_type
+        # the largest useful cap: the block grows with the cap until no day type is capped
+        previous = None
+        while (block := render_exercises(high)) != previous and self.token_counter.count(block) < tokens:
+            previous = block
+            high *= 2
+        best = render_exercises(self.min_exercises_per_day_type)
+        while low <= high:
+            cap = (low + high) // 2
+            block = render_exercises(cap)
+            if self.token_counter.count(block) <= allowance:
+                best = block
+                low = cap + 1
+            else:
+                high = cap - 1
+        return best
+
+    def fit(
+            self,
+            mode: str,
+            prompt,
+            inputs: dict,
+            avatar_examples: tuple,
+            render_exercises: Callable[[int | None], str]
+    ) -> dict:
+        """
+        Args:
+            mode: "first_week" or "next_week", the budget of the mode applies
+            prompt: Prompt template of the call, with its partial variables
+            inputs: Inputs of the call
+            avatar_examples: Avatar example texts in priority order, the last ones are dropped first
+            render_exercises: Renders the available exercises block with a cap of exercises per day type
+
+        Returns:
+            Inputs of the call, with the trimmed sections overriding the partial variables
+        """
+        budget = self.budgets.get(mode)
+        sections = {**dict(getattr(prompt, "partial_variables", None) or {}), **inputs}
+        sizes = self.__count_sections(sections)
+        instructions = self.token_counter.count(self.get_template_text(prompt))
+        total = instructions + sum(sizes.values())
+        if budget is None or total <= budget:
+            with self._lock:
+                self.counters["fitted"] += 1
+            self.logger.debug(
+                f"Prompt budget of {mode}: {total}/{budget} tokens, instructions {instructions}, sections {sizes}"
+            )
+            return inputs
+
+        fitted = dict(inputs)
+        for section in self.trim_order:
+            overflow = total - budget
+            if overflow <= 0 or section not in sizes:
+                continue
+            if section == "avatars_examples":
+                kept = self.__trim_avatar_examples(avatar_examples, overflow)
+                fitted[section] = AVATAR_EXAMPLES_SEPARATOR.join(kept)
+            elif section == "merged_recs":
+                fitted[section] = self.__trim_merged_recs(sections[section], sizes[section], overflow)
+            elif section == "available_exercises":
+                fitted[section] = self.__trim_exercises(render_exercises, sizes[section], overflow)
+            else:
+                raise ValueError(f"Unknown prompt budget section: {section}")
+            trimmed_tokens = self.token_counter.count(fitted[section])
+            total += trimmed_tokens - sizes[section]
+            sizes[section] = trimmed_tokens
+
+        over_budget = total > budget
+        with self._lock:
+            self.counters["trimmed"] += 1
+            if over_budget:
+                self.counters["over_budget"] += 1
+        self.logger.info(
+            f"Prompt budget of {mode}: {total}/{budget} tokens{' (over budget)' if over_budget else ''}, "
+            f"instructions {instructions}, sections {sizes}"
+        )
+        return fitted
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counters)
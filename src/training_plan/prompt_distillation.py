@@ -0,0 +1,191 @@
+import os
+import re
+import json
+import hashlib
+from typing import Callable
+
+from omegaconf import DictConfig
+
+
+# bumped when the compression rules change, artifacts of other versions are not loaded
+PIPELINE_VERSION = 1
+VARIANTS = ("raw", "compressed", "summarized")
+
+
+def get_checksum(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def compress_whitespace(text: str) -> str:
+    """
+    Drops blank lines and trailing spaces, collapses runs of spaces and tabs.
+    Indented lines keep a single leading space, so nested items stay nested.
+    """
+    lines = []
+    for line in text.splitlines():
+        stripped = re.sub(r"[ \t]+", " ", line).strip()
+        if stripped:
+            lines.append((" " if line[:1].isspace() else "") + stripped)
+    return "\n".join(lines)
+
+
+class PromptDistiller:
+    """
+    Compact canonical forms of the long prompt assets: whitespace compressed, boilerplate lines dropped,
+    and, for the recommendations, every rule (a line of at least min_rule_chars characters) kept once.
+    Rules repeated across the per-avatar recommendations, or already in the merged ones, are moved out
+    of the per-avatar files into a common document.
+    """
+
+    def __init__(self, config: DictConfig):
+        self.boilerplate_patterns = [re.compile(pattern) for pattern in config["boilerplate_patterns"]]
+        self.min_rule_chars = config["min_rule_chars"]
+
+    def is_rule(self, line: str) -> bool:
+        return len(line.strip()) >= self.min_rule_chars
+
+    def compress(self, text: str, dedupe: bool = False, known_rules: frozenset = frozenset()) -> str:
+        """
+        Args:
+            text: Source text
+            dedupe: Keep every rule once (recommendations, not the avatar programs repeating exercises across days)
+            known_rules: Rules dropped because another document carries them
+        """
+        seen = set(known_rules)
+        kept = []
+        for line in compress_whitespace(text).splitlines():
+            key = line.strip()
+            if any(pattern.search(key) for pattern in self.boilerplate_patterns):
+                continue
+            if dedupe and self.is_rule(key):
+                if key in seen:
+                    continue
+                seen.add(key)
+            kept.append(line)
+        return "\n".join(kept)
+
+    def distill(self, avatar_examples: dict, merged_recs: str | None, avatar_recs: dict) -> dict:
+        """
+        Args:
+            avatar_examples: {name: avatar example text}
+            merged_recs: Merged recommendations text, None if there are none
+            avatar_recs: {name: per-avatar recommendations text}
+
+        Returns:
+            {name: {"kind", "source", "compressed"}}, with "common_recs" (source: the per-avatar recommendations
+            joined in name order) if any rule is shared
+        """
+        distilled = {
+            name: {"kind": "avatar_example", "source": text, "compressed": self.compress(text)}
+            for name, text in avatar_examples.items()
+        }
+
+        merged_rules = frozenset()
+        if merged_recs is not None:
+            compressed = self.compress(merged_recs, dedupe=True)
+            merged_rules = frozenset(line.strip() for line in compressed.splitlines() if self.is_rule(line))
+            distilled["merged_recs"] = {"kind": "merged_recs", "source": merged_recs, "compressed": compressed}
+
+        rules_by_avatar = {
+            name: [line.strip() for line in self.compress(text, dedupe=True).splitlines() if self.is_rule(line)]
+            for name, text in avatar_recs.items()
+        }
+        counts = {}
+        for rules in rules_by_avatar.values():
+            for rule in rules:
+                counts[rule] = counts.get(rule, 0) + 1
+        # shared rules in order of first occurrence
+        shared = [
+            rule for rule in dict.fromkeys(rule for name in sorted(rules_by_avatar) for rule in rules_by_avatar[name])
+            if counts[rule] > 1 and rule not in merged_rules
+        ]
+        for name, text in avatar_recs.items():
+            distilled[name] = {
+                "kind": "avatar_recs",
+                "source": text,
+                "compressed": self.compress(text, dedupe=True, known_rules=merged_rules | frozenset(shared)),
+            }
+        if shared:
+            source = "\n".join(avatar_recs[name] for name in sorted(avatar_recs))
+            distilled["common_recs"] = {"kind": "common_recs", "source": source, "compressed": "\n".join(shared)}
+        return distilled
+
+
+def get_artifact_path(artifacts_dir: str, source_checksum: str) -> str:
+    return os.path.join(artifacts_dir, f"{source_checksum}.v{PIPELINE_VERSION}.json")
+
+
+def write_artifact(artifacts_dir: str, name: str, kind: str, source: str, variants: dict) -> str:
+    """
+    Stores the variants of a source text, keyed by its checksum and the pipeline version.
+
+    Returns:
+        Source checksum
+    """
+    source_checksum = get_checksum(source)
+    artifact = {
+        "name": name,
+        "kind": kind,
+        "source_checksum": source_checksum,
+        "pipeline_version": PIPELINE_VERSION,
+        "variants": variants,
+    }
+    with open(get_artifact_path(artifacts_dir, source_checksum), "w", encoding="utf-8") as file:
+        json.dump(artifact, file, ensure_ascii=False, indent=2)
+    return source_checksum
+
+
+def load_variant(artifacts_dir: str, source: str, variant: str) -> str | None:
+    """
+    Returns:
+        The variant of the source text, None if there is no artifact of the current source and pipeline version
+        or it lacks the variant
+    """
+    if variant == "raw":
+        return source
+    path = get_artifact_path(artifacts_dir, get_checksum(source))
+    if not os.path.isfile(path):
+        return None
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)["variants"].get(variant)
+
+
+def run_distillation(
+        distiller: PromptDistiller,
+        artifacts_dir: str,
+        avatar_examples: dict,
+        merged_recs: str | None,
+        avatar_recs: dict,
+        summarize: Callable[[str, str], str] | None = None
+) -> dict:
+    """
+    Distills the assets into artifacts_dir, with a manifest of the current artifacts.
+    Artifacts of sources that changed since the previous run are deleted.
+
+    Args:
+        summarize: Summarizes a compressed text of a kind, no summarized variants if None
+
+    Returns:
+        Manifest: {name: {"kind", "source_checksum", "source_chars", "compressed_chars"[, "summarized_chars"]}}
+    """
+    os.makedirs(artifacts_dir, exist_ok=True)
+    manifest = {}
+    for name, item in distiller.distill(avatar_examples, merged_recs, avatar_recs).items():
+        variants = {"compressed": item["compressed"]}
+        if summarize is not None:
+            variants["summarized"] = summarize(item["kind"], item["compressed"])
+        source_checksum = write_artifact(artifacts_dir, name, item["kind"], item["source"], variants)
+        manifest[name] = {
+            "kind": item["kind"],
+            "source_checksum": source_checksum,
+            "source_chars": len(item["source"]),
+            **{f"{variant}_chars": len(text) for variant, text in variants.items()},
+        }
+    with open(os.path.join(artifacts_dir, "manifest.json"), "w", encoding="utf-8") as file:
+        json.dump({"pipeline_version": PIPELINE_VERSION, "artifacts": manifest}, file, ensure_ascii=False, indent=2)
+
+    current = {os.path.basename(get_artifact_path(artifacts_dir, item["source_checksum"])) for item in manifest.values()}
+    for file_name in os.listdir(artifacts_dir):
+        if re.fullmatch(r"[0-9a-f]{64}\.v\d+\.json", file_name) and file_name not in current:
+            os.remove(os.path.join(artifacts_dir, file_name))
+    return manifest
@@ -0,0 +1,80 @@
+"""
+Offline distillation of the long prompt assets (avatar examples, merged and per-avatar Eric recommendations)
+into compact variants, stored as artifacts keyed by the checksum of their source. The service loads the
+prompt_distillation.variant of an asset at startup if its artifact matches the current source.
+
+Usage:
+    python -m src.training_plan.prompt_distillation_cli --output data/prompt_assets_distilled [--summarize]
+"""
+import os
+import glob
+import argparse
+
+import dotenv
+from omegaconf import OmegaConf
+
+from src.logger import get_logger
+from src.training_plan.prompt_distillation import PromptDistiller, run_distillation
+
+
+logger = get_logger(__name__)
+
+
+def read_text(path: str) -> str:
+    # stripped like the service reads the assets, so the checksums match
+    with open(path, "r", encoding="utf-8") as file:
+        return file.read().strip()
+
+
+def create_summarizer(api_key: str, train_assistant_config):
+    from src.training_plan.llm_clients import LLMClientRegistry
+
+    summary_config = train_assistant_config["prompt_distillation"]["summary"]
+    llm = LLMClientRegistry(api_key, train_assistant_config["llm_clients"]).get(summary_config["model"])
+
+    def summarize(kind: str, text: str) -> str:
+        prompt = summary_config["prompt"].format(kind=kind.replace("_", " "), text=text)
+        return llm.invoke(prompt).content.strip()
+
+    return summarize
+
+
+def main(output: str, examples_dir: str, recommendations_dir: str, summarize: bool) -> dict:
+    train_assistant_config = OmegaConf.load(os.getenv("TRAIN_ASSISTANT_CONFIG_PATH"))
+    distiller = PromptDistiller(train_assistant_config["prompt_distillation"])
+
+    avatar_examples = {
+        os.path.splitext(os.path.basename(path))[0]: read_text(path)
+        for path in sorted(glob.glob(os.path.join(examples_dir, "*.txt")))
+    }
+    merged_recs_path = os.path.join(recommendations_dir, "merged_recs.txt")
+    merged_recs = read_text(merged_recs_path) if os.path.isfile(merged_recs_path) else None
+    avatar_recs = {
+        os.path.splitext(os.path.basename(path))[0]: read_text(path)
+        for path in sorted(glob.glob(os.path.join(recommendations_dir, "avatar_*_recs.txt")))
+    }
+
+    summarizer = create_summarizer(os.getenv("API_KEY"), train_assistant_config) if summarize else None
+    manifest = run_distillation(distiller, output, avatar_examples, merged_recs, avatar_recs, summarizer)
+
+    source_chars = sum(item["source_chars"] for name, item in manifest.items() if item["kind"] != "common_recs")
+    compressed_chars = sum(item["compressed_chars"] for item in manifest.values())
+    logger.info(f"Distilled {len(manifest)} assets into {output}: {source_chars} -> {compressed_chars} characters")
+    return manifest
+
+
+if __name__ == "__main__":
+    dotenv.load_dotenv()
+    recommendations_path = os.getenv("ERIC_RECOMMENDATIONS_PATH")
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--output", default=os.getenv("PROMPT_ASSETS_ARTIFACTS_DIR"), help="Artifacts directory, PROMPT_ASSETS_ARTIFACTS_DIR if not set")
+    parser.add_argument("--examples-dir", default=os.getenv("TRAINING_PROGRAM_EXAMPLES_DIR"), help="Avatar examples, TRAINING_PROGRAM_EXAMPLES_DIR if not set")
+    parser.add_argument(
+        "--recommendations-dir",
+        default=os.path.dirname(recommendations_path) if recommendations_path else None,
+        help="merged_recs.txt and avatar_N_recs.txt, the directory of ERIC_RECOMMENDATIONS_PATH if not set"
+    )
+    parser.add_argument("--summarize", action="store_true", help="Also store LLM summarized variants (prompt_distillation.summary)")
+    args = parser.parse_args()
+    main(args.output, args.examples_dir, args.recommendations_dir, args.summarize)
@@ -0,0 +1,94 @@
+import re
+import threading
+
+from omegaconf import DictConfig
+from langchain.prompts.chat import ChatPromptTemplate, HumanMessagePromptTemplate
+
+from src.training_plan.prompt_assets import PromptAssetsSnapshot
+from src.training_plan.train_week import TrainWeek
+
+
+class PromptTemplates:
+    """
+    Prompt templates of train assistant modes compiled once per process.
+
+    Static sections (plan skeleton of the training days count, avatar examples, Eric recommendations)
+    are bound as partial variables, so a request only substitutes its user-specific fields.
+    Day-scope templates of the "per_day" generation mode take the skeleton of one day as input.
+    """
+    MODES = ("first_week", "next_week")
+
+    def __init__(self, train_assistant_config: DictConfig, train_weeks_templates: dict):
+        self.train_weeks_templates = train_weeks_templates
+        self.templates = {
+            mode: ChatPromptTemplate.from_messages([
+                HumanMessagePromptTemplate.from_template(train_assistant_config["train_assistant"][mode]["prompt_template"])
+            ])
+            for mode in self.MODES
+        }
+        day_scope_note = train_assistant_config["generation"]["day_scope_note"]
+        self.day_scope_templates = {
+            mode: ChatPromptTemplate.from_messages([
+                HumanMessagePromptTemplate.from_template(
+                    train_assistant_config["train_assistant"][mode]["prompt_template"] + day_scope_note
+                )
+            ])
+            for mode in self.MODES
+        }
+
+        self._lock = threading.Lock()
+        self._partials = {}
+        self._assets_version = None
+
+    def get_train_days_numbers(self) -> list:
+        train_days_numbers = []
+        for key in self.train_weeks_templates:
+            match = re.fullmatch(r"day_(\d+)_template", key)
+            if match:
+                train_days_numbers.append(int(match.group(1)))
+        return sorted(train_days_numbers)
+
+    def __reset_on_new_assets(self, prompt_assets: PromptAssetsSnapshot) -> None:
+        if self._assets_version != prompt_assets.version:
+            self._partials = {}
+            self._assets_version = prompt_assets.version
+
+    def get(self, mode: str, train_days_num: int, prompt_assets: PromptAssetsSnapshot) -> ChatPromptTemplate:
+        """
+        Returns:
+            Prompt template of the mode with the static sections already bound
+        """
+        key = (mode, train_days_num)
+        with self._lock:
+            self.__reset_on_new_assets(prompt_assets)
+
+            if key not in self._partials:
+                train_week = TrainWeek(week_templates=self.train_weeks_templates, train_days_num=train_days_num)
+                self._partials[key] = self.templates[mode].partial(
+                    week_template=str(train_week.week),
+                    avatars_examples=prompt_assets.avatar_examples,
+                    merged_recs=prompt_assets.merged_recs
+                )
+            return self._partials[key]
+
+    def get_day_scope(self, mode: str, prompt_assets: PromptAssetsSnapshot) -> ChatPromptTemplate:
+        """
+        Returns:
+            Day-scope prompt template of the mode, week_template and week_day_types are left as inputs
+        """
+        key = (mode, "day_scope")
+        with self._lock:
+            self.__reset_on_new_assets(prompt_assets)
+
+            if key not in self._partials:
+                self._partials[key] = self.day_scope_templates[mode].partial(
+                    avatars_examples=prompt_assets.avatar_examples,
+                    merged_recs=prompt_assets.merged_recs
+                )
+            return self._partials[key]
+
+    def warm_up(self, prompt_assets: PromptAssetsSnapshot) -> None:
+        for mode in self.MODES:
+            for train_days_num in self.get_train_days_numbers():
+                self.get(mode, train_days_num, prompt_assets)
+            self.get_day_scope(mode, prompt_assets)
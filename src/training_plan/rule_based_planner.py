@@ -0,0 +1,221 @@
+import copy
+
+import numpy as np
+from omegaconf import OmegaConf, DictConfig
+
+from src.exercises.exercises_processor import ExercisesProcessor
+from src.user_data.user_data_processor import UserDataProcessor
+
+
+class RuleBasedPlanner:
+    """
+    Deterministic week plan built from the local inputs of the prompt: the week template, the filtered
+    exercise pools, workout time, the age period rep/rest ranges and the nutrition goal.
+    No LLM call: a plan takes milliseconds, the "rules" engine and the fallback of the LLM engine.
+    """
+
+    def __init__(
+            self,
+            rule_based_config: DictConfig,
+            plan_rules: DictConfig,
+            user_data_processor: UserDataProcessor,
+            exercises_processor: ExercisesProcessor
+    ):
+        # plain containers: the config is read in the inner loops
+        self.config = OmegaConf.to_container(rule_based_config, resolve=True)
+        self.plan_rules = OmegaConf.to_container(plan_rules, resolve=True) if isinstance(plan_rules, DictConfig) else plan_rules
+
+        self.workout_time = user_data_processor.get_workout_time()
+        self.nutrition_goal = user_data_processor.get_nutrition_goal()
+        self.limitations = list(user_data_processor.get_exercise_limitations_descriptions())
+        self.body_weight = user_data_processor.get_weight_kg()
+        self.load_multiplier = (
+            self.config["fitness_level_loads"].get(user_data_processor.get_fitness_level(), 1.0)
+            * self.config["gender_loads"].get(user_data_processor.get_gender(), 1.0)
+        )
+
+        catalog = exercises_processor.get_catalog_arrays(
+            ("rule_based_planner", repr(self.config["compound"]), repr(self.config["load_ratios"])),
+            self.__build_catalog_arrays
+        )
+        self.names = catalog["names"]
+        self.body_parts = catalog["body_parts"]
+        self.compound_mask = catalog["compound_mask"]
+        self.load_ratios = catalog["load_ratios"]
+        self.excluded_mask = self.__get_excluded_mask(catalog["lower_names"])
+
+        aliases = self.config["body_part_aliases"]
+        self.priority_body_parts = []
+        for body_part in user_data_processor.get_improve_body_parts():
+            for catalog_body_part in aliases.get(str(body_part).lower(), []):
+                if catalog_body_part not in self.priority_body_parts:
+                    self.priority_body_parts.append(catalog_body_part)
+
+    def __build_catalog_arrays(self, exercises_processor: ExercisesProcessor) -> dict:
+        """
+        Arrays of the catalog shared by the planners of every request, read-only.
+        """
+        processed_df = exercises_processor.processed_df
+        compound_config = self.config["compound"]
+        shares = exercises_processor.muscles_df.to_numpy()
+        arrays = {
+            "names": processed_df["Exercise Name"].to_numpy(),
+            "lower_names": processed_df["Exercise Name"].astype(str).str.lower().to_numpy(dtype=str),
+            "body_parts": processed_df["Body Part"].to_numpy(),
+            "compound_mask": (shares >= compound_config["min_share"]).sum(axis=1) >= compound_config["min_muscles"],
+            "load_ratios": self.__get_load_ratios(processed_df),
+        }
+        for array in arrays.values():
+            array.flags.writeable = False
+        return arrays
+
+    def __get_excluded_mask(self, lower_names: np.ndarray) -> np.ndarray:
+        exclusions = self.config["limitation_exclusions"]
+        fragments = {fragment for limitation in self.limitations for fragment in exclusions.get(limitation, [])}
+        excluded_mask = np.zeros(len(lower_names), dtype=bool)
+        for fragment in fragments:
+            excluded_mask |= np.char.find(lower_names, fragment) >= 0
+        return excluded_mask
+
+    def __get_load_ratios(self, processed_df) -> np.ndarray:
+        """
+        (compound, isolation) share of body weight of every catalog exercise, by its first configured equipment.
+        """
+        load_ratios = self.config["load_ratios"]
+        ratios = np.tile(np.array(load_ratios["default"], dtype=float), (len(processed_df), 1))
+        assigned = np.zeros(len(processed_df), dtype=bool)
+        for equipment, equipment_ratios in load_ratios.items():
+            if equipment == "default" or equipment not in processed_df.columns:
+                continue
+            mask = (processed_df[equipment].to_numpy() > 0) & ~assigned
+            ratios[mask] = equipment_ratios
+            assigned |= mask
+        return ratios
+
+    def get_body_part_order(self, day_type: str) -> list:
+        order = list(self.config["day_type_body_parts"][day_type])
+        # stable: priority body parts lead, the rest keeps its order
+        return sorted(order, key=lambda body_part: body_part not in self.priority_body_parts)
+
+    def select_exercises(self, day_type: str, positions: np.ndarray, variant: int) -> list:
+        """
+        Round robin over the body parts of the session, compound exercises first within a body part.
+        Repeats of a day type (and the next week) start further in every pool for variety.
+
+        Returns:
+            Catalog row positions of the session exercises, compound exercises first
+        """
+        compound_mask = self.compound_mask
+        order = self.get_body_part_order(day_type)
+        pools = {}
+        for body_part in dict.fromkeys(order):
+            pool = [
+                position for position in positions
+                if self.body_parts[position] == body_part and not self.excluded_mask[position]
+            ]
+            pool.sort(key=lambda position: not compound_mask[position])
+            if pool:
+                shift = variant * order.count(body_part) % len(pool)
+                pools[body_part] = pool[shift:] + pool[:shift]
+
+        exercises_num = max(self.config["min_exercises"], self.workout_time // self.config["minutes_per_exercise"])
+        selected = []
+        while len(selected) < exercises_num and any(pools.values()):
+            for body_part in order:
+                if len(selected) == exercises_num:
+                    break
+                if pools.get(body_part):
+                    selected.append(pools[body_part].pop(0))
+
+        return sorted(selected, key=lambda position: not compound_mask[position])
+
+    def get_recommended_weight(self, position: int, compound: bool) -> float:
+        weight = self.body_weight * self.load_ratios[position, 0 if compound else 1] * self.load_multiplier
+        return self.round_weight(weight) if weight > 0 else 0.0
+
+    def round_weight(self, weight: float) -> float:
+        step = self.config["weight_step"]
+        return float(max(step, round(weight / step) * step))
+
+    @staticmethod
+    def get_previous_weights(previous_week: dict | None) -> dict:
+        weights = {}
+        for day in (previous_week or {}).values():
+            for name, exercise in (day.get("exercises") or {}).items():
+                weight = exercise.get("actual_weight")
+                if weight is None:
+                    weight = exercise.get("recommended_weight")
+                if weight is not None:
+                    weights[name] = float(weight)
+        return weights
+
+    def plan_day(self, day_type: str, positions: np.ndarray, variant: int, previous_weights: dict, feedback_key: str | None) -> dict:
+        reps_position = self.config["nutrition_goal_reps"].get(self.nutrition_goal, 0.5)
+        weight_change = self.config["feedback_weight_change"].get(feedback_key, 0.0) if feedback_key else 0.0
+
+        exercises = {}
+        for position in self.select_exercises(day_type, positions, variant):
+            name = self.names[position]
+            compound = bool(self.compound_mask[position])
+            low, high = self.plan_rules["compound_reps" if compound else "isolation_reps"]
+
+            if name in previous_weights:
+                previous_weight = previous_weights[name]
+                weight = self.round_weight(previous_weight * (1 + weight_change)) if previous_weight > 0 else 0.0
+            else:
+                weight = self.get_recommended_weight(position, compound)
+
+            exercises[name] = {
+                "sets": self.plan_rules["sets"],
+                "counts": int(round(low + (high - low) * reps_position)),
+                "set_rest_time": self.plan_rules["compound_set_rest" if compound else "isolation_set_rest"],
+                "actual_weight": None,
+                "recommended_weight": weight,
+            }
+
+        priority = [body_part for body_part in self.priority_body_parts if body_part in self.get_body_part_order(day_type)]
+        return {
+            "day_type": day_type,
+            "exercises": exercises,
+            "notes": (
+                f"{self.plan_rules['sets']} sets per exercise with a controlled tempo, compound exercises first. "
+                f"Rest {self.plan_rules['compound_set_rest']} seconds between sets of compound exercises and "
+                f"{self.plan_rules['isolation_set_rest']} seconds for isolation exercises."
+            ),
+            "explanations": (
+                f"{len(exercises)} exercises fit your {self.workout_time} minutes workout. "
+                + (f"The session leads with your priority body parts: {', '.join(priority)}. " if priority else "")
+                + f"Repetitions and rest follow the recommendations for your age and the '{self.nutrition_goal}' goal."
+            ),
+            "rest_time": self.plan_rules["rest_time"],
+        }
+
+    def plan_week(
+            self,
+            week: dict,
+            training_days: dict,
+            positions_by_day_type: dict,
+            previous_week: dict | None = None,
+            feedback_key: str | None = None
+    ) -> dict:
+        """
+        Args:
+            week: Plan skeleton, its rest days are kept as is
+            training_days: Training days of the skeleton with resolved day types
+            positions_by_day_type: Available exercises (catalog row positions) by day type
+            previous_week: Previous week plan: its weights are progressed by feedback, exercises rotate
+            feedback_key: Feedback of the previous week
+        """
+        week_variant = 0 if previous_week is None else 1
+        previous_weights = self.get_previous_weights(previous_week)
+
+        plan = copy.deepcopy(week)
+        repeats = {}
+        for day_key, day in training_days.items():
+            day_type = day["day_type"]
+            repeat = repeats.get(day_type, 0)
+            repeats[day_type] = repeat + 1
+            plan[day_key] = self.plan_day(
+                day_type, positions_by_day_type[day_type], repeat + week_variant, previous_weights, feedback_key
+            )
+        return plan
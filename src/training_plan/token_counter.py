@@ -0,0 +1,60 @@
+from src.logger import get_logger
+from src.lru_cache import LRUCache
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+
+logger = get_logger(__name__)
+
+
+class TokenCounter:
+    """
+    Token counts of prompt texts, shared by the app: the tiktoken encoding of the models when it can be loaded,
+    an estimate of chars_per_token otherwise (no encoding configured, tiktoken not installed or its encoding file
+    is not cached offline).
+    Counts of recent texts are cached: the large prompt assets repeat in every request.
+    """
+
+    def __init__(self, encoding_name: str | None, chars_per_token: float, cache_size: int = 1024):
+        self.chars_per_token = chars_per_token
+        self.cache = LRUCache(maxsize=cache_size)
+
+        self.encoding = None
+        if encoding_name is not None and tiktoken is not None:
+            try:
+                self.encoding = tiktoken.get_encoding(encoding_name)
+            except Exception as e:
+                logger.warning(f"Tokenizer {encoding_name} is not available, token counts are estimated: {e}")
+
+    @property
+    def exact(self) -> bool:
+        return self.encoding is not None
+
+    @property
+    def method(self) -> str:
+        """Counting method in effect: the encoding name, or the estimate with its chars_per_token."""
+        return self.encoding.name if self.encoding is not None else f"estimate:{self.chars_per_token}"
+
+    def count(self, text: str, cache: bool = True) -> int:
+        """
+        Args:
+            text: Text to count
+            cache: Cache the count, off for one-off texts (whole rendered prompts) that would evict the repeated ones
+        """
+        if not text:
+            return 0
+        tokens = self.cache.get(text) if cache else None
+        if tokens is None:
+            if self.encoding is not None:
+                tokens = len(self.encoding.encode(text, disallowed_special=()))
+            else:
+                tokens = int(len(text) / self.chars_per_token) + 1
+            if cache:
+                self.cache.put(text, tokens)
+        return tokens
+
+    def stats(self) -> dict:
+        return {"exact": self.exact, "method": self.method, **self.cache.stats()}
@@ -0,0 +1,179 @@
+import threading
+
+from omegaconf import DictConfig, OmegaConf
+
+from src.training_plan.token_counter import TokenCounter
+
+
+USAGE_FIELDS = ("input_tokens", "output_tokens", "reasoning_tokens", "cached_input_tokens")
+
+
+def get_usage(message) -> dict:
+    """
+    Token counts of an AIMessage (or the usage chunk of a stream) from its usage_metadata,
+    zeros if the provider did not report them.
+    """
+    metadata = getattr(message, "usage_metadata", None) or {}
+    return {
+        "input_tokens": metadata.get("input_tokens", 0),
+        "output_tokens": metadata.get("output_tokens", 0),
+        "reasoning_tokens": (metadata.get("output_token_details") or {}).get("reasoning", 0),
+        "cached_input_tokens": (metadata.get("input_token_details") or {}).get("cache_read", 0),
+    }
+
+
+class TokenUsage:
+    """Token usage and cost of the LLM calls of one request."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.tokens = dict.fromkeys(USAGE_FIELDS, 0)
+        self.cost_usd = 0.0
+        self.sections = {}
+
+    def add(self, usage: dict, sections: dict, cost_usd: float) -> None:
+        with self._lock:
+            self.calls += 1
+            for field in USAGE_FIELDS:
+                self.tokens[field] += usage[field]
+            self.cost_usd += cost_usd
+            for section, tokens in sections.items():
+                self.sections[section] = self.sections.get(section, 0) + tokens
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                **self.tokens,
+                "cost_usd": round(self.cost_usd, 6),
+                "input_tokens_by_section": dict(self.sections),
+            }
+
+    def headers(self) -> dict:
+        with self._lock:
+            return {
+                "X-Prompt-Tokens": str(self.tokens["input_tokens"]),
+                "X-Completion-Tokens": str(self.tokens["output_tokens"]),
+                "X-Reasoning-Tokens": str(self.tokens["reasoning_tokens"]),
+                "X-LLM-Cost-USD": f"{self.cost_usd:.6f}",
+            }
+
+
+class UsageMeter:
+    """
+    App-scoped token usage and cost of the LLM calls by endpoint and model. The input tokens of every call
+    are attributed to the prompt sections (template variables): each section is counted with the shared
+    TokenCounter, the rest of the reported input tokens is the template text ("instructions").
+    """
+
+    def __init__(self, config: DictConfig, token_counter: TokenCounter):
+        self.token_counter = token_counter
+        prices = config["prices"]
+        # USD per 1M tokens by model
+        self.prices = OmegaConf.to_container(prices, resolve=True) if isinstance(prices, DictConfig) else dict(prices)
+
+        self._lock = threading.Lock()
+        self.totals = {}
+
+    def attribute(self, variables: dict, input_tokens: int) -> dict:
+        """
+        Args:
+            variables: Prompt variables of the call (partial and request inputs)
+            input_tokens: Input tokens reported by the provider, 0 if not reported (the counts are kept as is)
+
+        Returns:
+            {section: input tokens}, summing up to input_tokens when it was reported
+        """
+        sections = {
+            name: self.token_counter.count(value)
+            for name, value in variables.items() if isinstance(value, str)
+        }
+        counted = sum(sections.values())
+        if input_tokens and counted > input_tokens:
+            # estimated counts overshoot the reported total, scale them down
+            sections = {name: int(tokens * input_tokens / counted) for name, tokens in sections.items()}
+            counted = sum(sections.values())
+        sections["instructions"] = max(0, input_tokens - counted) if input_tokens else 0
+        return sections
+
+    def get_cost(self, model: str, usage: dict) -> float:
+        prices = self.prices.get(model)
+        if prices is None:
+            return 0.0
+        cached = usage["cached_input_tokens"]
+        cost = (
+            (usage["input_tokens"] - cached) * prices["input"]
+            + cached * prices.get("cached_input", prices["input"])
+            + usage["output_tokens"] * prices["output"]
+        )
+        return cost / 1e6
+
+    def record(self, endpoint: str | None, model: str, message, variables: dict, request_usage: TokenUsage | None) -> None:
+        usage = get_usage(message)
+        sections = self.attribute(variables, usage["input_tokens"])
+        cost_usd = self.get_cost(model, usage)
+        if request_usage is not None:
+            request_usage.add(usage, sections, cost_usd)
+
+        with self._lock:
+            totals = self.totals.setdefault(endpoint or "none", {}).setdefault(model, {
+                "calls": 0, **dict.fromkeys(USAGE_FIELDS, 0), "cost_usd": 0.0, "input_tokens_by_section": {},
+            })
+            totals["calls"] += 1
+            for field in USAGE_FIELDS:
+                totals[field] += usage[field]
+            totals["cost_usd"] += cost_usd
+            by_section = totals["input_tokens_by_section"]
+            for section, tokens in sections.items():
+                by_section[section] = by_section.get(section, 0) + tokens
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                endpoint: {
+                    model: {**totals, "input_tokens_by_section": dict(totals["input_tokens_by_section"])}
+                    for model, totals in models.items()
+                }
+                for endpoint, models in self.totals.items()
+            }
+
+
+class MeteredChain:
+    """
+    Chain wrapper recording the token usage of every call (invoke, ainvoke, astream) with the UsageMeter.
+    A stream is recorded when it ends, also when its consumer stops early (without the usage chunk).
+    """
+
+    def __init__(self, chain, prompt, usage_meter: UsageMeter, request_usage: TokenUsage, endpoint: str | None, model: str):
+        self.chain = chain
+        self.partial_variables = dict(getattr(prompt, "partial_variables", None) or {})
+        self.usage_meter = usage_meter
+        self.request_usage = request_usage
+        self.endpoint = endpoint
+        self.model = model
+
+    def __record(self, inputs: dict, message) -> None:
+        variables = {**self.partial_variables, **inputs}
+        self.usage_meter.record(self.endpoint, self.model, message, variables, self.request_usage)
+
+    def invoke(self, inputs: dict):
+        result = self.chain.invoke(inputs)
+        self.__record(inputs, result)
+        return result
+
+    async def ainvoke(self, inputs: dict):
+        result = await self.chain.ainvoke(inputs)
+        self.__record(inputs, result)
+        return result
+
+    async def astream(self, inputs: dict):
+        usage_chunk = None
+        try:
+            async for chunk in self.chain.astream(inputs):
+                # usage is reported on the last chunk of the stream
+                if getattr(chunk, "usage_metadata", None):
+                    usage_chunk = chunk
+                yield chunk
+        finally:
+            self.__record(inputs, usage_chunk)
@@ -1,28 +1,51 @@
 import os
 import dotenv
+import copy
 import json
+import string
+import hashlib
+import time
+import asyncio
 import logging
 import pandas as pd
+from typing import Callable
+from functools import cache, cached_property
+from concurrent.futures import ThreadPoolExecutor
 from omegaconf import OmegaConf, DictConfig
 
-from langchain_openai import ChatOpenAI
-from langchain.prompts.chat import ChatPromptTemplate, HumanMessagePromptTemplate
+from langchain.prompts.chat import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda
 
 from src.exercises.exercises_filter import ExercisesFilter
 from src.exercises.exercises_formatter import ExercisesFormatter
 from src.exercises.exercises_processor import ExercisesProcessor
 from src.feedback_formatter import FeedbackFormatter
+from src.metrics import NO_TIMER, StageTimers, TimedChain
 from src.previous_week_formatter import TrainingWeekFormatter
+from src.training_plan.admission import AdmissionController, AdmittedChain, CallAdmission
+from src.training_plan.avatar_index import AvatarIndex
+from src.training_plan.llm_clients import LLMClientRegistry
+from src.training_plan.llm_resilience import LLMResilience, ResilientChain
+from src.training_plan.plan_parser import PlanParser, extract_json_object, parse_plan
+from src.training_plan.plan_cache import PlanCache
+from src.training_plan.prompt_assets import PromptAssets
+from src.training_plan.prompt_budget import PromptBudgeter
+from src.training_plan.prompt_templates import PromptTemplates
+from src.training_plan.rule_based_planner import RuleBasedPlanner
+from src.training_plan.token_usage import MeteredChain, TokenUsage, UsageMeter
 from src.training_plan.train_week import TrainWeek
 from src.user_data.user_data_formatter import UserDataFormatter
 from src.user_data.age_based_adjustments import AgeBasedAdjustmentsProcessor, AgeBasedAdjustmentsFormatter
 from src.scanner_data_formatter import ScannerDataFormatter
+from src.single_flight import SingleFlight
 from src.user_data.user_data_processor import UserDataProcessor
 
 from src.logger import get_logger
 
 
 class TrainAssistant:
+    GENERATION_MODES = ("week", "per_day", "day_types")
+
     def __init__(
             self,
             API_KEY: str,
@@ -36,11 +59,46 @@ class TrainAssistant:
             train_weeks_templates: dict,
             exercises_processor: ExercisesProcessor,
             training_program_examples_dir: str | None = None,
-            eric_recommendations_path: str | None = None
+            eric_recommendations_path: str | None = None,
+            prompt_assets: PromptAssets | None = None,
+            prompt_templates: PromptTemplates | None = None,
+            llm_clients: LLMClientRegistry | None = None,
+            plan_cache: PlanCache | None = None,
+            single_flight: SingleFlight | None = None,
+            llm_resilience: LLMResilience | None = None,
+            plan_parser: PlanParser | None = None,
+            admission: AdmissionController | None = None,
+            admission_lane: str | None = None,
+            stage_timers: StageTimers | None = None,
+            endpoint: str | None = None,
+            usage_meter: UsageMeter | None = None,
+            prompt_budgeter: PromptBudgeter | None = None,
+            avatar_index: AvatarIndex | None = None
     ):
-        self.llm = ChatOpenAI(api_key=API_KEY)
+        # a registry of its own is never closed: long-lived callers pass a shared one (the API state, utils.get_llm_clients)
+        if llm_clients is None:
+            llm_clients = LLMClientRegistry(API_KEY, train_assistant_config["llm_clients"])
+        self.llm_clients = llm_clients
+        self.plan_cache = plan_cache
+        self.single_flight = single_flight
+        self.llm_resilience = llm_resilience
+        self.plan_parser = plan_parser if plan_parser is not None else PlanParser()
+        self.admission = admission
+        # None - the lane of the generated week ("first_week" or "next_week")
+        self.admission_lane = admission_lane
+        self.stage_timers = stage_timers
+        # endpoint label of the stage timers and token usage
+        self.endpoint = endpoint
+        self.usage_meter = usage_meter
+        # token usage of the LLM calls of this request
+        self.token_usage = TokenUsage()
+        self.prompt_budgeter = prompt_budgeter
+        self.avatar_index = avatar_index
 
         self.train_assistant_config = train_assistant_config
+        self.generation_mode = self.get_generation_mode(train_assistant_config)
+        self.max_concurrency = train_assistant_config["generation"]["max_concurrency"]
+        self.structured_output_config = train_assistant_config["structured_output"]
 
         self.exercises_processor = exercises_processor
 
@@ -54,38 +112,213 @@ class TrainAssistant:
             train_weeks_templates=train_weeks_templates,
         )
 
-        self.avatar_examples = ""
-        if training_program_examples_dir and os.path.isdir(training_program_examples_dir):
-            self.avatar_examples = self.__load_avatar_examples(training_program_examples_dir)
+        if prompt_assets is None:
+            prompt_assets = PromptAssets(training_program_examples_dir, eric_recommendations_path)
+        with self.time_stage("prompt_assets"):
+            self.prompt_assets_snapshot = prompt_assets.snapshot()
+        self.avatar_examples = self.prompt_assets_snapshot.avatar_examples
+        self.merged_recs = self.prompt_assets_snapshot.merged_recs
+        with self.time_stage("avatar_selection"):
+            self.selected_avatars = self.__select_avatars(raw_user_data)
 
-        self.merged_recs = ""
-        if eric_recommendations_path and os.path.isfile(eric_recommendations_path):
-            with open(eric_recommendations_path, "r", encoding="utf-8") as file:
-                self.merged_recs = file.read().strip()
+        if prompt_templates is None:
+            prompt_templates = PromptTemplates(train_assistant_config, train_weeks_templates)
+        self.prompt_templates = prompt_templates
 
         self.logger = get_logger(name=self.__class__.__name__, level=logging.DEBUG)
 
-    @staticmethod
-    def __load_avatar_examples(examples_dir: str) -> str:
-        examples = []
-        for file_name in sorted(os.listdir(examples_dir)):
-            if file_name.endswith(".txt"):
-                file_path = os.path.join(examples_dir, file_name)
-                with open(file_path, "r", encoding="utf-8") as file:
-                    examples.append(file.read().strip())
-        return "\n\n".join(examples)
-
-    def __init_chain(self, prompt, model_name, temperature):
-        self.llm.model_name = model_name
-        if model_name == "gpt4o":
-            self.llm.temperature = temperature
-
-        prompt_template = ChatPromptTemplate.from_messages([
-            HumanMessagePromptTemplate.from_template(prompt)
-        ])
-        chain = prompt_template | self.llm
+    def __select_avatars(self, raw_user_data: dict) -> dict:
+        """
+        Returns:
+            {avatar example name: text} of the prompt in priority order: with an avatar index, the k nearest
+            to the user profile, then the examples without a profile (they cannot be ranked, so they are kept);
+            all of them in file order without an index or if no example has a profile
+        """
+        snapshot = self.prompt_assets_snapshot
+        names = snapshot.avatar_example_names or tuple(map(str, range(len(snapshot.avatar_example_texts))))
+        avatar_examples = dict(zip(names, snapshot.avatar_example_texts))
+        if self.avatar_index is None:
+            return avatar_examples
+        ranked = [name for name in self.avatar_index.rank(raw_user_data) if name in avatar_examples]
+        if not ranked:
+            return avatar_examples
+        unprofiled = [name for name in avatar_examples if name not in self.avatar_index.names]
+        return {name: avatar_examples[name] for name in ranked[:self.avatar_index.k] + unprofiled}
+
+    def get_avatar_inputs(self) -> dict:
+        """
+        Prompt inputs overriding the avatar examples of the template with the selected ones,
+        none without an avatar index or if all of them are selected.
+        """
+        if self.avatar_index is None or len(self.selected_avatars) == len(self.prompt_assets_snapshot.avatar_example_texts):
+            return {}
+        return {"avatars_examples": "\n\n".join(self.selected_avatars.values())}
+
+    def time_stage(self, stage: str, model: str | None = None):
+        """Timer of a request stage, a no-op without stage timers."""
+        if self.stage_timers is None:
+            return NO_TIMER
+        return self.stage_timers.time(stage, self.endpoint, model)
+
+    def __get_response_format(self, generation_mode: str) -> dict | None:
+        """
+        Args:
+            generation_mode: Scope of the completion: "week" for a whole week (also the streams of any mode),
+                a day or day type workout otherwise
+        """
+        response_format = self.structured_output_config["response_format"]
+        if response_format == "text":
+            return None
+        if response_format == "json_object":
+            return {"type": "json_object"}
+        if response_format == "json_schema":
+            if generation_mode == "week":
+                schema = self.train_week.get_json_schema()
+            else:
+                schema = TrainWeek.get_scope_json_schema()
+            return {"type": "json_schema", "json_schema": {"name": "train_week", "schema": schema}}
+        raise ValueError(f"Unknown structured output response_format: {response_format}")
+
+    def __get_llm(self, model_name, temperature, generation_mode: str):
+        llm = self.llm_clients.get(model_name, temperature)
+        response_format = self.__get_response_format(generation_mode)
+        return llm.bind(response_format=response_format) if response_format is not None else llm
+
+    def __timed_prompt(self, prompt: ChatPromptTemplate, model_name):
+        if self.stage_timers is None:
+            return prompt
+
+        def render(inputs: dict):
+            with self.time_stage("prompt_render", model_name):
+                return prompt.invoke(inputs)
+
+        async def arender(inputs: dict):
+            return render(inputs)
+
+        return RunnableLambda(render, afunc=arender)
+
+    def __init_chain(self, prompt: ChatPromptTemplate, model_name, temperature, generation_mode: str):
+        return self.__timed_prompt(prompt, model_name) | self.__get_llm(model_name, temperature, generation_mode)
+
+    def __meter(self, chain, prompt: ChatPromptTemplate, model_name: str):
+        if self.usage_meter is None:
+            return chain
+        return MeteredChain(chain, prompt, self.usage_meter, self.token_usage, self.endpoint, model_name)
+
+    def __init_attempt_chain(self, prompt: ChatPromptTemplate, model_name: str, temperature, generation_mode: str):
+        chain = self.__meter(self.__init_chain(prompt, model_name, temperature, generation_mode), prompt, model_name)
+        if self.stage_timers is not None:
+            chain = TimedChain(chain, self.stage_timers, "llm_call", self.endpoint, model_name)
+        return chain
+
+    def __build_chain(
+            self,
+            prompt: ChatPromptTemplate,
+            mode: str,
+            model_name: str,
+            temperature,
+            skeleton: dict,
+            generation_mode: str
+    ):
+        """
+        LLM calls go through the resilience policy. Every attempt (retries and hedges included) is admitted,
+        timed and metered with its model, the admission wait is not timed.
+
+        Args:
+            skeleton: Plan skeleton of the completion, results that do not follow it are retried
+            generation_mode: Scope of the completion, "week" or the configured per-scope mode
+        """
+        call_admission = None
+        if self.admission is not None:
+            call_admission = CallAdmission(prompt, self.admission, self.admission_lane or mode)
+
+        chain = self.__init_attempt_chain(prompt, model_name, temperature, generation_mode)
+        if self.llm_resilience is None:
+            if call_admission is not None:
+                chain = AdmittedChain(chain, call_admission)
+        else:
+            hedge_chain = None
+            if self.llm_resilience.hedging_enabled:
+                hedge_model_name = self.llm_resilience.hedge_model or model_name
+                hedge_chain = self.__init_attempt_chain(prompt, hedge_model_name, temperature, generation_mode)
+            # latencies of whole-week and per-scope completions differ, hedge delays are tracked separately
+            key = f"{model_name}:{generation_mode}"
+            chain = ResilientChain(
+                chain,
+                hedge_chain,
+                self.llm_resilience,
+                key,
+                validate=lambda result: self.__validate_result(result, skeleton),
+                call_admission=call_admission
+            )
         return chain
 
+    def __check_plan(self, plan: dict, skeleton: dict) -> None:
+        TrainWeek.check_plan(self.__parse_scope(plan, skeleton), skeleton)
+
+    def __validate_result(self, result, skeleton: dict) -> None:
+        output = result.content.strip()
+        if self.structured_output_config["repair_model"] is None:
+            plan, _ = parse_plan(output)
+        elif extract_json_object(output) is None:
+            raise ValueError("No JSON object in the output:\n" + output)
+        else:
+            try:
+                plan, _ = parse_plan(output)
+            except ValueError:
+                # outputs the repair model can fix are not regenerated
+                return
+        # a truncated output parses (repaired) into a plan cut short, the repair model cannot complete it
+        self.__check_plan(plan, skeleton)
+
+    def __init_repair_chain(self):
+        prompt = ChatPromptTemplate.from_messages([
+            ("system", self.structured_output_config["repair_prompt"]),
+            ("human", "{output}"),
+        ])
+        model_name = self.structured_output_config["repair_model"]
+        return self.__meter(prompt | self.llm_clients.get(model_name), prompt, model_name)
+
+    def __parse_output(self, result, skeleton: dict) -> dict:
+        """
+        Tolerant parse of the LLM output, the cheap repair model fixes what the local repair could not.
+        The plan must follow the skeleton of the completion, also after the repair.
+        """
+        output = result.content.strip()
+        try:
+            with self.time_stage("output_parse"):
+                return self.plan_parser.parse(output, lambda plan: self.__check_plan(plan, skeleton))
+        except ValueError:
+            if self.structured_output_config["repair_model"] is None:
+                raise
+
+        self.logger.warning("Generated plan is not a valid plan, repairing it")
+        repaired = self.__init_repair_chain().invoke({"output": output})
+        return self.__accept_model_repair(repaired, skeleton)
+
+    async def __aparse_output(self, result, skeleton: dict) -> dict:
+        output = result.content.strip()
+        try:
+            with self.time_stage("output_parse"):
+                return self.plan_parser.parse(output, lambda plan: self.__check_plan(plan, skeleton))
+        except ValueError:
+            if self.structured_output_config["repair_model"] is None:
+                raise
+
+        self.logger.warning("Generated plan is not a valid plan, repairing it")
+        repaired = await self.__init_repair_chain().ainvoke({"output": output})
+        return self.__accept_model_repair(repaired, skeleton)
+
+    def __accept_model_repair(self, repaired, skeleton: dict) -> dict:
+        plan, _ = parse_plan(repaired.content)
+        self.__check_plan(plan, skeleton)
+        self.plan_parser.record_model_repair()
+        return plan
+
+    def __get_prompt(self, mode: str) -> ChatPromptTemplate:
+        with self.time_stage("prompt_template"):
+            return self.prompt_templates.get(mode, self.train_week.train_days_num, self.prompt_assets_snapshot)
+
     def __init_assistant(
             self,
             data_processing_config: DictConfig,
@@ -97,16 +330,26 @@ class TrainAssistant:
             train_weeks_templates: dict
     ):
         # user data formatter
-        user_data_processing_config = data_processing_config["user_data_processing"]
-        user_data_formatter_config = data_processing_config["user_data_formatter"]
-        user_data_processor = UserDataProcessor(raw_user_data, user_data_processing_config)
-        self.user_data_formatter = UserDataFormatter(user_data_processor, user_data_formatter_config)
+        with self.time_stage("user_data_processing"):
+            user_data_processing_config = data_processing_config["user_data_processing"]
+            user_data_formatter_config = data_processing_config["user_data_formatter"]
+            user_data_processor = UserDataProcessor(raw_user_data, user_data_processing_config)
+            self.user_data_formatter = UserDataFormatter(user_data_processor, user_data_formatter_config)
 
         # age based adjustments formatter
-        age = user_data_processor.get_age()
-        age_based_adjustments_processor = AgeBasedAdjustmentsProcessor(age_based_adjustments_config)
-        age_period = age_based_adjustments_processor.select_age_periods_adjustments(age)
-        self.age_formatter = AgeBasedAdjustmentsFormatter(age_period, age_based_adjustments_config)
+        with self.time_stage("age_adjustments"):
+            age = user_data_processor.get_age()
+            age_based_adjustments_processor = AgeBasedAdjustmentsProcessor(age_based_adjustments_config)
+            age_period = age_based_adjustments_processor.select_age_periods_adjustments(age)
+            self.age_formatter = AgeBasedAdjustmentsFormatter(age_period, age_based_adjustments_config)
+
+        # rule-based plan engine, built on the first rule-based plan
+        rule_based_config = self.train_assistant_config["rule_based"]
+        plan_rules = age_period.get("plan_rules")
+        if plan_rules is None:
+            plan_rules = age_based_adjustments_config["age_periods"][rule_based_config["default_age_period"]]["plan_rules"]
+        self.__rule_based_planner_args = (rule_based_config, plan_rules, user_data_processor, self.exercises_processor)
+        self.__rule_based_planner = None
 
         # scanner data formatter
         if raw_scanner_data:
@@ -114,113 +357,592 @@ class TrainAssistant:
             self.scanner_formatter = ScannerDataFormatter(raw_scanner_data, scanner_data_formatter_config)
 
         # train week
-        train_days_number = user_data_processor.get_training_days()
-        self.train_week = TrainWeek(week_templates=train_weeks_templates, train_days_num=train_days_number)
+        with self.time_stage("train_week"):
+            train_days_number = user_data_processor.get_training_days()
+            self.train_week = TrainWeek(week_templates=train_weeks_templates, train_days_num=train_days_number)
 
         # exercises formatter and available_exercises
         exercises_planner_config = exercises_config["exercises_planner"]
-        exercises_filter = ExercisesFilter(self.exercises_processor, exercises_planner_config)
-
-        skill_level = user_data_processor.get_fitness_level()
-        available_equipment = user_data_processor.get_equipment_list()
-        day_types = self.train_week.day_types
+        self.exercises_filter = ExercisesFilter(self.exercises_processor, exercises_planner_config)
 
-        available_exercises = exercises_filter.get_available_exercises_by_equipment(
-            df=self.exercises_processor.processed_df, available_equipment=available_equipment
-        )
-        available_exercises = exercises_filter.get_available_exercises_by_skill_level(
-            df=available_exercises, skill_level=skill_level
-        )
-        available_exercises_by_day_type = exercises_filter.get_available_exercises_by_day_type(
-            df=available_exercises, day_types=day_types
-        )
-        self.available_exercises_by_day_type = available_exercises_by_day_type
+        self.skill_level = user_data_processor.get_fitness_level()
+        self.available_equipment = user_data_processor.get_equipment_list()
         self.exercises_formatter = ExercisesFormatter(exercises_config)
 
         self.train_week_formatter = TrainingWeekFormatter()
         self.feedbaack_formatter = FeedbackFormatter(feedback_config)
 
-    def generate_first_week(self) -> str:
-        prompt = self.train_assistant_config["train_assistant"]["first_week"]["prompt_template"]
+    @cached_property
+    def available_exercises_by_day_type(self) -> dict:
+        return self.exercises_filter.get_available_exercises(
+            available_equipment=self.available_equipment,
+            skill_level=self.skill_level,
+            day_types=self.train_week.day_types
+        )
+
+    def get_available_exercises_formatted(self, day_types: list | None = None, max_per_day_type: int | None = None) -> str:
+        """
+        Formatted 'Available Exercises' prompt block, memoized per catalog by the normalized
+        (equipment, skill level, day types) key, so repeated profiles skip the filtering.
+        Capped blocks are not memoized: the caps tried by the prompt budget would evict the uncapped blocks.
+
+        Args:
+            day_types: Day types of the block, all day types of the week by default
+            max_per_day_type: Cap of the exercises of every day type (prompt budget), no cap by default
+        """
+        if day_types is None:
+            day_types = self.train_week.day_types
+        if max_per_day_type is not None:
+            return self.__format_exercises(self.__get_exercises_positions(day_types), max_per_day_type)
+
+        cache = self.exercises_processor.available_exercises_cache
+        key = self.exercises_filter.get_cache_key(
+            self.available_equipment, self.skill_level, day_types
+        ) + (tuple(self.exercises_formatter.columns), None)
+
+        exercises_formatted = cache.get(key)
+        if exercises_formatted is None:
+            exercises_formatted = self.__format_exercises(self.__get_exercises_positions(day_types))
+            cache.put(key, exercises_formatted)
+        return exercises_formatted
+
+    def __get_exercises_positions(self, day_types: list) -> dict:
+        with self.time_stage("exercises_filter"):
+            return self.exercises_filter.get_available_exercises_positions(
+                self.available_equipment, self.skill_level, day_types
+            )
+
+    def __format_exercises(self, positions_by_day_type: dict, max_per_day_type: int | None = None) -> str:
+        if max_per_day_type is not None:
+            positions_by_day_type = self.exercises_filter.limit_positions(positions_by_day_type, max_per_day_type)
+        columns = self.exercises_formatter.columns
+        with self.time_stage("exercises_format"):
+            return self.exercises_formatter.data_format_positions(
+                positions_by_day_type, self.exercises_processor.get_exercise_lines(columns)
+            )
+
+    def __get_exercises_renderer(self, day_types: list | None) -> Callable[[int | None], str]:
+        """
+        Renderer of the exercises block by cap for one prompt budget fit: the positions are filtered once
+        and the capped blocks are memoized for the fit only.
+        """
+        positions_by_day_type = None
+
+        @cache
+        def render(max_per_day_type: int | None) -> str:
+            nonlocal positions_by_day_type
+            if max_per_day_type is None:
+                return self.get_available_exercises_formatted(day_types)
+            if positions_by_day_type is None:
+                positions_by_day_type = self.__get_exercises_positions(day_types or self.train_week.day_types)
+            return self.__format_exercises(positions_by_day_type, max_per_day_type)
+
+        return render
+
+    def get_training_days(self) -> dict:
+        """
+        Training days of the plan skeleton. PPL_DAY placeholders are resolved to the least used day type
+        of the week, since days generated separately cannot coordinate their choice.
+
+        Returns:
+            {day key: day skeleton} without rest days
+        """
+        day_types_count = {day_type: 0 for day_type in self.train_week.day_types}
+        for day in self.train_week.week.values():
+            if day["day_type"] in day_types_count:
+                day_types_count[day["day_type"]] += 1
+
+        training_days = {}
+        for day_key, day in self.train_week.week.items():
+            if day["day_type"] == "REST_DAY":
+                continue
+            day = copy.deepcopy(day)
+            if day["day_type"] == "PPL_DAY":
+                day["day_type"] = min(day_types_count, key=day_types_count.get)
+                day_types_count[day["day_type"]] += 1
+            training_days[day_key] = day
+        return training_days
+
+    def __prepare_first_week(self) -> tuple:
+        prompt = self.__get_prompt("first_week")
         model_name = self.train_assistant_config["train_assistant"]["first_week"]["model"]
         temperature = self.train_assistant_config["train_assistant"]["first_week"]["temperature"]
 
-        chain = self.__init_chain(prompt, model_name, temperature)
+        # whole week: the week generation mode and the streams of every mode
+        chain = self.__build_chain(prompt, "first_week", model_name, temperature, self.train_week.week, "week")
 
-        week_template = str(self.train_week.week)
-        user_data = self.user_data_formatter.data_format()
-        scanner_recommendations = self.scanner_formatter.data_format()
-        age_recommendations = self.age_formatter.data_format()
-        exercises_formatted = self.exercises_formatter.data_format(self.available_exercises_by_day_type)
-        avatar_examples = self.avatar_examples
-        merged_recs = self.merged_recs
+        with self.time_stage("user_data_format"):
+            user_data = self.user_data_formatter.data_format()
+        with self.time_stage("scanner_format"):
+            scanner_recommendations = self.scanner_formatter.data_format()
+        with self.time_stage("age_format"):
+            age_recommendations = self.age_formatter.data_format()
+        exercises_formatted = self.get_available_exercises_formatted()
 
-        self.logger.debug(f"Week Template: \n{week_template}")
+        self.logger.debug(f"Week Template: \n{self.train_week.week}")
         self.logger.debug(f"User Data Formatted: \n{user_data}")
         self.logger.debug(f"Scanner Recommendations Formatted: \n{scanner_recommendations}")
         # self.logger.debug(f"Age Recommendations Formatted: \n{age_recommendations}")
         self.logger.debug(f"Exercises List Formatted: \n{exercises_formatted}")
 
-        result = chain.invoke(
-            {
-                "week_template": week_template,
-                "user_data": user_data,
-                "scanner_recommendations": scanner_recommendations,
-                "age_recommendations": age_recommendations,
-                "available_exercises": exercises_formatted,
-                "avatars_examples": avatar_examples,
-                "merged_recs": merged_recs
-            }
-        )
-        processed_result = result.content.strip()
-        self.logger.info(f"Training Plan Result: \n{processed_result}")
-        return processed_result
-
-    def generate_next_week(self, feedback_key: str, previous_week: dict) -> str:
-        prompt = self.train_assistant_config["train_assistant"]["next_week"]["prompt_template"]
+        inputs = {
+            "user_data": user_data,
+            "scanner_recommendations": scanner_recommendations,
+            "age_recommendations": age_recommendations,
+            "available_exercises": exercises_formatted,
+            **self.get_avatar_inputs()
+        }
+        return chain, self.__fit_prompt_budget("first_week", prompt, inputs)
+
+    def __prepare_next_week(self, feedback_key: str, previous_week: dict) -> tuple:
+        prompt = self.__get_prompt("next_week")
         model_name = self.train_assistant_config["train_assistant"]["next_week"]["model"]
         temperature = self.train_assistant_config["train_assistant"]["next_week"]["temperature"]
 
-        chain = self.__init_chain(prompt, model_name, temperature)
+        chain = self.__build_chain(prompt, "next_week", model_name, temperature, self.train_week.week, "week")
 
-        week_template = str(self.train_week.week)
-        user_data = self.user_data_formatter.data_format()
-        age_recommendations = self.age_formatter.data_format()
-        exercises_formatted = self.exercises_formatter.data_format(self.available_exercises_by_day_type)
-        feedback = self.feedbaack_formatter.data_format(feedback_key)
-        prev_week_formatted = self.train_week_formatter.data_format(previous_week)
-        avatar_examples = self.avatar_examples
-        merged_recs = self.merged_recs
+        with self.time_stage("user_data_format"):
+            user_data = self.user_data_formatter.data_format()
+        with self.time_stage("age_format"):
+            age_recommendations = self.age_formatter.data_format()
+        exercises_formatted = self.get_available_exercises_formatted()
+        with self.time_stage("feedback_format"):
+            feedback = self.feedbaack_formatter.data_format(feedback_key)
+            prev_week_formatted = self.train_week_formatter.data_format(previous_week)
 
-        self.logger.debug(f"Week Template: \n{week_template}")
+        self.logger.debug(f"Week Template: \n{self.train_week.week}")
         self.logger.debug(f"User Data Formatted: \n{user_data}")
         self.logger.debug(f"Previous Week Formatted: \n{prev_week_formatted}")
         self.logger.debug(f"Feedback formatted: \n{feedback}")
         self.logger.debug(f"Age Recommendations Formatted: \n{age_recommendations}")
         self.logger.debug(f"Exercises List Formatted: \n{exercises_formatted}")
 
-        result = chain.invoke(
-            {
-                "week_template": week_template,
-                "user_data": user_data,
-                "previous_week": prev_week_formatted,
-                "feedback": feedback,
-                "age_recommendations": age_recommendations,
-                "available_exercises": exercises_formatted,
-                "avatars_examples": avatar_examples,
-                "merged_recs": merged_recs
+        inputs = {
+            "user_data": user_data,
+            "previous_week": prev_week_formatted,
+            "feedback": feedback,
+            "age_recommendations": age_recommendations,
+            "available_exercises": exercises_formatted,
+            **self.get_avatar_inputs()
+        }
+        return chain, self.__fit_prompt_budget("next_week", prompt, inputs)
+
+    def __fit_prompt_budget(self, mode: str, prompt: ChatPromptTemplate, inputs: dict, day_types: list | None = None) -> dict:
+        """Inputs trimmed to the prompt budget of the mode, as is without a prompt budgeter."""
+        if self.prompt_budgeter is None:
+            return inputs
+        with self.time_stage("prompt_budget"):
+            return self.prompt_budgeter.fit(
+                mode,
+                prompt,
+                inputs,
+                tuple(self.selected_avatars.values()),
+                self.__get_exercises_renderer(day_types)
+            )
+
+    def get_day_type_workouts(self) -> tuple:
+        """
+        Workouts of the "day_types" generation mode: up to generation.day_types.variants workouts
+        per distinct day type, alternated over the days of that type.
+
+        Returns:
+            ({day type: {workout key: workout skeleton}}, {day key: (workout key, repeat number)})
+        """
+        variants = self.train_assistant_config["generation"]["day_types"]["variants"]
+
+        days_by_day_type = {}
+        for day_key, day in self.get_training_days().items():
+            days_by_day_type.setdefault(day["day_type"], []).append((day_key, day))
+
+        workouts = {}
+        assignment = {}
+        for day_type, days in days_by_day_type.items():
+            variants_num = min(variants, len(days))
+            if variants_num == 1:
+                workout_keys = [day_type]
+            else:
+                workout_keys = [f"{day_type} {string.ascii_uppercase[variant]}" for variant in range(variants_num)]
+
+            workouts[day_type] = {workout_key: days[variant][1] for variant, workout_key in enumerate(workout_keys)}
+            for position, (day_key, _) in enumerate(days):
+                assignment[day_key] = (workout_keys[position % variants_num], position // variants_num)
+        return workouts, assignment
+
+    @staticmethod
+    def vary_workout(workout: dict, repeat: int) -> dict:
+        """
+        Deterministic variation of a repeated workout: the lead exercise stays first,
+        the other exercises are rotated by the repeat number.
+        """
+        workout = copy.deepcopy(workout)
+        exercises = list(workout.get("exercises", {}).items())
+        if repeat and len(exercises) > 2:
+            shift = repeat % (len(exercises) - 1)
+            workout["exercises"] = dict(exercises[:1] + exercises[1 + shift:] + exercises[1:1 + shift])
+        return workout
+
+    def __get_scopes(self) -> dict:
+        """
+        Returns:
+            {scope key: {day type, skeleton}} of the completions of the current generation mode
+        """
+        if self.generation_mode == "per_day":
+            return {
+                day_key: {"day_type": day["day_type"], "skeleton": {day_key: day}}
+                for day_key, day in self.get_training_days().items()
             }
-        )
-        processed_result = result.content.strip()
+        workouts, _ = self.get_day_type_workouts()
+        return {
+            day_type: {"day_type": day_type, "skeleton": skeleton}
+            for day_type, skeleton in workouts.items()
+        }
+
+    def __prepare_scopes(self, mode: str, feedback_key: str | None = None, previous_week: dict | None = None) -> tuple:
+        prompt = self.prompt_templates.get_day_scope(mode, self.prompt_assets_snapshot)
+        model_name = self.train_assistant_config["train_assistant"][mode]["model"]
+        temperature = self.train_assistant_config["train_assistant"][mode]["temperature"]
+
+        training_days = self.get_training_days()
+        shared_inputs = {
+            "week_day_types": ", ".join(f"{day_key} - {day['day_type']}" for day_key, day in training_days.items()),
+            "user_data": self.user_data_formatter.data_format(),
+            "age_recommendations": self.age_formatter.data_format(),
+            **self.get_avatar_inputs()
+        }
+        if mode == "first_week":
+            shared_inputs["scanner_recommendations"] = self.scanner_formatter.data_format()
+        else:
+            shared_inputs["previous_week"] = self.train_week_formatter.data_format(previous_week)
+            shared_inputs["feedback"] = self.feedbaack_formatter.data_format(feedback_key)
+
+        scopes = self.__get_scopes()
+        # a chain per scope: its results are validated against the skeleton of the scope
+        chains_by_scope = {
+            scope_key: self.__build_chain(
+                prompt, mode, model_name, temperature, scope["skeleton"], self.generation_mode
+            )
+            for scope_key, scope in scopes.items()
+        }
+        inputs_by_scope = {
+            scope_key: self.__fit_prompt_budget(mode, prompt, {
+                **shared_inputs,
+                "week_template": str(scope["skeleton"]),
+                "available_exercises": self.get_available_exercises_formatted([scope["day_type"]]),
+            }, [scope["day_type"]])
+            for scope_key, scope in scopes.items()
+        }
+        self.logger.debug(f"Plan generated in {len(scopes)} completions: \n{list(scopes)}")
+        return chains_by_scope, inputs_by_scope, scopes
+
+    def __parse_scope(self, scope_plan: dict, skeleton: dict) -> dict:
+        if all(key in scope_plan for key in skeleton):
+            return {key: scope_plan[key] for key in skeleton}
+        if len(skeleton) == 1:
+            return {next(iter(skeleton)): scope_plan}
+        raise ValueError(f"Expected keys {list(skeleton)}, received {list(scope_plan)}")
+
+    def __assemble_week(self, results_by_scope: dict, scopes: dict) -> str:
+        """
+        Puts the generated days (or day type workouts fanned out to their days) into the plan skeleton,
+        rest days are kept as is.
+        """
+        generated = {}
+        for scope_key, scope_plan in results_by_scope.items():
+            generated.update(self.__parse_scope(scope_plan, scopes[scope_key]["skeleton"]))
+
+        week = copy.deepcopy(self.train_week.week)
+        if self.generation_mode == "per_day":
+            week.update(generated)
+        else:
+            rotate_exercises = self.train_assistant_config["generation"]["day_types"]["rotate_exercises"]
+            _, assignment = self.get_day_type_workouts()
+            for day_key, (workout_key, repeat) in assignment.items():
+                workout = generated[workout_key]
+                week[day_key] = self.vary_workout(workout, repeat) if rotate_exercises else copy.deepcopy(workout)
+
+        processed_result = json.dumps(week, ensure_ascii=False, indent=2)
         self.logger.info(f"Training Plan Result: \n{processed_result}")
         return processed_result
 
-    def convert_result_to_json(self, processed_result: str) -> dict:
-        if processed_result.startswith("```") and processed_result.endswith("```"):
-            processed_result = "\n".join(processed_result.splitlines()[1:-1]).strip()
+    def __generate_scopes(self, chains_by_scope: dict, inputs_by_scope: dict, scopes: dict) -> str:
+        def generate_scope(scope_key: str) -> dict:
+            result = chains_by_scope[scope_key].invoke(inputs_by_scope[scope_key])
+            return self.__parse_output(result, scopes[scope_key]["skeleton"])
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            results = list(executor.map(generate_scope, inputs_by_scope))
+        return self.__assemble_week(dict(zip(inputs_by_scope, results)), scopes)
+
+    async def __agenerate_scopes(self, chains_by_scope: dict, inputs_by_scope: dict, scopes: dict) -> str:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
 
+        async def generate_scope(scope_key: str) -> dict:
+            async with semaphore:
+                result = await chains_by_scope[scope_key].ainvoke(inputs_by_scope[scope_key])
+            return await self.__aparse_output(result, scopes[scope_key]["skeleton"])
+
+        results = await asyncio.gather(*(generate_scope(scope_key) for scope_key in inputs_by_scope))
+        return self.__assemble_week(dict(zip(inputs_by_scope, results)), scopes)
+
+    def __process_result(self, plan: dict) -> str:
+        processed_result = json.dumps(plan, ensure_ascii=False, indent=2)
+        self.logger.info(f"Training Plan Result: \n{processed_result}")
+        return processed_result
+
+    def __generate_first_week(self) -> str:
+        if self.generation_mode != "week":
+            return self.__generate_scopes(*self.__prepare_scopes("first_week"))
+
+        chain, inputs = self.__prepare_first_week()
+        result = chain.invoke(inputs)
+        return self.__process_result(self.__parse_output(result, self.train_week.week))
+
+    def __generate_next_week(self, feedback_key: str, previous_week: dict) -> str:
+        if self.generation_mode != "week":
+            return self.__generate_scopes(*self.__prepare_scopes("next_week", feedback_key, previous_week))
+
+        chain, inputs = self.__prepare_next_week(feedback_key, previous_week)
+        result = chain.invoke(inputs)
+        return self.__process_result(self.__parse_output(result, self.train_week.week))
+
+    async def __agenerate_first_week(self) -> str:
+        if self.generation_mode != "week":
+            prepared = await asyncio.to_thread(self.__prepare_scopes, "first_week")
+            return await self.__agenerate_scopes(*prepared)
+
+        chain, inputs = await asyncio.to_thread(self.__prepare_first_week)
+        result = await chain.ainvoke(inputs)
+        return self.__process_result(await self.__aparse_output(result, self.train_week.week))
+
+    async def __agenerate_next_week(self, feedback_key: str, previous_week: dict) -> str:
+        if self.generation_mode != "week":
+            prepared = await asyncio.to_thread(self.__prepare_scopes, "next_week", feedback_key, previous_week)
+            return await self.__agenerate_scopes(*prepared)
+
+        chain, inputs = await asyncio.to_thread(self.__prepare_next_week, feedback_key, previous_week)
+        result = await chain.ainvoke(inputs)
+        return self.__process_result(await self.__aparse_output(result, self.train_week.week))
+
+    def get_request_inputs(
+            self,
+            mode: str,
+            feedback_key: str | None = None,
+            previous_week: dict | None = None,
+            generation_mode: str | None = None
+    ) -> dict:
+        """
+        Everything of the request that reaches the prompt, in its formatted (normalized) form.
+
+        Args:
+            generation_mode: Generation mode of the plan, the configured one if None ("week" for the streams)
+        """
+        inputs = {
+            "train_days_num": self.train_week.train_days_num,
+            "generation_mode": generation_mode or self.generation_mode,
+            "user_data": self.user_data_formatter.data_format(),
+            "age_recommendations": self.age_formatter.data_format(),
+            "available_exercises": self.get_available_exercises_formatted(),
+            "catalog_checksum": self.exercises_processor.catalog_checksum,
+            "prompt_assets_checksum": self.prompt_assets_snapshot.checksum,
+        }
+        if self.avatar_index is not None:
+            inputs["avatar_examples"] = list(self.selected_avatars)
+        if mode == "first_week":
+            inputs["scanner_recommendations"] = self.scanner_formatter.data_format()
+        else:
+            inputs["previous_week"] = self.train_week_formatter.data_format(previous_week)
+            inputs["feedback"] = self.feedbaack_formatter.data_format(feedback_key)
+        return inputs
+
+    def get_plan_cache_key(
+            self,
+            mode: str,
+            feedback_key: str | None = None,
+            previous_week: dict | None = None,
+            generation_mode: str | None = None
+    ) -> str:
+        return self.plan_cache.make_key(mode, self.get_request_inputs(mode, feedback_key, previous_week, generation_mode))
+
+    @staticmethod
+    def get_request_key(mode: str, inputs: dict) -> str:
+        payload = json.dumps({"mode": mode, "inputs": inputs}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def __lookup_plan(
+            self,
+            mode: str,
+            feedback_key: str | None = None,
+            previous_week: dict | None = None,
+            generation_mode: str | None = None
+    ) -> tuple:
+        """
+        Returns:
+            (request key for single flight, plan cache key, cached plan or None)
+        """
+        if self.plan_cache is None and self.single_flight is None:
+            return None, None, None
+
+        inputs = self.get_request_inputs(mode, feedback_key, previous_week, generation_mode)
+        request_key = self.get_request_key(mode, inputs)
+        if self.plan_cache is None:
+            return request_key, None, None
+
+        cache_key = self.plan_cache.make_key(mode, inputs)
+        plan = self.plan_cache.get(cache_key)
+        if plan is not None:
+            self.logger.info(f"Plan cache hit: {cache_key}")
+        return request_key, cache_key, plan
+
+    def __store_plan(self, cache_key: str | None, plan: str, started: float) -> None:
+        if cache_key is None:
+            return
         try:
-            return json.loads(processed_result)
-        except json.JSONDecodeError as e:
-            raise ValueError("Failed to decode JSON. Output received:\n" + processed_result) from e
+            self.__check_plan(self.convert_result_to_json(plan), self.train_week.week)
+        except ValueError:
+            # invalid outputs (and plans cut short) are not cached, a retry gets a new generation
+            return
+        self.plan_cache.put(cache_key, plan, time.perf_counter() - started)
+
+    def __generate_once(self, mode: str, generate, *args) -> str:
+        """
+        Serves the plan from the plan cache, joins an identical generation in flight or generates it.
+        """
+        started = time.perf_counter()
+        request_key, cache_key, plan = self.__lookup_plan(mode, *args)
+        if plan is not None:
+            return plan
+
+        def generate_and_store() -> str:
+            generated_plan = generate(*args)
+            self.__store_plan(cache_key, generated_plan, started)
+            return generated_plan
+
+        if self.single_flight is None:
+            return generate_and_store()
+        return self.single_flight.do(request_key, generate_and_store)
+
+    async def __agenerate_once(self, mode: str, agenerate, *args) -> str:
+        started = time.perf_counter()
+        request_key, cache_key, plan = await asyncio.to_thread(self.__lookup_plan, mode, *args)
+        if plan is not None:
+            return plan
+
+        async def generate_and_store() -> str:
+            generated_plan = await agenerate(*args)
+            await asyncio.to_thread(self.__store_plan, cache_key, generated_plan, started)
+            return generated_plan
+
+        if self.single_flight is None:
+            return await generate_and_store()
+        return await self.single_flight.ado(request_key, generate_and_store)
+
+    def __get_model_name(self, mode: str) -> str:
+        return self.train_assistant_config["train_assistant"][mode]["model"]
+
+    def generate_first_week(self) -> str:
+        with self.time_stage("generate_first_week", self.__get_model_name("first_week")):
+            return self.__generate_once("first_week", self.__generate_first_week)
+
+    def generate_next_week(self, feedback_key: str, previous_week: dict) -> str:
+        with self.time_stage("generate_next_week", self.__get_model_name("next_week")):
+            return self.__generate_once("next_week", self.__generate_next_week, feedback_key, previous_week)
+
+    async def agenerate_first_week(self) -> str:
+        """
+        Async generate_first_week: prompt assembly and plan cache access run in a worker thread,
+        the LLM call is awaited without holding a thread.
+        """
+        with self.time_stage("generate_first_week", self.__get_model_name("first_week")):
+            return await self.__agenerate_once("first_week", self.__agenerate_first_week)
+
+    async def agenerate_next_week(self, feedback_key: str, previous_week: dict) -> str:
+        with self.time_stage("generate_next_week", self.__get_model_name("next_week")):
+            return await self.__agenerate_once("next_week", self.__agenerate_next_week, feedback_key, previous_week)
+
+    @classmethod
+    def get_generation_mode(cls, train_assistant_config: DictConfig) -> str:
+        mode = train_assistant_config["generation"]["mode"]
+        if mode not in cls.GENERATION_MODES:
+            raise ValueError(f"Unknown generation mode: {mode}, expected one of {cls.GENERATION_MODES}")
+        return mode
+
+    def get_rule_based_planner(self) -> RuleBasedPlanner:
+        if self.__rule_based_planner is None:
+            with self.time_stage("rule_based_planner"):
+                self.__rule_based_planner = RuleBasedPlanner(*self.__rule_based_planner_args)
+        return self.__rule_based_planner
+
+    def __generate_rule_based_week(self, feedback_key: str | None = None, previous_week: dict | None = None) -> str:
+        training_days = self.get_training_days()
+        day_types = list(dict.fromkeys(day["day_type"] for day in training_days.values()))
+        positions_by_day_type = self.exercises_filter.get_available_exercises_positions(
+            self.available_equipment, self.skill_level, day_types
+        )
+        plan = self.get_rule_based_planner().plan_week(
+            self.train_week.week, training_days, positions_by_day_type, previous_week, feedback_key
+        )
+        return self.__process_result(plan)
+
+    def generate_first_week_rule_based(self) -> str:
+        """
+        First week plan of the rule-based engine: deterministic, no LLM call.
+        """
+        return self.__generate_rule_based_week()
+
+    def generate_next_week_rule_based(self, feedback_key: str, previous_week: dict) -> str:
+        return self.__generate_rule_based_week(feedback_key, previous_week)
+
+    async def __astream(self, chain, inputs: dict, cache_key: str | None, started: float):
+        chunks = []
+        async for chunk in chain.astream(inputs):
+            if chunk.content:
+                chunks.append(chunk.content)
+                yield chunk.content
+
+        plan = "".join(chunks).strip()
+        self.logger.info(f"Training Plan Result: \n{plan}")
+        try:
+            # the one counted parse of a streamed output, its conversion is not counted again
+            with self.time_stage("output_parse"):
+                self.plan_parser.parse(plan, lambda parsed: self.__check_plan(parsed, self.train_week.week))
+        except ValueError:
+            return
+        await asyncio.to_thread(self.__store_plan, cache_key, plan, started)
+
+    async def astream_first_week(self):
+        """
+        Streams generate_first_week output as text chunks, as they are produced by the LLM.
+        A cached plan is yielded as one chunk.
+        """
+        started = time.perf_counter()
+        # streams generate the whole week in one completion, their plans are keyed as "week" mode plans
+        _, cache_key, plan = await asyncio.to_thread(self.__lookup_plan, "first_week", generation_mode="week")
+        if plan is not None:
+            yield plan
+            return
+
+        chain, inputs = await asyncio.to_thread(self.__prepare_first_week)
+        async for chunk in self.__astream(chain, inputs, cache_key, started):
+            yield chunk
+
+    async def astream_next_week(self, feedback_key: str, previous_week: dict):
+        started = time.perf_counter()
+        _, cache_key, plan = await asyncio.to_thread(
+            self.__lookup_plan, "next_week", feedback_key, previous_week, generation_mode="week"
+        )
+        if plan is not None:
+            yield plan
+            return
+
+        chain, inputs = await asyncio.to_thread(self.__prepare_next_week, feedback_key, previous_week)
+        async for chunk in self.__astream(chain, inputs, cache_key, started):
+            yield chunk
+
+    def convert_result_to_json(self, processed_result: str) -> dict:
+        """
+        Plan of a result, not counted by the plan parser: the output was counted when it was generated.
+        """
+        with self.time_stage("convert_result_to_json"):
+            plan, _ = parse_plan(processed_result)
+            return plan
 
@@ -26,6 +26,82 @@ class TrainWeek:
         week_template = week_templates[key]
         return week_template
 
+    @staticmethod
+    def get_day_json_schema(day_type: str | None = None) -> dict:
+        if day_type == "REST_DAY":
+            return {
+                "type": "object",
+                "properties": {"day_type": {"type": "string", "enum": ["REST_DAY"]}},
+                "required": ["day_type"],
+            }
+
+        if day_type == "PPL_DAY":
+            day_type_schema = {"type": "string", "enum": ["PUSH", "PULL", "LEGS"]}
+        elif day_type is not None:
+            day_type_schema = {"type": "string", "enum": [day_type]}
+        else:
+            day_type_schema = {"type": "string"}
+        exercise_schema = {
+            "type": "object",
+            "properties": {
+                "sets": {"type": "integer"},
+                "counts": {"type": "integer"},
+                "set_rest_time": {"type": "integer"},
+                "actual_weight": {"type": "null"},
+                "recommended_weight": {"type": "number"},
+            },
+            "required": ["sets", "counts", "set_rest_time", "actual_weight", "recommended_weight"],
+        }
+        return {
+            "type": "object",
+            "properties": {
+                "day_type": day_type_schema,
+                "exercises": {"type": "object", "additionalProperties": exercise_schema},
+                "notes": {"type": "string"},
+                "explanations": {"type": "string"},
+                "rest_time": {"type": "integer"},
+            },
+            "required": ["day_type", "exercises", "notes", "explanations", "rest_time"],
+        }
+
+    def get_json_schema(self) -> dict:
+        """
+        JSON schema of the whole week plan derived from the week template (structured output).
+        """
+        return {
+            "type": "object",
+            "properties": {day_key: self.get_day_json_schema(day["day_type"]) for day_key, day in self.week.items()},
+            "required": list(self.week),
+        }
+
+    @classmethod
+    def get_scope_json_schema(cls) -> dict:
+        """
+        JSON schema of a part of the week (per_day and day_types generation modes): day keys vary per request.
+        """
+        return {"type": "object", "additionalProperties": cls.get_day_json_schema()}
+
+    @classmethod
+    def check_plan(cls, plan: dict, skeleton: dict) -> None:
+        """
+        Raises ValueError if the plan does not follow the skeleton: a day missing, a day type other than
+        the one of the skeleton (PUSH, PULL or LEGS for PPL_DAY) or a required field missing.
+        A truncated output repaired by closing its brackets is cut short and fails here.
+        """
+        for day_key, day in skeleton.items():
+            planned_day = plan.get(day_key)
+            if not isinstance(planned_day, dict):
+                raise ValueError(f"Plan has no {day_key}")
+            day_schema = cls.get_day_json_schema(day["day_type"])
+            day_type_enum = day_schema["properties"]["day_type"].get("enum")
+            if day_type_enum is not None and planned_day.get("day_type") not in day_type_enum:
+                raise ValueError(
+                    f"Day type of {day_key} is {planned_day.get('day_type')!r}, expected one of {day_type_enum}"
+                )
+            missing = [field for field in day_schema["required"] if field not in planned_day]
+            if missing:
+                raise ValueError(f"{day_key} of the plan lacks {missing}")
+
     def get_week_formatted(self) -> str:
         week_text = str(self.week)
         week_text = week_text.replace("{", "{{")
@@ -1,14 +1,42 @@
 import os
 import json
+import atexit
+import asyncio
+import functools
 from typing import Optional
 
-import pandas as pd
 from omegaconf import OmegaConf
 
 from src.exercises.exercises_processor import ExercisesProcessor
+from src.exercises.exercises_snapshot import load_exercises_processor
+from src.training_plan.llm_clients import LLMClientRegistry
 from src.training_plan.train_assistant import TrainAssistant
 
 
+@functools.cache
+def get_llm_clients(api_key: str, train_assistant_config_path: str) -> LLMClientRegistry:
+    """
+    LLM clients shared by the assistants of the process, closed at exit.
+    """
+    llm_clients = LLMClientRegistry(api_key, OmegaConf.load(train_assistant_config_path)["llm_clients"])
+    atexit.register(lambda: asyncio.run(llm_clients.aclose()))
+    return llm_clients
+
+
+@functools.cache
+def get_exercises_processor(
+        raw_df_path: str,
+        snapshot_path: str | None,
+        exercises_config_path: str
+) -> ExercisesProcessor:
+    """
+    Exercises catalog shared by the assistants of the process: the snapshot is loaded (or rebuilt)
+    and the catalog indexed once, not on every call.
+    """
+    exercises_processor_config = OmegaConf.load(exercises_config_path)["exercises_processor"]
+    return load_exercises_processor(raw_df_path, snapshot_path, exercises_processor_config)
+
+
 def create_train_assistant(raw_user_data: dict, raw_scanner_data: Optional[dict] = None) -> TrainAssistant:
     API_KEY = os.getenv("API_KEY")
 
@@ -17,14 +45,14 @@ def create_train_assistant(raw_user_data: dict, raw_scanner_data: Optional[dict]
     age_based_adjustments_config = OmegaConf.load(os.getenv("AGE_BASED_ADJUSTMENTS_CONFIG_PATH"))
 
     exercises_config = OmegaConf.load(os.getenv("EXERCISES_CONFIG_PATH"))
-    exercises_processor_config = exercises_config["exercises_processor"]
 
     feedback_config = OmegaConf.load(os.getenv("FEEDBACK_CONFIG_PATH"))
 
     train_weeks_templates = json.load(open(os.getenv("TRAIN_WEEKS_TEMPLATES_PATH"), "r", encoding="utf-8"))
 
-    raw_df = pd.read_csv(os.getenv("EXERCISES_RAW_DF_PATH"), keep_default_na=False)
-    exercises_processor = ExercisesProcessor(raw_df, exercises_processor_config)
+    exercises_processor = get_exercises_processor(
+        os.getenv("EXERCISES_RAW_DF_PATH"), os.getenv("EXERCISES_SNAPSHOT_PATH"), os.getenv("EXERCISES_CONFIG_PATH")
+    )
 
     return TrainAssistant(
         API_KEY=API_KEY,
@@ -38,5 +66,6 @@ def create_train_assistant(raw_user_data: dict, raw_scanner_data: Optional[dict]
         train_weeks_templates=train_weeks_templates,
         exercises_processor=exercises_processor,
         training_program_examples_dir=os.getenv("TRAINING_PROGRAM_EXAMPLES_DIR"),
-        eric_recommendations_path=os.getenv("ERIC_RECOMMENDATIONS_PATH")
+        eric_recommendations_path=os.getenv("ERIC_RECOMMENDATIONS_PATH"),
+        llm_clients=get_llm_clients(API_KEY, os.getenv("TRAIN_ASSISTANT_CONFIG_PATH"))
     )
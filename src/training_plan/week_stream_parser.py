@@ -0,0 +1,108 @@
+import json
+
+from src.training_plan.plan_parser import parse_plan
+
+
+class WeekStreamParser:
+    """
+    Incremental parser of a streamed week plan JSON.
+
+    Chunks of the LLM output are fed as they arrive; every top-level object value
+    ("day N": {...}) is returned as soon as its closing brace is received.
+    Text before the first "{" (e.g. a ```json fence) is ignored.
+    A day with a small defect (e.g. a trailing comma) is repaired like a whole output, a day that cannot be
+    repaired is skipped: the full output is still parsed when the stream ends.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.position = 0
+        self.depth = 0
+        self.started = False
+        self.finished = False
+        self.in_string = False
+        self.escape = False
+        self.expect_key = False
+        self.key_start = None
+        self.current_key = None
+        self.value_start = None
+
+    @staticmethod
+    def __parse_key(text: str) -> str:
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            return text[1:-1]
+
+    @staticmethod
+    def __parse_value(text: str) -> dict | None:
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            pass
+        try:
+            value, _ = parse_plan(text)
+        except ValueError:
+            return None
+        return value
+
+    def feed(self, chunk: str) -> list:
+        """
+        Args:
+            chunk: Next piece of the streamed output
+
+        Returns:
+            List of (key, value) pairs of the top-level objects completed by this chunk
+        """
+        self.buffer += chunk
+        completed = []
+
+        while self.position < len(self.buffer) and not self.finished:
+            char = self.buffer[self.position]
+
+            if not self.started:
+                if char == "{":
+                    self.started = True
+                    self.depth = 1
+                    self.expect_key = True
+
+            elif self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == "\\":
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+                    if self.key_start is not None:
+                        self.current_key = self.__parse_key(self.buffer[self.key_start:self.position + 1])
+                        self.key_start = None
+
+            elif char == '"':
+                self.in_string = True
+                if self.depth == 1 and self.expect_key:
+                    self.key_start = self.position
+
+            elif char in "{[":
+                if self.depth == 1 and char == "{":
+                    self.value_start = self.position
+                self.depth += 1
+
+            elif char in "}]":
+                self.depth -= 1
+                if self.depth == 1 and self.value_start is not None:
+                    value = self.__parse_value(self.buffer[self.value_start:self.position + 1])
+                    if value is not None:
+                        completed.append((self.current_key, value))
+                    self.value_start = None
+                elif self.depth == 0:
+                    self.finished = True
+
+            elif self.depth == 1:
+                if char == ":":
+                    self.expect_key = False
+                elif char == ",":
+                    self.expect_key = True
+
+            self.position += 1
+
+        return completed
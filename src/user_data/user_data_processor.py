@@ -95,6 +95,10 @@ class UserDataProcessor:
 
         return exercise_limitations_descriptions
 
+    def get_nutrition_goal(self) -> str:
+        nutrition_goal_key = self.user_data_processing_config["keys"]["nutrition_goal_key"]
+        return self.user_data[nutrition_goal_key]
+
     def get_nutrition_goal_description(self) -> dict:
         nutrition_goal_key = self.user_data_processing_config["keys"]["nutrition_goal_key"]
         nutrition_goal = self.user_data[nutrition_goal_key]
@@ -4,19 +4,50 @@ from fastapi import FastAPI
 from fastapi.testclient import TestClient
 
 from src.api import endpoints
+from src.api.idempotency import IdempotencyStore
+from src.api.jobs import JobQueue, JobStore
+from src.cache_backends import MemoryCacheBackend
+from src.metrics import MetricsRegistry, StageTimers
+from src.training_plan.admission import AdmissionRejected
+from src.training_plan.token_usage import TokenUsage
 
 
 class DummyTrainAssistant:
+    generations = 0
+
     def __init__(self, *args, **kwargs):
-        pass
+        self.token_usage = TokenUsage()
 
     def generate_first_week(self):
+        DummyTrainAssistant.generations += 1
         return json.dumps({"plan": "ok"})
 
     def generate_next_week(self, feedback_key, previous_week):
         return json.dumps({"plan": f"next-{feedback_key}"})
 
+    async def agenerate_first_week(self):
+        return self.generate_first_week()
+
+    async def agenerate_next_week(self, feedback_key, previous_week):
+        return self.generate_next_week(feedback_key, previous_week)
+
+    def generate_first_week_rule_based(self):
+        return json.dumps({"plan": "rules"})
+
+    def generate_next_week_rule_based(self, feedback_key, previous_week):
+        return json.dumps({"plan": f"rules-{feedback_key}"})
+
+    async def astream_first_week(self):
+        for chunk in ['```json\n{"day 1": {"day_type": "PU', 'SH"}, "day 2": ', '{"day_type": "REST_DAY"}}\n```']:
+            yield chunk
+
+    async def astream_next_week(self, feedback_key, previous_week):
+        yield '{"day 1": {"day_type": "'
+        yield feedback_key
+
     def convert_result_to_json(self, plan_str):
+        if plan_str.startswith("```"):
+            plan_str = "\n".join(plan_str.splitlines()[1:-1])
         return json.loads(plan_str)
 
 
@@ -28,15 +59,32 @@ def client(monkeypatch):
     app.include_router(endpoints.router)
 
     app.state.api_key = "test"
-    app.state.train_assistant_config = {}
+    app.state.train_assistant_config = {
+        "engine": {"default": "llm", "fallback": True, "llm_budget": None},
+        "batch": {"concurrency": 2, "max_items": 3},
+    }
     app.state.data_processing_config = {}
     app.state.age_based_adjustments_config = {}
     app.state.exercises_config = {}
     app.state.feedback_config = {}
     app.state.train_weeks_templates = {}
     app.state.exercises_processor = object()
-    app.state.training_program_examples_dir = None
-    app.state.eric_recommendations_path = None
+    app.state.prompt_assets = None
+    app.state.prompt_templates = None
+    app.state.llm_clients = None
+    app.state.plan_cache = None
+    app.state.single_flight = None
+    app.state.llm_resilience = None
+    app.state.plan_parser = None
+    app.state.idempotency = None
+    app.state.admission = None
+    app.state.stage_timers = None
+    app.state.usage_meter = None
+    app.state.prompt_budgeter = None
+    app.state.avatar_index = None
+    app.state.jobs = None
+    app.state.metrics = MetricsRegistry()
+    app.state.metrics.register("dummy", lambda: {"value": 1})
 
     return TestClient(app)
 
@@ -54,6 +102,7 @@ def test_generate_first_week_endpoint(client):
     resp = client.post("/generate_first_week", json=payload)
     assert resp.status_code == 200
     assert resp.json() == {"plan": {"plan": "ok"}}
+    assert resp.headers["X-Prompt-Tokens"] == "0" and resp.headers["X-LLM-Cost-USD"] == "0.000000"
 
 
 @pytest.mark.integration
@@ -61,4 +110,163 @@ def test_generate_next_week_endpoint(client):
     payload = {"user_info": {}, "prev_week": {}, "feedback_key": "easy"}
     resp = client.post("/generate_next_week", json=payload)
     assert resp.status_code == 200
-    assert resp.json() == {"plan": {"plan": "next-easy"}}
\ No newline at end of file
+    assert resp.json() == {"plan": {"plan": "next-easy"}}
+
+
+@pytest.mark.integration
+def test_metrics_endpoint(client):
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.json() == {"dummy": {"value": 1}}
+
+
+@pytest.mark.integration
+def test_prometheus_metrics_with_stage_timers(client):
+    client.app.state.stage_timers = StageTimers([0.1, 1])
+    client.post("/generate_first_week", json={})
+
+    resp = client.get("/metrics", headers={"Accept": "text/plain;version=0.0.4"})
+    assert resp.status_code == 200 and resp.headers["content-type"].startswith("text/plain")
+    assert "sculpd_dummy_value 1.0" in resp.text
+    assert (
+        'sculpd_stage_duration_seconds_count{stage="assistant_init",endpoint="/generate_first_week",'
+        'model="none",outcome="ok"} 1'
+    ) in resp.text
+    assert client.get("/metrics?format=json").json() == {"dummy": {"value": 1}}
+
+
+def parse_sse(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.mark.integration
+def test_stream_first_week_endpoint(client):
+    resp = client.post("/generate_first_week/stream", json={"user_info": {}, "scanner_info": {}})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    assert parse_sse(resp.text) == [
+        ("day", {"day": "day 1", "plan": {"day_type": "PUSH"}}),
+        ("day", {"day": "day 2", "plan": {"day_type": "REST_DAY"}}),
+        ("plan", {"plan": {"day 1": {"day_type": "PUSH"}, "day 2": {"day_type": "REST_DAY"}}}),
+    ]
+
+
+@pytest.mark.integration
+def test_stream_next_week_endpoint_reports_invalid_plan(client):
+    payload = {"user_info": {}, "prev_week": {}, "feedback_key": "easy"}
+    resp = client.post("/generate_next_week/stream", json=payload)
+    assert resp.status_code == 200
+    events = parse_sse(resp.text)
+    assert [event for event, _ in events] == ["error"]
+
+
+@pytest.mark.integration
+def test_idempotency_key_replays_response(client):
+    client.app.state.idempotency = IdempotencyStore(MemoryCacheBackend(100, 60), pending_timeout=60, poll_interval=0.01)
+    generations = DummyTrainAssistant.generations
+    headers = {"Idempotency-Key": "retry-1"}
+    payload = {"user_info": {"name": "a"}, "scanner_info": {}}
+
+    first = client.post("/generate_first_week", json=payload, headers=headers)
+    retry = client.post("/generate_first_week", json=payload, headers=headers)
+    assert first.status_code == retry.status_code == 200
+    assert retry.json() == first.json()
+    assert "Idempotent-Replayed" not in first.headers
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert DummyTrainAssistant.generations == generations + 1
+
+    conflict = client.post("/generate_first_week", json={"user_info": {"name": "b"}}, headers=headers)
+    assert conflict.status_code == 422
+
+
+@pytest.mark.integration
+def test_rules_engine_and_llm_fallback(client, monkeypatch):
+    resp = client.post("/generate_next_week", json={"user_info": {}, "feedback_key": "easy", "engine": "rules"})
+    assert resp.json() == {"plan": {"plan": "rules-easy"}}
+    assert resp.headers["X-Plan-Engine"] == "rules"
+
+    async def unavailable(self):
+        raise ConnectionError("LLM is unavailable")
+
+    monkeypatch.setattr(DummyTrainAssistant, "agenerate_first_week", unavailable)
+    resp = client.post("/generate_first_week", json={"user_info": {}, "scanner_info": {}})
+    assert resp.status_code == 200
+    assert resp.json() == {"plan": {"plan": "rules"}}
+    assert resp.headers["X-Plan-Engine"] == "rules-fallback"
+
+
+@pytest.mark.integration
+def test_generate_batch_streams_item_results(client):
+    response = client.post("/generate_batch", json={"items": [
+        {"id": "a", "mode": "first_week"},
+        {"mode": "next_week", "feedback_key": "hard", "engine": "rules"},
+        {"id": "c", "mode": "next_week"},
+    ]})
+
+    assert response.status_code == 200
+    results = {result["id"]: result for result in map(json.loads, response.text.splitlines())}
+    assert results["a"]["status"] == "ok" and results["a"]["plan"] == {"plan": "ok"} and results["a"]["engine"] == "llm"
+    assert results["1"]["plan"] == {"plan": "rules-hard"} and results["1"]["engine"] == "rules"
+    assert results["c"]["status"] == "error" and "feedback_key" in results["c"]["error"]
+    assert {"queued", "assistant", "total"} <= results["a"]["timings"].keys()
+
+
+@pytest.mark.integration
+def test_generate_batch_rejects_too_many_items(client):
+    response = client.post("/generate_batch", json={"items": [{"mode": "first_week"}] * 4})
+
+    assert response.status_code == 413
+
+
+@pytest.mark.integration
+def test_job_is_submitted_and_polled(client, tmp_path):
+    app = client.app
+    app.state.jobs = JobQueue(JobStore(str(tmp_path / "jobs.sqlite3"), ttl=None), {
+        "workers": 1, "drain_timeout": 1, "heartbeat_interval": 30, "stale_timeout": 900,
+        "webhook": {"timeout": 1, "max_attempts": 1, "backoff": 0.0, "allowed_hosts": ["client.test"]},
+    })
+
+    @app.router.on_startup.append
+    async def start_jobs():
+        app.state.jobs.start(
+            lambda job_id, payload: endpoints.generate_batch_item(
+                app.state, endpoints.BatchItem.model_validate({**payload, "id": job_id})
+            )
+        )
+
+    @app.router.on_shutdown.append
+    async def drain_jobs():
+        await app.state.jobs.drain()
+
+    with TestClient(app) as jobs_client:
+        rejected = jobs_client.post("/jobs/generate_first_week", json={"callback_url": "http://other.test/"})
+        submitted = jobs_client.post("/jobs/generate_next_week", json={"feedback_key": "easy"})
+        assert rejected.status_code == 422
+        assert submitted.status_code == 202 and submitted.json()["status"] == "queued"
+
+        job_id = submitted.json()["job_id"]
+        while (job := jobs_client.get(f"/jobs/{job_id}").json())["status"] in ("queued", "running"):
+            pass
+        assert job["status"] == "succeeded" and job["result"]["plan"] == {"plan": "next-easy"}
+        assert jobs_client.get("/jobs/unknown").status_code == 404
+
+
+@pytest.mark.integration
+def test_jobs_disabled(client):
+    assert client.post("/jobs/generate_first_week", json={}).status_code == 404
+
+
+@pytest.mark.integration
+def test_rejected_admission_is_answered_with_429(client, monkeypatch):
+    async def rejected(self):
+        raise AdmissionRejected("queue timeout", retry_after=12)
+
+    monkeypatch.setattr(DummyTrainAssistant, "agenerate_first_week", rejected)
+    response = client.post("/generate_first_week", json={})
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "12"
@@ -1,14 +1,38 @@
+import ast
+import copy
 import json
+import asyncio
 from pathlib import Path
 
 import pandas as pd
 from omegaconf import OmegaConf
 import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
 
+from src.cache_backends import MemoryCacheBackend
+from src.metrics import StageTimers
+from src.training_plan.avatar_index import AvatarIndex
+from src.training_plan.llm_resilience import LLMResilience
+from src.training_plan.prompt_assets import PromptAssets
+from src.training_plan.prompt_budget import PromptBudgeter
+from src.training_plan.rule_based_planner import RuleBasedPlanner
+from src.training_plan.token_counter import TokenCounter
+from src.training_plan.token_usage import UsageMeter
+from src.single_flight import SingleFlight
+from src.training_plan.plan_cache import PlanCache
 from src.training_plan.train_assistant import TrainAssistant
+from src.training_plan.train_week import TrainWeek
 from src.exercises.exercises_processor import ExercisesProcessor
 
 
+def make_week_plan(week: dict) -> str:
+    """Plan following the week skeleton: the template days, PPL_DAY days as PUSH days."""
+    return json.dumps({
+        day_key: {**day, "day_type": "PUSH"} if day["day_type"] == "PPL_DAY" else day for day_key, day in week.items()
+    })
+
+
 class DummyResult:
     def __init__(self, content: str):
         self.content = content
@@ -21,13 +45,14 @@ class DummyChain:
     def invoke(self, _):
         return DummyResult(self._content)
 
+    async def ainvoke(self, _):
+        return DummyResult(self._content)
+
 
 @pytest.fixture
 def assistant(monkeypatch):
-    response_json = json.dumps({"day 1": {"day_type": "REST_DAY"}})
-
-    def fake_init_chain(self, prompt, model_name, temperature):
-        return DummyChain(response_json)
+    def fake_init_chain(self, prompt, model_name, temperature, generation_mode):
+        return DummyChain(make_week_plan(self.train_week.week))
 
     monkeypatch.setattr(TrainAssistant, "_TrainAssistant__init_chain", fake_init_chain)
 
@@ -64,7 +89,7 @@ def assistant(monkeypatch):
 def test_generate_first_week_and_convert(assistant):
     result_str = assistant.generate_first_week()
     result = assistant.convert_result_to_json(result_str)
-    assert result["day 1"]["day_type"] == "REST_DAY"
+    assert result == json.loads(make_week_plan(assistant.train_week.week))
 
 
 @pytest.mark.integration
@@ -72,4 +97,511 @@ def test_generate_next_week_and_convert(assistant):
     prev_week = {"day 1": {"day_type": "REST_DAY"}}
     result_str = assistant.generate_next_week("normal", prev_week)
     result = assistant.convert_result_to_json(result_str)
-    assert result["day 1"]["day_type"] == "REST_DAY"
\ No newline at end of file
+    assert result == json.loads(make_week_plan(assistant.train_week.week))
+
+@pytest.mark.integration
+def test_available_exercises_formatted_is_memoized(assistant):
+    cache = assistant.exercises_processor.available_exercises_cache
+    first = assistant.get_available_exercises_formatted()
+    second = assistant.get_available_exercises_formatted()
+
+    assert first == second
+    assert cache.stats()["hits"] >= 1
+    assert first == assistant.exercises_formatter.data_format(assistant.available_exercises_by_day_type)
+
+
+@pytest.mark.integration
+def test_agenerate_next_week_and_convert(assistant):
+    prev_week = {"day 1": {"day_type": "REST_DAY"}}
+    result_str = asyncio.run(assistant.agenerate_next_week("normal", prev_week))
+    result = assistant.convert_result_to_json(result_str)
+    assert result == json.loads(make_week_plan(assistant.train_week.week))
+
+
+class DayEchoChain:
+    def __init__(self):
+        self.inputs = []
+
+    def invoke(self, inputs):
+        self.inputs.append(inputs)
+        day = ast.literal_eval(inputs["week_template"])
+        return DummyResult(json.dumps({key: {**value, "notes": "generated"} for key, value in day.items()}))
+
+    async def ainvoke(self, inputs):
+        return self.invoke(inputs)
+
+
+@pytest.mark.integration
+def test_per_day_generation_merges_days(assistant, monkeypatch):
+    chain = DayEchoChain()
+    monkeypatch.setattr(TrainAssistant, "_TrainAssistant__init_chain", lambda self, *args: chain)
+    assistant.generation_mode = "per_day"
+
+    result = assistant.convert_result_to_json(asyncio.run(assistant.agenerate_first_week()))
+
+    training_days = assistant.get_training_days()
+    assert len(chain.inputs) == len(training_days)
+    assert list(result) == list(assistant.train_week.week)
+    for day_key, day in assistant.train_week.week.items():
+        if day["day_type"] == "REST_DAY":
+            assert result[day_key] == day
+        else:
+            assert result[day_key]["notes"] == "generated"
+            assert result[day_key]["day_type"] == training_days[day_key]["day_type"]
+
+    day_inputs = chain.inputs[0]
+    day_type = ast.literal_eval(day_inputs["week_template"]).popitem()[1]["day_type"]
+    assert day_inputs["available_exercises"] == assistant.get_available_exercises_formatted([day_type])
+
+
+@pytest.mark.integration
+def test_unknown_generation_mode_is_rejected(assistant):
+    config = OmegaConf.merge(assistant.train_assistant_config, {"generation": {"mode": "per_week"}})
+
+    with pytest.raises(ValueError, match="per_week"):
+        TrainAssistant.get_generation_mode(config)
+
+
+@pytest.mark.integration
+def test_training_days_resolve_ppl_days(assistant):
+    assistant.train_week = TrainWeek(week_templates=assistant.train_week.week_templates, train_days_num=5)
+    day_types = [day["day_type"] for day in assistant.get_training_days().values()]
+    assert day_types == ["PUSH", "PULL", "LEGS", "PUSH", "PULL"]
+
+
+@pytest.mark.integration
+def test_day_types_generation_fans_out_workouts(assistant, monkeypatch):
+    chain = DayEchoChain()
+    monkeypatch.setattr(TrainAssistant, "_TrainAssistant__init_chain", lambda self, *args: chain)
+    assistant.generation_mode = "day_types"
+    assistant.train_assistant_config["generation"]["day_types"]["variants"] = 2
+    assistant.train_week = TrainWeek(week_templates=assistant.train_week.week_templates, train_days_num=6)
+
+    result = assistant.convert_result_to_json(assistant.generate_first_week())
+
+    assert len(chain.inputs) == 3
+    assert ast.literal_eval(chain.inputs[0]["week_template"]).keys() == {"PUSH A", "PUSH B"}
+    assert [day["day_type"] for day in result.values()] == ["PUSH", "PULL", "LEGS", "PUSH", "PULL", "LEGS", "REST_DAY"]
+    assert all(day["notes"] == "generated" for day in result.values() if day["day_type"] != "REST_DAY")
+
+
+@pytest.mark.integration
+def test_vary_workout_keeps_lead_exercise():
+    workout = {"day_type": "PUSH", "exercises": {"a": {}, "b": {}, "c": {}, "d": {}}}
+
+    assert TrainAssistant.vary_workout(workout, 0) == workout
+    assert list(TrainAssistant.vary_workout(workout, 1)["exercises"]) == ["a", "c", "d", "b"]
+    assert list(TrainAssistant.vary_workout(workout, 3)["exercises"]) == ["a", "b", "c", "d"]
+
+
+class CountingChain(DummyChain):
+    def __init__(self, content: str):
+        super().__init__(content)
+        self.calls = 0
+
+    def invoke(self, inputs):
+        self.calls += 1
+        return super().invoke(inputs)
+
+
+@pytest.mark.integration
+def test_plan_cache_serves_identical_requests(assistant, monkeypatch):
+    chain = CountingChain(make_week_plan(assistant.train_week.week))
+    monkeypatch.setattr(TrainAssistant, "_TrainAssistant__init_chain", lambda self, *args: chain)
+    assistant.plan_cache = PlanCache(MemoryCacheBackend(maxsize=8, ttl=None), version="test")
+    prev_week = {"day 1": {"day_type": "REST_DAY"}}
+
+    first = assistant.generate_next_week("normal", prev_week)
+    assert assistant.generate_next_week("normal", prev_week) == first
+    assert chain.calls == 1
+
+    assistant.generate_next_week("hard", prev_week)
+    assert chain.calls == 2
+    assert assistant.plan_cache.stats()["hits"] == 1
+
+
+@pytest.mark.integration
+def test_streamed_plans_are_cached_as_week_mode_plans(assistant, monkeypatch):
+    class StreamingChain:
+        async def astream(self, inputs):
+            yield AIMessage(content=make_week_plan(assistant.train_week.week))
+
+    monkeypatch.setattr(TrainAssistant, "_TrainAssistant__init_chain", lambda self, *args: StreamingChain())
+    assistant.plan_cache = PlanCache(MemoryCacheBackend(maxsize=8, ttl=None), version="test")
+    assistant.generation_mode = "per_day"
+
+    async def stream():
+        return "".join([chunk async for chunk in assistant.astream_first_week()])
+
+    asyncio.run(stream())
+
+    assert assistant.plan_cache.get(assistant.get_plan_cache_key("first_week", generation_mode="week")) is not None
+    assert assistant.plan_cache.get(assistant.get_plan_cache_key("first_week")) is None
+
+
+@pytest.mark.integration
+def test_streams_request_the_week_schema_in_per_day_mode(assistant, monkeypatch):
+    plan = make_week_plan(assistant.train_week.week)
+    response_formats = []
+
+    class SchemaRecordingLLM:
+        def bind(self, response_format):
+            response_formats.append(response_format["json_schema"]["schema"])
+            return RunnableLambda(lambda prompt_value: AIMessage(content=plan))
+
+    # the real chain, its LLM records the response format it is bound to
+    monkeypatch.undo()
+    monkeypatch.setattr(assistant.llm_clients, "get", lambda model_name, temperature=None: SchemaRecordingLLM())
+    assistant.structured_output_config = OmegaConf.merge(
+        assistant.structured_output_config, {"response_format": "json_schema"}
+    )
+    assistant.generation_mode = "per_day"
+
+    async def stream():
+        return "".join([chunk async for chunk in assistant.astream_first_week()])
+
+    assert json.loads(asyncio.run(stream())) == json.loads(plan)
+    assert response_formats == [assistant.train_week.get_json_schema()]
+
+
+class SlowChain(DummyChain):
+    def __init__(self, content: str):
+        super().__init__(content)
+        self.calls = 0
+
+    async def ainvoke(self, inputs):
+        self.calls += 1
+        await asyncio.sleep(0.1)
+        return await super().ainvoke(inputs)
+
+
+@pytest.mark.integration
+def test_identical_concurrent_requests_are_coalesced(assistant, monkeypatch):
+    chain = SlowChain(make_week_plan(assistant.train_week.week))
+    monkeypatch.setattr(TrainAssistant, "_TrainAssistant__init_chain", lambda self, *args: chain)
+    assistant.single_flight = SingleFlight()
+
+    async def main():
+        return await asyncio.gather(*(assistant.agenerate_first_week() for _ in range(3)))
+
+    assert len(set(asyncio.run(main()))) == 1
+    assert chain.calls == 1
+    assert assistant.single_flight.stats()["coalesced"] == 2
+
+
+@pytest.mark.integration
+def test_broken_output_is_repaired_without_regeneration(assistant, monkeypatch):
+    plan = make_week_plan(assistant.train_week.week)
+    # truncated: the local repair closes the brackets, the plan lacks the last days
+    chain = CountingChain("Sure!\n" + plan[:len(plan) // 2])
+    repair_chain = CountingChain(plan)
+    monkeypatch.setattr(TrainAssistant, "_TrainAssistant__init_chain", lambda self, *args: chain)
+    monkeypatch.setattr(TrainAssistant, "_TrainAssistant__init_repair_chain", lambda self: repair_chain)
+
+    result = assistant.convert_result_to_json(assistant.generate_first_week())
+
+    assert result == json.loads(plan)
+    assert chain.calls == 1 and repair_chain.calls == 1
+    stats = assistant.plan_parser.stats()
+    # converting the returned plan is not counted as another parse
+    assert stats["model_repaired"] == 1 and stats["strict"] == 0 and stats["failed"] == 0
+
+
+@pytest.mark.integration
+def test_streamed_output_is_counted_once(assistant, monkeypatch):
+    class StreamingChain:
+        async def astream(self, inputs):
+            plan = make_week_plan(assistant.train_week.week)
+            for chunk in ("Plan: " + plan[:20], plan[20:]):
+                yield AIMessage(content=chunk)
+
+    monkeypatch.setattr(TrainAssistant, "_TrainAssistant__init_chain", lambda self, *args: StreamingChain())
+
+    async def stream():
+        return "".join([chunk async for chunk in assistant.astream_first_week()])
+
+    assistant.convert_result_to_json(asyncio.run(stream()))
+
+    stats = assistant.plan_parser.stats()
+    assert stats["extracted"] == 1 and stats["strict"] == 0
+
+
+@pytest.mark.integration
+def test_week_json_schema_follows_template(assistant):
+    schema = assistant.train_week.get_json_schema()
+
+    assert schema["required"] == list(assistant.train_week.week)
+    for day_key, day in assistant.train_week.week.items():
+        assert day["day_type"] in schema["properties"][day_key]["properties"]["day_type"]["enum"]
+
+
+@pytest.mark.integration
+def test_rule_based_week_is_deterministic_and_schema_valid(assistant):
+    assistant.train_week = TrainWeek(week_templates=assistant.train_week.week_templates, train_days_num=5)
+    assistant.available_equipment = assistant.exercises_processor.get_equipment_columns()
+
+    plan = json.loads(assistant.generate_first_week_rule_based())
+    assert assistant.generate_first_week_rule_based() == json.dumps(plan, ensure_ascii=False, indent=2)
+
+    schema = assistant.train_week.get_json_schema()
+    assert list(plan) == schema["required"]
+    for day_key, day in plan.items():
+        day_schema = schema["properties"][day_key]
+        assert set(day) == set(day_schema["required"])
+        assert day["day_type"] in day_schema["properties"]["day_type"]["enum"]
+        for exercise in day.get("exercises", {}).values():
+            assert exercise["actual_weight"] is None
+            assert isinstance(exercise["sets"], int) and isinstance(exercise["counts"], int)
+            assert exercise["set_rest_time"] in (90, 120)
+
+    training_days = [day for day in plan.values() if day["day_type"] != "REST_DAY"]
+    assert all(day["exercises"] for day in training_days)
+    # repeats of a day type rotate the exercises
+    assert training_days[0]["exercises"] != training_days[3]["exercises"]
+
+
+@pytest.mark.integration
+def test_rule_based_next_week_progresses_weights(assistant):
+    previous_week = json.loads(assistant.generate_first_week_rule_based())
+    next_week = json.loads(assistant.generate_next_week_rule_based("easy", previous_week))
+
+    previous_weights = {
+        name: exercise["recommended_weight"]
+        for day in previous_week.values() for name, exercise in day.get("exercises", {}).items()
+    }
+    progressed = [
+        (previous_weights[name], exercise["recommended_weight"])
+        for day in next_week.values() for name, exercise in day.get("exercises", {}).items()
+        if name in previous_weights and previous_weights[name] > 0
+    ]
+    assert progressed
+    assert all(weight >= previous for previous, weight in progressed)
+
+
+@pytest.mark.integration
+def test_rule_based_planner_is_built_on_first_use_with_shared_catalog_arrays(assistant):
+    assert assistant._TrainAssistant__rule_based_planner is None
+
+    planner = assistant.get_rule_based_planner()
+    assert assistant.get_rule_based_planner() is planner
+    assert len(assistant.exercises_processor.catalog_arrays) == 1
+
+    other = RuleBasedPlanner(*assistant._TrainAssistant__rule_based_planner_args)
+    assert other.compound_mask is planner.compound_mask
+    assert other.load_ratios is planner.load_ratios
+    assert len(planner.excluded_mask) == len(planner.names)
+
+
+@pytest.mark.integration
+def test_llm_calls_are_admitted_with_prompt_tokens(assistant, monkeypatch):
+    calls = []
+
+    class RecordingAdmission:
+        completion_tokens = 0
+
+        def estimate_tokens(self, prompt_text):
+            return len(prompt_text)
+
+        async def aacquire(self, lane, tokens):
+            calls.append((lane, tokens))
+
+    assistant.admission = RecordingAdmission()
+    assistant.admission_lane = "batch"
+    asyncio.run(assistant.agenerate_first_week())
+
+    [(lane, tokens)] = calls
+    assert lane == "batch"
+    # the rendered prompt includes the prompt assets and the formatted exercises
+    assert tokens > len(assistant.merged_recs) + len(assistant.get_available_exercises_formatted())
+
+
+@pytest.mark.integration
+def test_generation_stages_are_timed(assistant):
+    assistant.stage_timers = StageTimers([1])
+    assistant.endpoint = "/generate_next_week"
+    assistant.exercises_processor.available_exercises_cache.clear()
+
+    assistant.convert_result_to_json(assistant.generate_next_week("normal", {"day 1": {"day_type": "REST_DAY"}}))
+
+    stages = {labels["stage"] for labels, _ in assistant.stage_timers.collect()}
+    assert {
+        "generate_next_week", "prompt_template", "user_data_format", "exercises_filter", "exercises_format",
+        "output_parse", "convert_result_to_json"
+    } <= stages
+
+
+@pytest.mark.integration
+def test_token_usage_is_attributed_to_prompt_sections(assistant, monkeypatch):
+    class UsageChain:
+        def invoke(self, inputs):
+            usage = {"input_tokens": 50000, "output_tokens": 2000, "total_tokens": 52000}
+            return AIMessage(content=make_week_plan(assistant.train_week.week), usage_metadata=usage)
+
+    monkeypatch.setattr(TrainAssistant, "_TrainAssistant__init_chain", lambda self, *args: UsageChain())
+    assistant.usage_meter = UsageMeter({"prices": {}}, TokenCounter(None, chars_per_token=4.0))
+
+    assistant.generate_first_week()
+
+    sections = assistant.token_usage.as_dict()["input_tokens_by_section"]
+    assert {"avatars_examples", "merged_recs", "available_exercises", "user_data", "instructions"} <= sections.keys()
+    assert sum(sections.values()) == 50000
+
+
+@pytest.mark.integration
+def test_truncated_output_is_retried_and_never_cached(assistant, monkeypatch):
+    plan = make_week_plan(assistant.train_week.week)
+    # closing the brackets of the truncated output parses into a plan cut short
+    truncated = plan[:plan.index('"day 2"')] + '"day 2": {"day_type": "PU'
+    chain = CountingChain(truncated)
+    monkeypatch.setattr(TrainAssistant, "_TrainAssistant__init_chain", lambda self, *args: chain)
+    assistant.structured_output_config = OmegaConf.merge(assistant.structured_output_config, {"repair_model": None})
+    assistant.plan_cache = PlanCache(MemoryCacheBackend(maxsize=8, ttl=None), version="test")
+
+    with pytest.raises(ValueError):
+        assistant.generate_first_week()
+    assert assistant.plan_cache.get(assistant.get_plan_cache_key("first_week")) is None
+    assert assistant.plan_parser.stats()["regenerations_avoided"] == 0
+
+    responses = iter([truncated, plan])
+    monkeypatch.setattr(CountingChain, "invoke", lambda self, inputs: DummyResult(next(responses)))
+    resilience_config = OmegaConf.merge(
+        assistant.train_assistant_config["llm_resilience"], {"backoff_base": 0.0, "backoff_max": 0.0}
+    )
+    assistant.llm_resilience = LLMResilience(resilience_config)
+
+    result = assistant.convert_result_to_json(assistant.generate_first_week())
+    assistant.llm_resilience.close()
+
+    assert result == json.loads(plan)
+    assert assistant.llm_resilience.stats()["invalid_results"] == 1
+    assert assistant.plan_cache.get(assistant.get_plan_cache_key("first_week")) is not None
+
+
+@pytest.mark.integration
+def test_every_resilient_attempt_is_metered(assistant, monkeypatch):
+    responses = iter(["not a plan", make_week_plan(assistant.train_week.week)])
+
+    class UsageChain:
+        def invoke(self, inputs):
+            usage = {"input_tokens": 1000, "output_tokens": 100, "total_tokens": 1100}
+            return AIMessage(content=next(responses), usage_metadata=usage)
+
+    monkeypatch.setattr(TrainAssistant, "_TrainAssistant__init_chain", lambda self, *args: UsageChain())
+    resilience_config = OmegaConf.merge(
+        assistant.train_assistant_config["llm_resilience"], {"backoff_base": 0.0, "backoff_max": 0.0}
+    )
+    assistant.llm_resilience = LLMResilience(resilience_config)
+    assistant.structured_output_config = OmegaConf.merge(assistant.structured_output_config, {"repair_model": None})
+    assistant.usage_meter = UsageMeter({"prices": {}}, TokenCounter(None, chars_per_token=4.0))
+
+    assistant.generate_first_week()
+    assistant.llm_resilience.close()
+
+    usage = assistant.token_usage.as_dict()
+    assert usage["calls"] == 2 and usage["input_tokens"] == 2000
+
+
+@pytest.mark.integration
+def test_prompt_is_trimmed_to_the_budget(assistant, monkeypatch):
+    calls = []
+
+    class RecordingChain:
+        def invoke(self, inputs):
+            calls.append(inputs)
+            return AIMessage(content=make_week_plan(assistant.train_week.week))
+
+    monkeypatch.setattr(TrainAssistant, "_TrainAssistant__init_chain", lambda self, *args: RecordingChain())
+    token_counter = TokenCounter(None, chars_per_token=4.0)
+    config = {
+        "budgets": {"first_week": 3000},
+        "trim_order": ["avatars_examples", "merged_recs", "available_exercises"],
+        "min_avatar_examples": 0,
+        "min_merged_recs_tokens": 300,
+        "min_exercises_per_day_type": 5,
+    }
+    assistant.prompt_budgeter = PromptBudgeter(config, token_counter)
+    full_exercises = assistant.get_available_exercises_formatted()
+    exercises_cache_size = len(assistant.exercises_processor.available_exercises_cache)
+
+    assistant.generate_first_week()
+
+    [inputs] = calls
+    prompt = assistant.prompt_templates.get("first_week", assistant.train_week.train_days_num, assistant.prompt_assets_snapshot)
+    assert token_counter.count(prompt.invoke(inputs).to_string()) <= 3000
+    assert len(inputs["merged_recs"]) < len(assistant.merged_recs)
+    assert len(inputs["available_exercises"]) < len(full_exercises)
+    assert assistant.prompt_budgeter.stats() == {"fitted": 0, "trimmed": 1, "over_budget": 0}
+    # the capped blocks tried by the budget stay out of the shared exercises cache
+    assert len(assistant.exercises_processor.available_exercises_cache) == exercises_cache_size
+
+
+@pytest.mark.integration
+def test_nearest_avatar_examples_replace_the_template_examples(monkeypatch):
+    calls = []
+
+    class RecordingChain:
+        def invoke(self, inputs):
+            calls.append(inputs)
+            return AIMessage(content=make_week_plan(assistant.train_week.week))
+
+    monkeypatch.setattr(TrainAssistant, "_TrainAssistant__init_chain", lambda self, *args: RecordingChain())
+    base = Path(__file__).resolve().parents[2]
+    train_assistant_cfg = OmegaConf.load(base / "configs" / "train_assistant_config.yaml")
+    data_processing_cfg = OmegaConf.load(base / "configs" / "data_processing_config.yaml")
+    exercises_cfg = OmegaConf.load(base / "configs" / "exercises_config.yaml")
+    avatar_index = AvatarIndex.from_dir(
+        str(base / "data" / "user_data" / "avatars_user_data"),
+        data_processing_cfg["user_data_processing"],
+        train_assistant_cfg["avatar_selection"]
+    )
+    user_data = json.load(open(base / "data" / "user_data" / "user_data_external_1.json", encoding="utf-8"))
+    raw_df = pd.read_csv(base / "data" / "exercises" / "sculpd_exercise_processed.csv", keep_default_na=False)
+
+    assistant = TrainAssistant(
+        API_KEY="test",
+        train_assistant_config=train_assistant_cfg,
+        data_processing_config=data_processing_cfg,
+        age_based_adjustments_config=OmegaConf.load(base / "configs" / "age_based_adjustments_config.yaml"),
+        exercises_config=exercises_cfg,
+        feedback_config=OmegaConf.load(base / "configs" / "feedback_config.yaml"),
+        raw_user_data=copy.deepcopy(user_data),
+        raw_scanner_data=None,
+        train_weeks_templates=json.load(open(base / "configs" / "week_templates.json", encoding="utf-8")),
+        exercises_processor=ExercisesProcessor(raw_df, exercises_cfg["exercises_processor"]),
+        training_program_examples_dir=str(base / "configs" / "training_program_examples"),
+        avatar_index=avatar_index
+    )
+    assistant.generate_next_week("normal", {"day 1": {"day_type": "REST_DAY"}})
+
+    selected = avatar_index.select(user_data)
+    assert list(assistant.selected_avatars) == selected
+    [inputs] = calls
+    expected = "\n\n".join(
+        (base / "configs" / "training_program_examples" / f"{name}.txt").read_text(encoding="utf-8").strip()
+        for name in selected
+    )
+    assert inputs["avatars_examples"] == expected
+    assert len(expected) < len(assistant.avatar_examples)
+    assert assistant.get_request_inputs("next_week", "normal", {})["avatar_examples"] == selected
+
+
+@pytest.mark.integration
+def test_avatar_examples_without_a_profile_are_kept(assistant):
+    base = Path(__file__).resolve().parents[2]
+    assistant.prompt_assets_snapshot = PromptAssets(str(base / "configs" / "training_program_examples"), None).snapshot()
+    profiles_dir = base / "data" / "user_data" / "avatars_user_data"
+    avatar_profiles = {
+        f"avatar{number}": json.load(open(profiles_dir / f"user_data_avatar_{number}.json", encoding="utf-8"))
+        for number in (1, 2, 3)
+    }
+    config = OmegaConf.load(base / "configs" / "train_assistant_config.yaml")["avatar_selection"]
+    config.k = 1
+    data_processing_cfg = OmegaConf.load(base / "configs" / "data_processing_config.yaml")
+    assistant.avatar_index = AvatarIndex(avatar_profiles, data_processing_cfg["user_data_processing"], config)
+    user_data = json.load(open(profiles_dir / "user_data_avatar_2.json", encoding="utf-8"))
+
+    selected = list(assistant._TrainAssistant__select_avatars(user_data))
+
+    # the nearest profiled example, then the seven examples that cannot be ranked
+    assert selected[0] == "avatar2"
+    assert set(selected[1:]) == {f"avatar{number}" for number in range(4, 11)}
@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+from omegaconf import OmegaConf
+
+from src.training_plan.admission import AdmissionController, AdmissionRejected
+from src.training_plan.token_counter import TokenCounter
+
+
+def make_controller(requests_per_minute=600, tokens_per_minute=60000, queue_timeout=5.0):
+    config = OmegaConf.create({
+        "requests_per_minute": requests_per_minute,
+        "tokens_per_minute": tokens_per_minute,
+        "completion_tokens": 100,
+        "lanes": {
+            "first_week": {"priority": 0, "queue_timeout": queue_timeout},
+            "next_week": {"priority": 1, "queue_timeout": queue_timeout},
+        },
+        "wait_buckets": [0.01, 0.1, 1],
+    })
+    return AdmissionController(config, TokenCounter(None, chars_per_token=4.0))
+
+
+def test_token_counter_estimate_without_encoding():
+    counter = TokenCounter(None, chars_per_token=4.0)
+
+    assert counter.count("") == 0
+    assert counter.count("a" * 40) == 11
+    assert not counter.exact
+    assert counter.method == "estimate:4.0"
+
+
+def test_calls_within_budget_are_admitted_at_once():
+    controller = make_controller()
+
+    for _ in range(3):
+        controller.acquire("first_week", 1000)
+
+    stats = controller.stats()
+    assert stats["admitted"]["first_week"] == 3
+    assert stats["wait_seconds"]["first_week"]["buckets"]["0.01"] == 3
+
+
+def test_higher_priority_lane_is_served_first():
+    # 10 requests/s, the burst of 600 requests is spent first
+    controller = make_controller(requests_per_minute=600)
+    controller.requests.tokens = 0
+    order = []
+
+    async def call(lane):
+        await controller.aacquire(lane, 10)
+        order.append(lane)
+
+    async def scenario():
+        await asyncio.gather(call("next_week"), call("next_week"), call("first_week"))
+
+    asyncio.run(scenario())
+    assert order == ["first_week", "next_week", "next_week"]
+
+
+def test_call_over_queue_timeout_is_rejected_with_retry_after():
+    controller = make_controller(tokens_per_minute=6000, queue_timeout=0.05)
+    controller.tokens.tokens = 0
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.acquire("next_week", 3000)
+
+    # 3000 tokens at 100 tokens/s
+    assert rejected.value.retry_after == 30
+    stats = controller.stats()
+    assert stats["rejected"]["next_week"] == 1 and stats["queue_depth"]["next_week"] == 0
+
+
+def test_unknown_lane_is_an_error():
+    with pytest.raises(ValueError):
+        make_controller().acquire("unknown", 1)
+
+
+def test_try_acquire_admits_only_without_waiting():
+    controller = make_controller(tokens_per_minute=6000)
+
+    assert controller.try_acquire("next_week", 3000)
+    assert not controller.try_acquire("next_week", 6000)
+    assert controller.stats()["admitted"]["next_week"] == 1 and controller.stats()["queue_depth"]["next_week"] == 0
+
+
+def test_prompt_estimates_are_not_cached():
+    controller = make_controller()
+
+    assert controller.estimate_tokens("a" * 40) == 11 + 100
+    assert controller.token_counter.stats()["size"] == 0
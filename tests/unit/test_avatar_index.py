@@ -0,0 +1,63 @@
+import json
+from pathlib import Path
+
+import pytest
+from omegaconf import OmegaConf
+
+from src.training_plan.avatar_index import AvatarIndex
+
+
+BASE = Path(__file__).resolve().parents[2]
+AVATARS_DIR = BASE / "data" / "user_data" / "avatars_user_data"
+
+
+def make_index(k=3):
+    config = OmegaConf.load(BASE / "configs" / "train_assistant_config.yaml")["avatar_selection"]
+    config.k = k
+    user_data_processing_config = OmegaConf.load(BASE / "configs" / "data_processing_config.yaml")["user_data_processing"]
+    return AvatarIndex.from_dir(str(AVATARS_DIR), user_data_processing_config, config)
+
+
+def load_user_data(path):
+    return json.load(open(path, encoding="utf-8"))
+
+
+def test_profiles_are_matched_to_avatar_examples():
+    index = make_index()
+
+    assert sorted(index.names) == sorted(f"avatar{number}" for number in range(1, 11))
+    assert index.features.shape[0] == 10
+    assert {"chest", "back", "glutes"} <= set(index.body_parts)
+
+
+def test_avatar_profile_is_its_own_nearest_example():
+    index = make_index()
+
+    for number in (1, 4, 7):
+        raw_user_data = load_user_data(AVATARS_DIR / f"user_data_avatar_{number}.json")
+        assert index.rank(raw_user_data)[0] == f"avatar{number}"
+
+
+def test_k_nearest_examples_are_selected_deterministically():
+    index = make_index(k=2)
+    raw_user_data = load_user_data(BASE / "data" / "user_data" / "user_data_external_1.json")
+
+    selected = index.select(raw_user_data)
+
+    assert len(selected) == 2
+    assert selected == index.select(raw_user_data)
+    assert selected == index.rank(raw_user_data)[:2]
+    assert index.select(raw_user_data, k=4)[:2] == selected
+    # legs and glutes: the glutes and hamstrings avatars come first
+    assert set(selected) <= {"avatar2", "avatar3"}
+    # the raw user data is not modified
+    assert raw_user_data == load_user_data(BASE / "data" / "user_data" / "user_data_external_1.json")
+
+
+def test_missing_profiles_fail_the_index(tmp_path):
+    config = OmegaConf.load(BASE / "configs" / "train_assistant_config.yaml")["avatar_selection"]
+    user_data_processing_config = OmegaConf.load(BASE / "configs" / "data_processing_config.yaml")["user_data_processing"]
+
+    for avatars_user_data_dir in (None, str(tmp_path / "missing"), str(tmp_path)):
+        with pytest.raises(ValueError):
+            AvatarIndex.from_dir(avatars_user_data_dir, user_data_processing_config, config)
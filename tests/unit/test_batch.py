@@ -0,0 +1,70 @@
+import json
+import asyncio
+
+import pytest
+
+from src.api.batch import read_items, run_batch, run_batch_file
+from src.api.endpoints import BatchItem
+
+
+def test_run_batch_bounds_concurrency():
+    running = 0
+    peak = 0
+
+    async def execute(item):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01 * (item % 3))
+        running -= 1
+        return {"id": item, "status": "ok"}
+
+    async def collect():
+        return [result async for result in run_batch(range(10), execute, concurrency=3)]
+
+    results = asyncio.run(collect())
+    assert sorted(result["id"] for result in results) == list(range(10))
+    assert peak == 3
+    assert all("queued" in result["timings"] for result in results)
+
+
+def test_run_batch_file_resumes_after_crash(tmp_path):
+    input_path = tmp_path / "items.jsonl"
+    output_path = tmp_path / "results.jsonl"
+    input_path.write_text("\n".join(json.dumps({"id": str(i)}) for i in range(4)) + "\n", encoding="utf-8")
+    # item 0 completed, item 1 failed, item 2 was cut in the middle of its write
+    output_path.write_text(
+        '{"id": "0", "status": "ok"}\n{"id": "1", "status": "error"}\n{"id": "2", "sta', encoding="utf-8"
+    )
+    executed = []
+
+    async def execute(item):
+        executed.append(item["id"])
+        return {"id": item["id"], "status": "ok"}
+
+    counts = asyncio.run(run_batch_file(str(input_path), str(output_path), execute, concurrency=2))
+
+    assert sorted(executed) == ["1", "2", "3"]
+    assert counts == {"skipped": 1, "ok": 3, "error": 0}
+    results = [json.loads(line) for line in output_path.read_text(encoding="utf-8").splitlines()]
+    assert [result["id"] for result in results[:2]] == ["0", "1"]
+    assert sorted(result["id"] for result in results[2:]) == ["1", "2", "3"]
+
+
+def test_run_batch_propagates_execute_failure():
+    async def execute(item):
+        raise RuntimeError("boom")
+
+    async def collect():
+        return [result async for result in run_batch([1], execute, concurrency=1)]
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(collect())
+
+
+def test_item_ids_are_strings_defaulting_to_the_position(tmp_path):
+    input_path = tmp_path / "items.jsonl"
+    input_path.write_text('{"id": 7}\n\n{"mode": "first_week"}\n{"id": "x"}\n', encoding="utf-8")
+
+    assert [item["id"] for item in read_items(str(input_path), completed={"x"})] == ["7", "1"]
+    assert BatchItem.model_validate({"id": 7, "mode": "first_week"}).id == "7"
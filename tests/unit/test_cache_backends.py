@@ -0,0 +1,75 @@
+import time
+
+from src.lru_cache import LRUCache
+from src.cache_backends import MemoryCacheBackend, SQLiteCacheBackend
+
+
+def test_lru_cache_entries_expire_after_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    cache = LRUCache(maxsize=2, ttl=10)
+    cache.put("a", 1)
+
+    now[0] += 5
+    assert cache.get("a") == 1
+    now[0] += 6
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_memory_backend_round_trip():
+    backend = MemoryCacheBackend(maxsize=1, ttl=None)
+    backend.set("a", "1")
+    backend.set("b", "2")
+
+    assert backend.get("a") is None
+    assert backend.get("b") == "2"
+    assert backend.stats()["size"] == 1
+
+
+def test_sqlite_backend_is_shared_and_evicts_least_recently_read(tmp_path):
+    path = str(tmp_path / "cache" / "plans.sqlite3")
+    writer = SQLiteCacheBackend(path, maxsize=2, ttl=None, table="plan_cache")
+    reader = SQLiteCacheBackend(path, maxsize=2, ttl=None, table="plan_cache")
+
+    writer.set("a", "1")
+    writer.set("b", "2")
+    assert reader.get("a") == "1"
+    writer.set("c", "3")
+
+    assert reader.get("b") is None
+    assert reader.get("a") == "1" and reader.get("c") == "3"
+    assert writer.stats()["size"] == 2
+
+
+def test_sqlite_backend_ttl(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    backend = SQLiteCacheBackend(str(tmp_path / "plans.sqlite3"), maxsize=10, ttl=60)
+    backend.set("a", "1")
+
+    now[0] += 59
+    assert backend.get("a") == "1"
+    now[0] += 2
+    assert backend.get("a") is None
+
+
+def test_add_sets_only_absent_keys(tmp_path):
+    for backend in [MemoryCacheBackend(maxsize=4, ttl=None), SQLiteCacheBackend(str(tmp_path / "a.sqlite3"), 4, None)]:
+        assert backend.add("a", "1")
+        assert not backend.add("a", "2")
+        assert backend.get("a") == "1"
+        backend.delete("a")
+        assert backend.add("a", "3")
+
+
+def test_replace_and_delete_compare_the_current_value(tmp_path):
+    for backend in [MemoryCacheBackend(maxsize=4, ttl=None), SQLiteCacheBackend(str(tmp_path / "a.sqlite3"), 4, None)]:
+        backend.set("a", "1")
+        assert backend.replace("a", "1", "2")
+        assert not backend.replace("a", "1", "3")
+        assert not backend.replace("missing", "1", "3")
+        backend.delete("a", "1")
+        assert backend.get("a") == "2"
+        backend.delete("a", "2")
+        assert backend.get("a") is None
@@ -0,0 +1,50 @@
+import pandas as pd
+from pathlib import Path
+from omegaconf import OmegaConf
+
+from src.exercises.exercises_processor import ExercisesProcessor
+from src.exercises.exercises_snapshot import load_exercises_processor, read_snapshot_checksum
+from src.training_plan.utils import get_exercises_processor
+
+
+ROOT = Path(__file__).resolve().parents[2]
+SOURCE_PATH = ROOT / "data" / "exercises" / "sculpd_exercise_processed.csv"
+
+
+def test_snapshot_roundtrip_matches_parsed_catalog(tmp_path):
+    cfg = OmegaConf.load(ROOT / "configs" / "exercises_config.yaml")["exercises_processor"]
+    snapshot_path = str(tmp_path / "catalog.npz")
+
+    built = load_exercises_processor(str(SOURCE_PATH), snapshot_path, cfg)
+    loaded = load_exercises_processor(str(SOURCE_PATH), snapshot_path, cfg)
+    parsed = ExercisesProcessor(pd.read_csv(SOURCE_PATH, keep_default_na=False), cfg)
+
+    pd.testing.assert_frame_equal(loaded.processed_df, parsed.processed_df)
+    assert loaded.catalog_checksum == built.catalog_checksum == read_snapshot_checksum(snapshot_path)
+
+
+def test_snapshot_rebuilt_when_source_changes(tmp_path):
+    cfg = OmegaConf.load(ROOT / "configs" / "exercises_config.yaml")["exercises_processor"]
+    source_path = tmp_path / "catalog.csv"
+    snapshot_path = str(tmp_path / "catalog.npz")
+
+    raw_df = pd.read_csv(SOURCE_PATH, keep_default_na=False)
+    raw_df.head(20).to_csv(source_path, index=False)
+    first = load_exercises_processor(str(source_path), snapshot_path, cfg)
+
+    raw_df.head(30).to_csv(source_path, index=False)
+    second = load_exercises_processor(str(source_path), snapshot_path, cfg)
+
+    assert first.catalog_checksum != second.catalog_checksum
+    assert second.processed_df.shape[0] == 30
+    assert read_snapshot_checksum(snapshot_path) == second.catalog_checksum
+
+
+def test_gradio_path_shares_the_catalog(tmp_path):
+    snapshot_path = str(tmp_path / "catalog.npz")
+    config_path = str(ROOT / "configs" / "exercises_config.yaml")
+
+    first = get_exercises_processor(str(SOURCE_PATH), snapshot_path, config_path)
+
+    assert get_exercises_processor(str(SOURCE_PATH), snapshot_path, config_path) is first
+    assert read_snapshot_checksum(snapshot_path) == first.catalog_checksum
@@ -4,7 +4,9 @@ from omegaconf import OmegaConf
 
 from src.user_data.user_data_processor import UserDataProcessor
 from src.user_data.user_data_formatter import UserDataFormatter
+from src.exercises.exercises_filter import ExercisesFilter
 from src.exercises.exercises_formatter import ExercisesFormatter
+from src.exercises.exercises_processor import ExercisesProcessor
 from src.feedback_formatter import FeedbackFormatter
 from src.previous_week_formatter import TrainingWeekFormatter
 from src.scanner_data_formatter import ScannerDataFormatter
@@ -104,4 +106,18 @@ def test_scanner_data_formatter():
     text = formatter.data_format()
     assert "Should not appear" not in text
     assert "Physical Attributes:" in text
-    assert "Training Recommendations:" in text
\ No newline at end of file
+    assert "Training Recommendations:" in text
+
+def test_exercises_formatter_positions_match_dataframe_output():
+    cfg = OmegaConf.load(ROOT / "configs" / "exercises_config.yaml")
+    raw_df = pd.read_csv(ROOT / "data" / "exercises" / "sculpd_exercise_processed.csv", keep_default_na=False)
+    proc = ExercisesProcessor(raw_df, cfg["exercises_processor"])
+    exercises_filter = ExercisesFilter(proc, cfg["exercises_planner"])
+    formatter = ExercisesFormatter(cfg)
+
+    args = (["cable_machine", "dumbbells", "bench", "none"], "intermediate", ["UPPER_BODY", "LOWER_BODY"])
+    by_day_type = exercises_filter.get_available_exercises(*args)
+    positions = exercises_filter.get_available_exercises_positions(*args)
+
+    expected = formatter.data_format(by_day_type)
+    assert formatter.data_format_positions(positions, proc.get_exercise_lines(formatter.columns)) == expected
@@ -0,0 +1,79 @@
+import asyncio
+import json
+
+import pytest
+
+from src.api.idempotency import IdempotencyStore, IdempotencyConflict
+from src.cache_backends import SQLiteCacheBackend
+
+
+def test_retry_in_another_worker_waits_for_the_pending_execution(tmp_path):
+    path = str(tmp_path / "idempotency.sqlite3")
+    first_worker = IdempotencyStore(SQLiteCacheBackend(path, 100, 60), pending_timeout=60, poll_interval=0.01)
+    second_worker = IdempotencyStore(SQLiteCacheBackend(path, 100, 60), pending_timeout=60, poll_interval=0.01)
+    calls = []
+
+    async def generate():
+        calls.append(1)
+        await asyncio.sleep(0.2)
+        return {"plan": {"day 1": {"day_type": "REST_DAY"}}}
+
+    async def main():
+        first = asyncio.create_task(first_worker.run("key", "fingerprint", generate))
+        await asyncio.sleep(0.05)
+        retry = await second_worker.run("key", "fingerprint", generate)
+        return await first, retry
+
+    (response, replayed), (retry_response, retry_replayed) = asyncio.run(main())
+    assert response == retry_response
+    assert (replayed, retry_replayed) == (False, True)
+    assert len(calls) == 1
+
+
+def test_failed_execution_is_not_stored_and_payload_is_checked(tmp_path):
+    store = IdempotencyStore(SQLiteCacheBackend(str(tmp_path / "idempotency.sqlite3"), 100, 60), 60, 0.01)
+
+    async def fail():
+        raise ValueError("LLM error")
+
+    async def generate():
+        return {"plan": {}}
+
+    async def main():
+        with pytest.raises(ValueError):
+            await store.run("key", "fingerprint", fail)
+        assert await store.run("key", "fingerprint", generate) == ({"plan": {}}, False)
+        with pytest.raises(IdempotencyConflict):
+            await store.run("key", "other fingerprint", generate)
+
+    asyncio.run(main())
+    assert store.stats()["conflicts"] == 1
+
+
+def test_abandoned_pending_record_is_reclaimed_by_one_worker(tmp_path, monkeypatch):
+    path = str(tmp_path / "idempotency.sqlite3")
+    workers = [IdempotencyStore(SQLiteCacheBackend(path, 100, 60), pending_timeout=1, poll_interval=0.01) for _ in range(2)]
+    workers[0].backend.set("key", json.dumps({"status": "pending", "fingerprint": "fingerprint", "started_at": 0}))
+    abandoned = workers[0].backend.get("key")
+    calls = []
+
+    async def generate():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return {"plan": {}}
+
+    async def main():
+        # both workers read the abandoned record before either reclaims it
+        return await asyncio.gather(*(worker.run("key", "fingerprint", generate) for worker in workers))
+
+    original_get = SQLiteCacheBackend.get
+    reads = []
+
+    def get(self, key):
+        reads.append(key)
+        return abandoned if len(reads) <= 2 else original_get(self, key)
+
+    monkeypatch.setattr(SQLiteCacheBackend, "get", get)
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert sorted(replayed for _, replayed in results) == [False, True]
@@ -0,0 +1,137 @@
+import hmac
+import json
+import asyncio
+import hashlib
+
+import httpx
+import pytest
+from omegaconf import OmegaConf
+
+from src.api.jobs import JobQueue, JobStore
+
+
+def make_config(**overrides):
+    return OmegaConf.create({
+        "workers": 2,
+        "drain_timeout": 0.05,
+        "heartbeat_interval": 30,
+        "stale_timeout": 900,
+        "webhook": {"timeout": 1, "max_attempts": 2, "backoff": 0.0, "allowed_hosts": ["client.test"]},
+        **overrides,
+    })
+
+
+def test_job_store_claims_once_and_survives_reopening(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    store = JobStore(path, ttl=None)
+    job_id = store.create({"mode": "first_week"}, None)
+
+    assert store.claim(job_id) and not store.claim(job_id)
+    store.close()
+
+    reopened = JobStore(path, ttl=None)
+    assert reopened.get(job_id)["status"] == "running"
+    # a job left running by a killed worker is queued again once stale
+    assert reopened.get_queued_ids(stale_timeout=0) == [job_id]
+
+
+def test_job_is_executed_and_delivered_to_callback(tmp_path):
+    delivered = []
+
+    def handler(request):
+        timestamp = request.headers["X-Webhook-Timestamp"]
+        digest = hmac.new(b"secret", timestamp.encode() + b"." + request.content, hashlib.sha256).hexdigest()
+        assert request.headers["X-Webhook-Signature"] == f"sha256={digest}"
+        delivered.append(json.loads(request.content))
+        return httpx.Response(503 if len(delivered) == 1 else 200)
+
+    async def scenario():
+        http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        queue = JobQueue(
+            JobStore(str(tmp_path / "jobs.sqlite3"), ttl=60), make_config(), http_client=http_client, webhook_secret="secret"
+        )
+        queue.start(lambda job_id, payload: asyncio.sleep(0, result={"id": job_id, "status": "ok", "plan": payload}))
+
+        submitted = await queue.submit({"mode": "first_week"}, "http://client.test/done")
+        while (job := await queue.get(submitted["job_id"]))["webhook_status"] is None:
+            await asyncio.sleep(0.01)
+        await queue.drain()
+        return job, queue.stats()
+
+    job, stats = asyncio.run(scenario())
+
+    assert job["status"] == "succeeded" and job["result"]["plan"] == {"mode": "first_week"}
+    assert job["webhook_status"] == "delivered"
+    assert len(delivered) == 2 and delivered[-1]["status"] == "succeeded"
+    assert stats["succeeded"] == 1 and stats["webhooks_delivered"] == 1
+
+
+def test_drain_requeues_interrupted_jobs_and_rejects_new_ones(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+
+    async def scenario():
+        started = asyncio.Event()
+
+        async def slow(job_id, payload):
+            started.set()
+            await asyncio.sleep(10)
+
+        queue = JobQueue(JobStore(path, ttl=None), make_config(), http_client=httpx.AsyncClient())
+        queue.start(slow)
+        submitted = await queue.submit({"mode": "first_week"})
+        await started.wait()
+        await queue.drain()
+
+        try:
+            await queue.submit({"mode": "first_week"})
+            rejected = False
+        except Exception:
+            rejected = True
+        return submitted["job_id"], rejected, queue.stats()
+
+    job_id, rejected, stats = asyncio.run(scenario())
+
+    assert rejected and stats["requeued"] == 1
+    assert JobStore(path, ttl=None).get_queued_ids(stale_timeout=900) == [job_id]
+
+
+def test_callback_urls_need_a_secret_and_a_public_or_allowed_host(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"), ttl=None)
+    any_host = make_config(webhook={"timeout": 1, "max_attempts": 1, "backoff": 0.0, "allowed_hosts": []})
+
+    with pytest.raises(ValueError, match="secret"):
+        JobQueue(store, make_config()).validate_callback_url("http://client.test/done")
+
+    allowed = JobQueue(store, make_config(), webhook_secret="secret")
+    allowed.validate_callback_url("http://client.test/done")
+    with pytest.raises(ValueError, match="not allowed"):
+        allowed.validate_callback_url("http://127.0.0.1/done")
+
+    public_only = JobQueue(store, any_host, webhook_secret="secret")
+    public_only.validate_callback_url("http://93.184.216.34/done")
+    for url in ("http://127.0.0.1/", "http://localhost:8000/", "http://10.0.0.5/", "http://169.254.169.254/", "http://[::1]/"):
+        with pytest.raises(ValueError):
+            public_only.validate_callback_url(url)
+
+
+def test_running_job_heartbeat_keeps_it_from_being_taken_over(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+
+    async def scenario():
+        started = asyncio.Event()
+
+        async def slow(job_id, payload):
+            started.set()
+            await asyncio.sleep(10)
+
+        queue = JobQueue(JobStore(path, ttl=None), make_config(heartbeat_interval=0.02, stale_timeout=0.1), http_client=httpx.AsyncClient())
+        queue.start(slow)
+        await queue.submit({"mode": "first_week"})
+        await started.wait()
+        await asyncio.sleep(0.3)
+        # another process starting on the same store
+        taken_over = await asyncio.to_thread(JobStore(path, ttl=None).get_queued_ids, 0.1)
+        await queue.drain()
+        return taken_over
+
+    assert asyncio.run(scenario()) == []
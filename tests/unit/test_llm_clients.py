@@ -0,0 +1,39 @@
+from pathlib import Path
+
+from omegaconf import OmegaConf
+
+from src.training_plan.llm_clients import LLMClientRegistry
+
+
+ROOT = Path(__file__).resolve().parents[2]
+
+
+def test_llm_clients_shared_per_model_and_temperature():
+    cfg = OmegaConf.load(ROOT / "configs" / "train_assistant_config.yaml")
+    registry = LLMClientRegistry("test", cfg["llm_clients"], resilience=True)
+
+    o1_client = registry.get("o1-mini", 0.7)
+    assert registry.get("o1-mini", 0.2) is o1_client
+    assert o1_client.temperature is None
+    assert o1_client.http_client is registry.http_client
+    # retries are left to the resilience policy
+    assert o1_client.max_retries == 0
+    assert LLMClientRegistry("test", cfg["llm_clients"]).get("o1-mini").max_retries == 2
+    assert cfg["llm_clients"]["timeout"] <= cfg["llm_resilience"]["attempt_timeout"]
+
+    gpt_client = registry.get("gpt4o", 0.7)
+    assert gpt_client is not o1_client
+    assert gpt_client.temperature == 0.7
+
+    metrics = registry.pool_metrics()
+    assert metrics["clients"] == 2
+    assert metrics["sync"] == {"open_connections": 0, "active_connections": 0, "idle_connections": 0, "waiters": 0}
+
+
+def test_pool_metrics_without_pool_internals():
+    cfg = OmegaConf.load(ROOT / "configs" / "train_assistant_config.yaml")
+    registry = LLMClientRegistry("test", cfg["llm_clients"])
+    del registry.transport._pool
+
+    metrics = registry.pool_metrics()
+    assert metrics["sync"] == {} and "waiters" in metrics["async"]
@@ -0,0 +1,195 @@
+import json
+import time
+import asyncio
+
+import pytest
+from omegaconf import OmegaConf
+
+from src.training_plan.llm_resilience import LLMResilience, CircuitBreaker, CircuitOpenError, AttemptTimeoutError
+
+
+PLAN = json.dumps({"day 1": {"day_type": "REST_DAY"}})
+
+
+def make_resilience(**overrides) -> LLMResilience:
+    config = {
+        "attempt_timeout": 1.0,
+        "max_retries": 2,
+        "backoff_base": 0.01,
+        "backoff_max": 0.02,
+        "sync_workers": 4,
+        "hedging": {"enabled": False, "percentile": 95, "min_samples": 20, "initial_delay": 0.1, "model": None},
+        "circuit_breaker": {"failure_threshold": 5, "recovery_timeout": 30},
+    }
+    for name, value in overrides.items():
+        section, _, key = name.partition("__")
+        if key:
+            config[section][key] = value
+        else:
+            config[section] = value
+    return LLMResilience(OmegaConf.create(config))
+
+
+def validate(result: str) -> None:
+    json.loads(result)
+
+
+def test_retries_transient_errors():
+    resilience = make_resilience()
+    calls = []
+
+    def flaky(inputs):
+        calls.append(inputs)
+        if len(calls) < 3:
+            raise ConnectionError("reset")
+        return PLAN
+
+    assert resilience.call("model", flaky, None, {"x": 1}, validate) == PLAN
+    stats = resilience.stats()
+    assert len(calls) == 3
+    assert stats["retries"] == 2 and stats["errors"] == 2
+    assert stats["circuit_breaker"] == "closed"
+
+
+def test_invalid_result_is_retried_and_last_error_raised():
+    resilience = make_resilience(max_retries=1)
+
+    with pytest.raises(ValueError):
+        resilience.call("model", lambda inputs: "not json", None, {}, validate)
+    assert resilience.stats()["invalid_results"] == 2
+
+
+def test_async_attempt_timeout():
+    resilience = make_resilience(attempt_timeout=0.05, max_retries=0)
+
+    async def slow(inputs):
+        await asyncio.sleep(1)
+        return PLAN
+
+    with pytest.raises(AttemptTimeoutError):
+        asyncio.run(resilience.acall("model", slow, None, {}, validate))
+    assert resilience.stats()["timeouts"] == 1
+
+
+def test_async_hedge_wins_over_slow_primary():
+    resilience = make_resilience(hedging__enabled=True, hedging__initial_delay=0.05)
+
+    async def slow(inputs):
+        await asyncio.sleep(0.5)
+        return PLAN
+
+    async def fast(inputs):
+        return PLAN
+
+    started = time.perf_counter()
+    assert asyncio.run(resilience.acall("model", slow, fast, {}, validate)) == PLAN
+    assert time.perf_counter() - started < 0.3
+    stats = resilience.stats()
+    assert stats["hedges"] == 1 and stats["hedge_wins"] == 1
+
+
+def test_sync_hedge_not_started_for_fast_primary():
+    resilience = make_resilience(hedging__enabled=True, hedging__initial_delay=0.5)
+
+    assert resilience.call("model", lambda inputs: PLAN, lambda inputs: PLAN, {}, validate) == PLAN
+    assert resilience.stats()["hedges"] == 0
+
+
+def test_every_attempt_is_admitted_and_unadmitted_hedges_are_skipped():
+    resilience = make_resilience(hedging__enabled=True, hedging__initial_delay=0.02)
+    admitted = []
+    calls = []
+
+    async def admit():
+        admitted.append(len(calls))
+
+    async def flaky(inputs):
+        calls.append(inputs)
+        if len(calls) < 2:
+            raise ConnectionError("reset")
+        await asyncio.sleep(0.1)
+        return PLAN
+
+    async def hedge(inputs):
+        return PLAN
+
+    result = asyncio.run(resilience.acall("model", flaky, hedge, {}, validate, admit, lambda: False))
+
+    assert result == PLAN
+    assert admitted == [0, 1]
+    stats = resilience.stats()
+    assert stats["hedges"] == 0 and stats["hedges_not_admitted"] == 2
+
+
+def test_hedge_delay_follows_latency_percentile():
+    resilience = make_resilience(hedging__min_samples=3, hedging__percentile=50)
+
+    for _ in range(3):
+        resilience.call("model", lambda inputs: PLAN, None, {}, validate)
+
+    assert resilience.get_hedge_delay("model") < 0.1
+    assert resilience.get_hedge_delay("other") == 0.1
+
+
+def test_circuit_breaker_opens_and_recovers():
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=0.05)
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_failure()
+
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    time.sleep(0.06)
+    breaker.before_call()
+    # one trial call at a time while half-open
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_open_breaker_fails_fast_without_retries():
+    resilience = make_resilience(max_retries=5, circuit_breaker__failure_threshold=1)
+    calls = []
+
+    def failing(inputs):
+        calls.append(inputs)
+        raise ConnectionError("down")
+
+    with pytest.raises(CircuitOpenError):
+        resilience.call("model", failing, None, {}, validate)
+    assert len(calls) == 1
+    assert resilience.stats()["short_circuited"] == 1
+
+
+def test_cancelled_half_open_trial_releases_the_breaker():
+    resilience = make_resilience(circuit_breaker__failure_threshold=1, circuit_breaker__recovery_timeout=0.05)
+    resilience.breaker.record_failure()
+    time.sleep(0.06)
+
+    async def hanging(inputs):
+        await asyncio.sleep(10)
+
+    async def working(inputs):
+        return PLAN
+
+    async def main():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(resilience.acall("model", hanging, None, {}, validate), timeout=0.05)
+        return await resilience.acall("model", working, None, {}, validate)
+
+    assert asyncio.run(main()) == PLAN
+    assert resilience.breaker.state == "closed"
+
+
+def test_stale_half_open_trial_lets_another_call_through():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.before_call()
+
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    time.sleep(0.06)
+    assert breaker.before_call()
@@ -0,0 +1,35 @@
+import pandas as pd
+from pathlib import Path
+from omegaconf import OmegaConf
+
+from src.lru_cache import LRUCache
+from src.exercises.exercises_processor import ExercisesProcessor
+
+
+ROOT = Path(__file__).resolve().parents[2]
+
+
+def test_lru_cache_eviction_and_counters():
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    stats = cache.stats()
+    assert stats["size"] == 2
+    assert stats["hits"] == 2 and stats["misses"] == 1
+
+
+def test_exercises_cache_invalidated_on_catalog_reload():
+    cfg = OmegaConf.load(ROOT / "configs" / "exercises_config.yaml")
+    raw_df = pd.read_csv(ROOT / "data" / "exercises" / "sculpd_exercise_processed.csv", keep_default_na=False)
+    proc = ExercisesProcessor(raw_df, cfg["exercises_processor"])
+
+    proc.available_exercises_cache.put(("barbell",), "formatted")
+    proc.load(raw_df.head(10))
+
+    assert len(proc.available_exercises_cache) == 0
+    assert proc.processed_df.shape[0] == 10
@@ -0,0 +1,42 @@
+import pytest
+
+from src.metrics import Histogram, StageTimers, format_prometheus
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram([0.1, 1])
+    for value in (0.05, 0.5, 0.7, 3):
+        histogram.observe(value)
+
+    assert histogram.snapshot() == {"buckets": {"0.1": 1, "1.0": 3, "+Inf": 4}, "count": 4, "sum": 4.25}
+
+
+def test_stage_timers_label_outcome():
+    timers = StageTimers([1])
+    with timers.time("exercises_filter", "/generate_first_week"):
+        pass
+    with pytest.raises(ValueError):
+        with timers.time("llm_call", "/generate_first_week", "gpt-4o"):
+            raise ValueError
+
+    labels = [labels for labels, _ in timers.collect()]
+    assert {"stage": "exercises_filter", "endpoint": "/generate_first_week", "model": "none", "outcome": "ok"} in labels
+    assert {"stage": "llm_call", "endpoint": "/generate_first_week", "model": "gpt-4o", "outcome": "error"} in labels
+
+
+def test_prometheus_exposition():
+    text = format_prometheus({"plan cache": {"hits": 2, "backend": "memory", "enabled": True}})
+
+    assert text == "sculpd_plan_cache_hits 2.0\nsculpd_plan_cache_enabled 1.0\n"
+
+
+def test_prometheus_exposes_stages_once():
+    timers = StageTimers([1])
+    with timers.time("exercises_filter", "/generate_first_week"):
+        pass
+
+    text = format_prometheus({"stages": timers.stats(), "jobs": {"queued": 0}}, timers)
+
+    assert "sculpd_stages" not in text
+    assert "sculpd_jobs_queued 0.0" in text
+    assert 'sculpd_stage_duration_seconds_count{stage="exercises_filter"' in text
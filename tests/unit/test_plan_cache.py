@@ -0,0 +1,28 @@
+import json
+
+from src.cache_backends import MemoryCacheBackend
+from src.training_plan.plan_cache import PlanCache
+
+
+def test_plan_cache_key_is_canonical():
+    cache = PlanCache(MemoryCacheBackend(maxsize=8, ttl=None), version="v1")
+
+    key = cache.make_key("first_week", {"user_data": "Age: 30", "feedback": None})
+    assert key == cache.make_key("first_week", {"feedback": None, "user_data": "Age: 30"})
+    assert key != cache.make_key("next_week", {"user_data": "Age: 30", "feedback": None})
+    assert key != PlanCache(cache.backend, version="v2").make_key("first_week", {"user_data": "Age: 30", "feedback": None})
+
+
+def test_plan_cache_stats():
+    cache = PlanCache(MemoryCacheBackend(maxsize=8, ttl=None), version="v1")
+    plan = json.dumps({"day 1": {"day_type": "REST_DAY"}})
+
+    assert cache.get("key") is None
+    cache.put("key", plan, generation_seconds=12.5)
+    assert cache.get("key") == plan
+
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+    assert stats["hit_ratio"] == 0.5
+    assert stats["latency_saved_seconds"] == 12.5
+    assert PlanCache.compute_version({"a": 1, "b": 2}) == PlanCache.compute_version({"b": 2, "a": 1})
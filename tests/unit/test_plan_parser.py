@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from src.training_plan.plan_parser import PlanParser, extract_json_object, parse_plan, repair_json
+from src.training_plan.train_week import TrainWeek
+
+
+def test_strict_json_is_parsed_as_is():
+    assert parse_plan('{"day 1": {"day_type": "REST_DAY"}}') == ({"day 1": {"day_type": "REST_DAY"}}, "strict")
+
+
+def test_object_is_extracted_from_fences_and_prose():
+    text = 'Here is the plan:\n```json\n{"day 1": {"notes": "keep {tempo} slow"}}\n```\nGood luck!'
+
+    assert extract_json_object(text) == '{"day 1": {"notes": "keep {tempo} slow"}}'
+    assert parse_plan(text) == ({"day 1": {"notes": "keep {tempo} slow"}}, "extracted")
+
+
+def test_local_repair_of_common_defects():
+    text = "{'day 1': {'day_type': 'PUSH', 'actual_weight': None, 'rest_time': 90 'notes': 'it\\'s \"fine\"',},}"
+
+    plan, how = parse_plan(text)
+    assert how == "repaired"
+    assert plan == {"day 1": {"day_type": "PUSH", "actual_weight": None, "rest_time": 90, "notes": "it's \"fine\""}}
+
+
+def test_truncated_output_is_closed():
+    text = '{"day 1": {"exercises": {"Bench press": {"sets": 3, "recommended_weight": 1.5e1, "counts": '
+
+    assert json.loads(repair_json(extract_json_object(text))) == {
+        "day 1": {"exercises": {"Bench press": {"sets": 3, "recommended_weight": 15.0, "counts": None}}}
+    }
+
+
+def test_unparseable_output_raises_and_is_counted():
+    parser = PlanParser()
+
+    with pytest.raises(ValueError):
+        parser.parse("I cannot help with that.")
+    parser.parse('{"day 1": {"day_type": "REST_DAY"},}')
+    parser.parse('{"day 1": {"day_type": "REST_DAY"}}')
+
+    stats = parser.stats()
+    assert stats["failed"] == 1 and stats["repaired"] == 1 and stats["strict"] == 1
+    assert stats["regenerations_avoided"] == 1
+
+
+def test_plan_cut_short_fails_the_skeleton_check():
+    skeleton = {
+        "day 1": {"day_type": "PPL_DAY", "exercises": {}, "notes": "", "explanations": "", "rest_time": 0},
+        "day 2": {"day_type": "REST_DAY"},
+    }
+    day = {"exercises": {}, "notes": "", "explanations": "", "rest_time": 60}
+    TrainWeek.check_plan({"day 1": {"day_type": "PULL", **day}, "day 2": {"day_type": "REST_DAY"}}, skeleton)
+
+    plan, how = parse_plan('{"day 1": {"day_type": "PU')
+    assert how == "repaired"
+    missing_fields = {"day 1": {"day_type": "PUSH"}, "day 2": {"day_type": "REST_DAY"}}
+    missing_day = {"day 1": {"day_type": "PUSH", **day}}
+    for invalid in (plan, missing_fields, missing_day):
+        with pytest.raises(ValueError):
+            TrainWeek.check_plan(invalid, skeleton)
+
+    parser = PlanParser()
+    with pytest.raises(ValueError):
+        parser.parse('{"day 1": {"day_type": "PU', lambda parsed: TrainWeek.check_plan(parsed, skeleton))
+    assert parser.stats()["failed"] == 1 and parser.stats()["regenerations_avoided"] == 0
@@ -3,6 +3,7 @@ from pathlib import Path
 from omegaconf import OmegaConf
 
 from src.user_data.user_data_processor import UserDataProcessor
+from src.exercises.exercises_filter import ExercisesFilter
 from src.exercises.exercises_processor import ExercisesProcessor
 
 
@@ -63,4 +64,21 @@ def test_exercises_processor_columns():
     proc = build_exercises_processor()
     assert proc.processed_df.shape[0] == 1
     assert "bodyweight" in proc.get_equipment_columns()
-    assert "beginner" in proc.get_skills_columns()
\ No newline at end of file
+    assert "beginner" in proc.get_skills_columns()
+
+def test_exercises_index_filter_matches_pandas_chain():
+    cfg = OmegaConf.load(ROOT / "configs" / "exercises_config.yaml")
+    raw_df = pd.read_csv(ROOT / "data" / "exercises" / "sculpd_exercise_processed.csv", keep_default_na=False)
+    proc = ExercisesProcessor(raw_df, cfg["exercises_processor"])
+    exercises_filter = ExercisesFilter(proc, cfg["exercises_planner"])
+
+    available_equipment = ["cable_machine", "barbell", "platform", "ez_bar", "none"]
+    day_types = ["PUSH", "PULL", "LEGS"]
+
+    expected = exercises_filter.get_available_exercises_by_equipment(proc.processed_df, available_equipment)
+    expected = exercises_filter.get_available_exercises_by_skill_level(expected, "intermediate")
+    expected = exercises_filter.get_available_exercises_by_day_type(expected, day_types)
+
+    result = exercises_filter.get_available_exercises(available_equipment, "intermediate", day_types)
+    for day_type in day_types:
+        pd.testing.assert_frame_equal(result[day_type], expected[day_type])
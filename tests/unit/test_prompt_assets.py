@@ -0,0 +1,27 @@
+import os
+
+from src.training_plan.prompt_assets import PromptAssets
+
+
+def test_prompt_assets_loaded_once_and_reloaded_on_change(tmp_path):
+    examples_dir = tmp_path / "examples"
+    examples_dir.mkdir()
+    (examples_dir / "avatar1.txt").write_text("first example\n", encoding="utf-8")
+    (examples_dir / "avatar2.txt").write_text("second example", encoding="utf-8")
+    recs_path = tmp_path / "merged_recs.txt"
+    recs_path.write_text("recs v1", encoding="utf-8")
+
+    assets = PromptAssets(str(examples_dir), str(recs_path), check_interval=0)
+    snapshot = assets.snapshot()
+    assert snapshot.avatar_examples == "first example\n\nsecond example"
+    assert snapshot.merged_recs == "recs v1"
+    assert assets.snapshot() is snapshot
+
+    recs_path.write_text("recs v2", encoding="utf-8")
+    stat = os.stat(recs_path)
+    os.utime(recs_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    reloaded = assets.snapshot()
+    assert reloaded.merged_recs == "recs v2"
+    assert reloaded.version == snapshot.version + 1
+    assert snapshot.merged_recs == "recs v1"
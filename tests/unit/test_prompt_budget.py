@@ -0,0 +1,97 @@
+from langchain.prompts.chat import ChatPromptTemplate, HumanMessagePromptTemplate
+
+from src.training_plan.prompt_budget import PromptBudgeter
+from src.training_plan.token_counter import TokenCounter
+
+
+AVATARS = tuple("a" * 400 for _ in range(5))
+MERGED_RECS = "\n".join("r" * 39 for _ in range(50))
+
+
+def make_budgeter(budget, trim_order=("avatars_examples", "merged_recs", "available_exercises")):
+    config = {
+        "budgets": {"first_week": budget},
+        "trim_order": list(trim_order),
+        "min_avatar_examples": 2,
+        "min_merged_recs_tokens": 100,
+        "min_exercises_per_day_type": 2,
+    }
+    return PromptBudgeter(config, TokenCounter(None, chars_per_token=4.0))
+
+
+def make_prompt():
+    template = "Examples: {avatars_examples} Recs: {merged_recs} Exercises: {available_exercises}"
+    prompt = ChatPromptTemplate.from_messages([HumanMessagePromptTemplate.from_template(template)])
+    return prompt.partial(avatars_examples="\n\n".join(AVATARS), merged_recs=MERGED_RECS)
+
+
+def render_exercises(max_per_day_type):
+    return "e" * 40 * (max_per_day_type if max_per_day_type is not None else 20)
+
+
+def test_prompt_within_budget_is_not_changed():
+    inputs = {"available_exercises": render_exercises(None)}
+
+    budgeter = make_budgeter(10000)
+
+    assert budgeter.fit("first_week", make_prompt(), inputs, AVATARS, render_exercises) is inputs
+    # modes without a budget are not trimmed
+    assert budgeter.fit("next_week", make_prompt(), inputs, AVATARS, render_exercises) is inputs
+    assert budgeter.stats() == {"fitted": 2, "trimmed": 0, "over_budget": 0}
+
+
+def test_avatar_examples_are_dropped_first():
+    inputs = {"available_exercises": render_exercises(None)}
+
+    fitted = make_budgeter(1100).fit("first_week", make_prompt(), inputs, AVATARS, render_exercises)
+
+    assert fitted["avatars_examples"] == "\n\n".join(AVATARS[:3])
+    assert "merged_recs" not in fitted
+    assert fitted["available_exercises"] == inputs["available_exercises"]
+
+
+def test_sections_are_trimmed_in_order_down_to_their_minimums():
+    inputs = {"available_exercises": render_exercises(None)}
+    budgeter = make_budgeter(300)
+
+    fitted = budgeter.fit("first_week", make_prompt(), inputs, AVATARS, render_exercises)
+
+    assert fitted["avatars_examples"] == "\n\n".join(AVATARS[:2])
+    # truncated at a line boundary to the minimum
+    assert MERGED_RECS.startswith(fitted["merged_recs"]) and fitted["merged_recs"].endswith("r")
+    assert budgeter.token_counter.count(fitted["merged_recs"]) <= 100
+    assert fitted["available_exercises"] == render_exercises(2)
+    assert budgeter.stats() == {"fitted": 0, "trimmed": 1, "over_budget": 1}
+
+
+def test_exercises_cap_is_the_largest_that_fits():
+    inputs = {"available_exercises": render_exercises(None)}
+    budgeter = make_budgeter(1100, trim_order=["available_exercises"])
+
+    fitted = budgeter.fit("first_week", make_prompt(), inputs, AVATARS, render_exercises)
+
+    prompt_tokens = budgeter.token_counter.count(PromptBudgeter.get_template_text(make_prompt()))
+    sections_tokens = sum(budgeter.token_counter.count(text) for text in ("\n\n".join(AVATARS), MERGED_RECS))
+    assert fitted["available_exercises"] == render_exercises((1100 - prompt_tokens - sections_tokens) // 10)
+
+
+def test_section_sizes_of_every_prompt_are_logged():
+    class RecordingLogger:
+        def __init__(self):
+            self.records = []
+
+        def debug(self, message):
+            self.records.append(("debug", message))
+
+        def info(self, message):
+            self.records.append(("info", message))
+
+    inputs = {"available_exercises": render_exercises(None)}
+    fitting, trimming = make_budgeter(10000), make_budgeter(500)
+    fitting.logger = trimming.logger = logger = RecordingLogger()
+
+    fitting.fit("first_week", make_prompt(), inputs, AVATARS, render_exercises)
+    trimming.fit("first_week", make_prompt(), inputs, AVATARS, render_exercises)
+
+    assert [level for level, _ in logger.records] == ["debug", "info"]
+    assert all("sections {'avatars_examples'" in message for _, message in logger.records)
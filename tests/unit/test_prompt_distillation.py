@@ -0,0 +1,90 @@
+import json
+from pathlib import Path
+
+from src.training_plan.prompt_assets import PromptAssets
+from src.training_plan.prompt_distillation import (
+    PromptDistiller, compress_whitespace, get_checksum, load_variant, run_distillation
+)
+
+
+BASE = Path(__file__).resolve().parents[2]
+RULE = "* Favor machines and cables for joint safety and precision."
+SHARED = "Rest: compounds 90-120 s, isolations 60-90 s, calves about 45 s."
+
+
+def make_distiller():
+    return PromptDistiller({"boilerplate_patterns": ["^AI style:"], "min_rule_chars": 40})
+
+
+def test_whitespace_is_compressed_and_nesting_kept():
+    text = "Title   line  \n\n\n* 2 days:\n        Day 1 \t→  push\n"
+
+    assert compress_whitespace(text) == "Title line\n* 2 days:\n Day 1 → push"
+
+
+def test_rules_are_deduplicated_across_recommendations():
+    avatar_recs = {
+        "avatar_1_recs": f"1. Rest Times\nAI style: generic rest.\n{SHARED}\n{RULE}\n{SHARED}\n{{\n}}",
+        "avatar_2_recs": f"1. Rest Times\n{SHARED}\nOnly the second avatar keeps this long rule line.\n{{\n}}",
+    }
+
+    distilled = make_distiller().distill({"avatar1": "Day 1\nPull — 2×8\nPull — 2×8"}, RULE, avatar_recs)
+
+    # program lines repeated across days are kept
+    assert distilled["avatar1"]["compressed"] == "Day 1\nPull — 2×8\nPull — 2×8"
+    assert distilled["merged_recs"]["compressed"] == RULE
+    # boilerplate, rules of the merged recommendations and shared rules are dropped, short lines are kept
+    assert distilled["avatar_1_recs"]["compressed"] == "1. Rest Times\n{\n}"
+    assert distilled["avatar_2_recs"]["compressed"] == (
+        "1. Rest Times\nOnly the second avatar keeps this long rule line.\n{\n}"
+    )
+    assert distilled["common_recs"]["compressed"] == SHARED
+
+
+def test_artifacts_are_keyed_by_source_checksum(tmp_path):
+    artifacts_dir = tmp_path / "artifacts"
+    stale = artifacts_dir / f"{'0' * 64}.v1.json"
+    artifacts_dir.mkdir()
+    stale.write_text("{}", encoding="utf-8")
+
+    manifest = run_distillation(
+        make_distiller(), str(artifacts_dir), {"avatar1": "Day 1   \n\nPull"}, None, {},
+        summarize=lambda kind, text: f"{kind}: {text[:5]}"
+    )
+
+    assert manifest["avatar1"]["source_checksum"] == get_checksum("Day 1   \n\nPull")
+    assert load_variant(str(artifacts_dir), "Day 1   \n\nPull", "compressed") == "Day 1\nPull"
+    assert load_variant(str(artifacts_dir), "Day 1   \n\nPull", "summarized") == "avatar_example: Day 1"
+    assert load_variant(str(artifacts_dir), "Day 1   \n\nPull", "raw") == "Day 1   \n\nPull"
+    assert load_variant(str(artifacts_dir), "edited source", "compressed") is None
+    assert not stale.exists()
+
+
+def test_prompt_assets_load_the_variant_or_fall_back_to_raw(tmp_path):
+    examples_dir = tmp_path / "examples"
+    examples_dir.mkdir()
+    (examples_dir / "avatar1.txt").write_text("Day 1   \n\nPull\n", encoding="utf-8")
+    recs_path = tmp_path / "merged_recs.txt"
+    recs_path.write_text("not  distilled", encoding="utf-8")
+    artifacts_dir = tmp_path / "artifacts"
+    run_distillation(make_distiller(), str(artifacts_dir), {"avatar1": "Day 1   \n\nPull"}, None, {})
+
+    snapshot = PromptAssets(str(examples_dir), str(recs_path), artifacts_dir=str(artifacts_dir), variant="compressed").snapshot()
+    raw_snapshot = PromptAssets(str(examples_dir), str(recs_path), artifacts_dir=str(artifacts_dir), variant="raw").snapshot()
+
+    assert snapshot.avatar_example_texts == ("Day 1\nPull",)
+    assert snapshot.merged_recs == "not  distilled"
+    assert raw_snapshot.avatar_example_texts == ("Day 1   \n\nPull",)
+    assert snapshot.checksum != raw_snapshot.checksum
+
+
+def test_committed_artifacts_match_the_sources():
+    manifest = json.load(open(BASE / "data" / "prompt_assets_distilled" / "manifest.json", encoding="utf-8"))["artifacts"]
+    examples = sorted((BASE / "configs" / "training_program_examples").glob("*.txt"))
+    sources = {path.stem: path for path in examples}
+    sources["merged_recs"] = BASE / "data" / "eric_recommendations" / "merged_recs.txt"
+
+    for name, path in sources.items():
+        assert manifest[name]["source_checksum"] == get_checksum(path.read_text(encoding="utf-8").strip()), (
+            f"{name} changed, rerun src.training_plan.prompt_distillation_cli"
+        )
@@ -0,0 +1,63 @@
+import json
+from pathlib import Path
+
+from omegaconf import OmegaConf
+from langchain.prompts.chat import ChatPromptTemplate, HumanMessagePromptTemplate
+
+from src.training_plan.prompt_assets import PromptAssetsSnapshot
+from src.training_plan.prompt_templates import PromptTemplates
+
+
+ROOT = Path(__file__).resolve().parents[2]
+
+
+def test_precompiled_prompt_matches_full_render():
+    cfg = OmegaConf.load(ROOT / "configs" / "train_assistant_config.yaml")
+    week_templates = json.load(open(ROOT / "configs" / "week_templates.json", encoding="utf-8"))
+    assets = PromptAssetsSnapshot("avatar {example}", ("avatar {example}",), "recs", 1)
+    templates = PromptTemplates(cfg, week_templates)
+
+    prompt = templates.get("next_week", 4, assets)
+    assert templates.get("next_week", 4, assets) is prompt
+
+    user_fields = {
+        "user_data": "user",
+        "previous_week": "prev",
+        "feedback": "feedback",
+        "age_recommendations": "age",
+        "available_exercises": "exercises",
+    }
+    full_prompt = ChatPromptTemplate.from_messages([
+        HumanMessagePromptTemplate.from_template(cfg["train_assistant"]["next_week"]["prompt_template"])
+    ])
+    expected = full_prompt.invoke({
+        **user_fields,
+        "week_template": str(week_templates["day_4_template"]),
+        "avatars_examples": assets.avatar_examples,
+        "merged_recs": assets.merged_recs,
+    })
+    assert prompt.invoke(user_fields).to_string() == expected.to_string()
+
+    updated_assets = PromptAssetsSnapshot("new", ("new",), "recs", 2)
+    assert templates.get("next_week", 4, updated_assets) is not prompt
+
+
+def test_day_scope_prompt_takes_day_skeleton_as_input():
+    cfg = OmegaConf.load(ROOT / "configs" / "train_assistant_config.yaml")
+    week_templates = json.load(open(ROOT / "configs" / "week_templates.json", encoding="utf-8"))
+    assets = PromptAssetsSnapshot("avatar", ("avatar",), "recs", 1)
+    templates = PromptTemplates(cfg, week_templates)
+
+    prompt = templates.get_day_scope("first_week", assets)
+    assert templates.get_day_scope("first_week", assets) is prompt
+
+    rendered = prompt.invoke({
+        "week_template": "{'day 4': {'day_type': 'PUSH'}}",
+        "week_day_types": "day 1 - PUSH, day 4 - PUSH",
+        "user_data": "user",
+        "scanner_recommendations": "scanner",
+        "age_recommendations": "age",
+        "available_exercises": "exercises",
+    }).to_string()
+    assert "{'day 4': {'day_type': 'PUSH'}}" in rendered
+    assert "Training days of the week: day 1 - PUSH, day 4 - PUSH" in rendered
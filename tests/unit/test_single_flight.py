@@ -0,0 +1,82 @@
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.single_flight import SingleFlight
+
+
+def test_threads_coalesce_onto_one_call():
+    single_flight = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def generate():
+        calls.append(1)
+        release.wait(timeout=5)
+        return "plan"
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(single_flight.do, "key", generate) for _ in range(4)]
+        while single_flight.stats()["coalesced"] < 3:
+            time.sleep(0.01)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert results == ["plan"] * 4
+    assert len(calls) == 1
+    assert single_flight.stats() == {"in_flight": 0, "executed": 1, "coalesced": 3, "coalesced_ratio": 0.75}
+
+
+def test_async_and_threadpool_callers_share_a_call():
+    single_flight = SingleFlight()
+    calls = []
+
+    async def agenerate():
+        calls.append(1)
+        await asyncio.sleep(0.2)
+        return "plan"
+
+    def generate():
+        calls.append(1)
+        return "sync plan"
+
+    async def main():
+        leader = asyncio.create_task(single_flight.ado("key", agenerate))
+        await asyncio.sleep(0.05)
+        follower = asyncio.to_thread(single_flight.do, "key", generate)
+        return await asyncio.gather(leader, follower, single_flight.ado("key", agenerate))
+
+    assert asyncio.run(main()) == ["plan", "plan", "plan"]
+    assert len(calls) == 1
+
+
+def test_errors_are_shared_and_cancelled_call_is_retried():
+    single_flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.05)
+        raise ValueError("broken output")
+
+    async def slow():
+        await asyncio.sleep(10)
+
+    async def fast():
+        return "plan"
+
+    async def main():
+        results = await asyncio.gather(single_flight.ado("a", fail), single_flight.ado("a", fail), return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+
+        leader = asyncio.create_task(single_flight.ado("b", slow))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(single_flight.ado("b", fast))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        assert await follower == "plan"
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+
+    asyncio.run(main())
@@ -0,0 +1,90 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from src.training_plan.token_counter import TokenCounter
+from src.training_plan.token_usage import MeteredChain, TokenUsage, UsageMeter, get_usage
+
+
+USAGE = {
+    "input_tokens": 1000,
+    "output_tokens": 300,
+    "total_tokens": 1300,
+    "input_token_details": {"cache_read": 200},
+    "output_token_details": {"reasoning": 120},
+}
+
+
+def make_meter():
+    prices = {"o1-mini": {"input": 1.0, "cached_input": 0.5, "output": 4.0}}
+    return UsageMeter({"prices": prices}, TokenCounter(None, chars_per_token=4.0))
+
+
+def test_usage_is_read_from_usage_metadata():
+    assert get_usage(AIMessage(content="{}", usage_metadata=USAGE)) == {
+        "input_tokens": 1000, "output_tokens": 300, "reasoning_tokens": 120, "cached_input_tokens": 200,
+    }
+    assert get_usage(None)["input_tokens"] == 0
+
+
+def test_input_tokens_are_attributed_to_sections():
+    sections = make_meter().attribute({"merged_recs": "a" * 1999, "user_data": "b" * 399, "skipped": 1}, 1000)
+
+    assert sections == {"merged_recs": 500, "user_data": 100, "instructions": 400}
+    # estimates overshooting the reported total are scaled down
+    assert sum(make_meter().attribute({"merged_recs": "a" * 8000}, 1000).values()) == 1000
+
+
+def test_cost_counts_cached_input_at_its_price():
+    usage = get_usage(AIMessage(content="", usage_metadata=USAGE))
+
+    assert make_meter().get_cost("o1-mini", usage) == (800 * 1.0 + 200 * 0.5 + 300 * 4.0) / 1e6
+    assert make_meter().get_cost("unknown", usage) == 0.0
+
+
+class Chain:
+    def invoke(self, inputs):
+        return AIMessage(content="{}", usage_metadata=USAGE)
+
+    async def astream(self, inputs):
+        yield AIMessageChunk(content="{")
+        yield AIMessageChunk(content="}", usage_metadata=USAGE)
+
+
+class Prompt:
+    partial_variables = {"merged_recs": "a" * 1999}
+
+
+def test_metered_chain_records_request_and_app_usage():
+    meter = make_meter()
+    request_usage = TokenUsage()
+    chain = MeteredChain(Chain(), Prompt(), meter, request_usage, "/generate_first_week", "o1-mini")
+
+    chain.invoke({"user_data": "b" * 399})
+
+    async def stream():
+        return [chunk async for chunk in chain.astream({"user_data": "b" * 399})]
+
+    asyncio.run(stream())
+
+    usage = request_usage.as_dict()
+    assert usage["calls"] == 2 and usage["input_tokens"] == 2000 and usage["reasoning_tokens"] == 240
+    assert usage["input_tokens_by_section"] == {"merged_recs": 1000, "user_data": 200, "instructions": 800}
+    assert request_usage.headers()["X-Completion-Tokens"] == "600"
+    assert meter.stats()["/generate_first_week"]["o1-mini"]["calls"] == 2
+
+
+def test_metered_stream_stopped_early_is_recorded():
+    meter = make_meter()
+    request_usage = TokenUsage()
+    chain = MeteredChain(Chain(), Prompt(), meter, request_usage, "/stream/first_week", "o1-mini")
+
+    async def first_chunk():
+        stream = chain.astream({"user_data": "b" * 399})
+        chunk = await anext(stream)
+        await stream.aclose()
+        return chunk
+
+    assert asyncio.run(first_chunk()).content == "{"
+    assert request_usage.as_dict()["calls"] == 1
+    assert meter.stats()["/stream/first_week"]["o1-mini"]["calls"] == 1
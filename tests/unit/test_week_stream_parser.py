@@ -0,0 +1,59 @@
+import json
+import asyncio
+
+from src.api.endpoints import stream_plan_events
+from src.training_plan.plan_parser import parse_plan
+from src.training_plan.week_stream_parser import WeekStreamParser
+
+
+WEEK = {
+    "day 1": {"day_type": "PUSH", "notes": "keep {braces} and \"quotes\" in strings", "exercises": [{"sets": 3}]},
+    "day 2": {"day_type": "REST_DAY"},
+    "day 3": {"day_type": "LEGS", "exercises": []},
+}
+
+
+def test_parser_emits_each_day_when_it_closes():
+    text = "```json\n" + json.dumps(WEEK, indent=2) + "\n```"
+    parser = WeekStreamParser()
+
+    emitted = []
+    for position, char in enumerate(text):
+        for day_key, day_plan in parser.feed(char):
+            emitted.append((day_key, position))
+            assert day_plan == WEEK[day_key]
+
+    assert [day_key for day_key, _ in emitted] == list(WEEK)
+    # day 1 is available long before the output is complete
+    assert emitted[0][1] < text.index("day 2")
+    assert parser.finished
+
+
+def test_parser_handles_arbitrary_chunking():
+    text = json.dumps(WEEK)
+    parser = WeekStreamParser()
+
+    emitted = []
+    for start in range(0, len(text), 7):
+        emitted.extend(parser.feed(text[start:start + 7]))
+
+    assert dict(emitted) == WEEK
+
+
+def test_day_with_a_defect_is_repaired_and_the_stream_ends_with_the_plan():
+    text = '{"day 1": {"day_type": "PUSH", "exercises": {},}, "day 2": {"day_type": "REST_DAY"}}'
+
+    class Assistant:
+        @staticmethod
+        def convert_result_to_json(plan_str):
+            return parse_plan(plan_str)[0]
+
+    async def chunks():
+        for start in range(0, len(text), 5):
+            yield text[start:start + 5]
+
+    async def collect():
+        return [event async for event in stream_plan_events(Assistant(), chunks())]
+
+    events = [event.split("\n")[0] for event in asyncio.run(collect())]
+    assert events == ["event: day", "event: day", "event: plan"]